@@ -1,17 +1,22 @@
 # 🍼 baby_manager.py
 
-from http import client
 from agents.babymanager.prompts import baby_gpt_prompt
-from openai import OpenAI
+from core.llm_gateway import get_llm
+from core.llm_cache import get_llm_cache
+from core.prompt_budget import budget_for
+from core.baby_rollup import utc_day_start
+from core.baby_features import day_features
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from datetime import date
-from typing import Dict
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional
 from supabase import Client
 import json
 import re
 
 
-client = OpenAI()
+# 缓存 key 的模板标识，修改 baby_gpt_prompt 时同步升级版本号
+BABY_ANALYSIS_TEMPLATE = "baby_gpt_prompt:v3"
 
 class BabyAnalysisResponse(BaseModel):
     summary: str
@@ -26,17 +31,21 @@ type_mapping = {
     "outside": "outside"
 }
 
-def extract_json(text):
+def extract_json(text) -> Optional[Dict]:
+    """回复里的 JSON 对象；没有或解析失败（例如被 max_tokens 截断）时返回 None"""
     try:
-        match = re.search(r"\{.*\}", text, re.DOTALL)
+        match = re.search(r"\{.*\}", text or "", re.DOTALL)
         if match:
-            return json.loads(match.group(0))
+            parsed = json.loads(match.group(0))
+            if isinstance(parsed, dict):
+                return parsed
     except Exception as e:
         print("⚠️ JSON 提取失败:", e)
-    return {"summary": text.strip(), "next_action": ""}
+    return None
 
-def get_baby_health_today(baby_id: str, supabase: Client) -> Dict:
-    today_str = date.today().isoformat()
+def fetch_baby_logs_today(baby_id: str, supabase: Client) -> List[Dict]:
+    # 与 baby_log_daily 汇总使用同一个“今天”（UTC 日期）
+    today_str = utc_day_start(datetime.now(timezone.utc)).isoformat()
 
     logs_result = (
         supabase
@@ -44,11 +53,14 @@ def get_baby_health_today(baby_id: str, supabase: Client) -> Dict:
         .select("log_type, log_data, logged_at")
         .eq("baby_id", baby_id)
         .gte("logged_at", today_str)
+        .order("logged_at")
         .execute()
     )
+    return logs_result.data or []
 
-    print("🧾 原始 logs_result:", logs_result.data)
 
+def group_logs(rows: List[Dict]) -> Dict:
+    """按类型分组的原始 log_data（feed/sleep/diaper/...）"""
     logs = {
         "feed": [],
         "sleep": [],
@@ -58,16 +70,7 @@ def get_baby_health_today(baby_id: str, supabase: Client) -> Dict:
         "outside": []
     }
 
-    type_mapping = {
-        "feeding": "feed",
-        "sleep": "sleep",
-        "diaper": "diaper",
-        "cry": "cry",
-        "bowel": "bowel",
-        "outside": "outside"
-    }
-
-    for row in logs_result.data:
+    for row in rows:
         log_type = row.get("log_type")
         log_data = row.get("log_data")
 
@@ -80,32 +83,61 @@ def get_baby_health_today(baby_id: str, supabase: Client) -> Dict:
         else:
             print(f"⚠️ 未知类型 {log_type}，跳过")
 
+    return logs
+
+
+def get_baby_health_today(baby_id: str, supabase: Client) -> Dict:
+    rows = fetch_baby_logs_today(baby_id, supabase)
+    print("🧾 原始 logs_result:", rows)
+    logs = group_logs(rows)
     print(f"✅ 解析完成 baby 健康数据: {logs}")
     return logs
 
 
+def get_baby_features_today(baby_id: str, supabase: Client) -> Dict:
+    """今天的记录压缩成固定大小的特征（次数、总量、间隔、最长间隔、最后一次时间），给 GPT prompt 用"""
+    return day_features(fetch_baby_logs_today(baby_id, supabase))
+
+
 # ✨ GPT 分析函数（调用分析 Agent）
-def call_gpt_baby_analysis(baby_id: str, supabase: Client) -> Dict:
-    data = get_baby_health_today(baby_id, supabase)
-    prompt = baby_gpt_prompt(data)
+async def call_gpt_baby_analysis(baby_id: str, supabase: Client, features: Optional[Dict] = None) -> Dict:
+    if features is None:
+        features = await run_in_threadpool(get_baby_features_today, baby_id, supabase)
+
+    # 特征没变化时直接用缓存（as_of 按 BABY_FEATURES_RESOLUTION_MINUTES 取整）；新增 baby_log 会让 baby:<id> 的缓存失效
+    cache = get_llm_cache()
+    cache_tags = [f"baby:{baby_id}"]
+    cached = await cache.get("gpt-4o", BABY_ANALYSIS_TEMPLATE, features, cache_tags)
+    if cached is not None:
+        return cached
+
+    prompt = baby_gpt_prompt(features)
 
     try:
-        response = client.chat.completions.create(
+        response = await get_llm().chat(
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "You are a baby care assistant AI."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
+            max_tokens=budget_for("baby_analysis").output_tokens,
+            endpoint="baby_analysis",
         )
-        content = response.choices[0].message.content
-        
+        content = response.choices[0].message.content or ""
+
         parsed = extract_json(content)
+        if parsed is None or not parsed.get("summary"):
+            # 不是合法 JSON：原文返回给用户，但不缓存，下次重新生成
+            print("⚠️ GPT 回复不是合法 JSON，不写缓存")
+            return {"summary": content.strip(), "next_action": ""}
 
-        return {
+        result = {
             "summary": parsed.get("summary", ""),
             "next_action": parsed.get("next_action", "")
         }
+        await cache.set("gpt-4o", BABY_ANALYSIS_TEMPLATE, features, result, cache_tags)
+        return result
     except Exception as e:
         print("❌ GPT 返回异常:", e)
         return {
@@ -1,4 +1,5 @@
 from datetime import datetime
+from core.prompt_budget import build_prompt
 
 # ✅ 文字分析版本 Prompt（适合非结构化 GPT 输出）
 def baby_analysis_prompt(records: str) -> str:
@@ -14,18 +15,18 @@ Please analyze today's status and provide:
 """
 
 # ✅ 结构化 JSON 格式 Prompt（适合 parse_gpt_response 使用）
-def baby_gpt_prompt(data: dict) -> str:
-    return f"""
+# 输入是 core.baby_features.day_features 的固定大小特征，而不是原始 log_data
+BABY_GPT_TEMPLATE = """
 You are a baby care AI assistant.
 
-Here is today's baby data:
+Here is today's baby data (times are HH:MM UTC, now {as_of}):
 
-Feedings: {data.get('feed', [])}
-Sleeps: {data.get('sleep', [])}
-Diapers: {data.get('diaper', [])}
-Cries: {data.get('cry', [])}
-Bowel movements: {data.get('bowel', [])}
-Outside activities: {data.get('outside', [])}
+Feedings: {feed}
+Sleeps: {sleep}
+Diapers: {diaper}
+Cries: {cry}
+Bowel movements: {bowel}
+Outside activities: {outside}
 
 Please ONLY respond in valid JSON format like this:
 {{
@@ -36,6 +37,35 @@ Do not add any explanation or comment before or after the JSON.
 
 """
 
+# 每类特征的总量字段 -> 显示格式
+_FEATURE_TOTALS = {
+    "feed_ml": "{} ml total",
+    "sleep_minutes": "{} min total",
+    "diaper_solid_count": "{} solid",
+    "cry_minutes": "{} min total",
+    "outside_minutes": "{} min total",
+}
+
+
+def describe_features(features: dict) -> str:
+    """一类记录的特征写成一行，例如 "5 times, 600 ml total, first 02:10, last 14:05, every ~180 min, longest gap 240 min" """
+    if not features or not features.get("count"):
+        return "none"
+    parts = [f"{features['count']} times"]
+    parts += [fmt.format(features[field]) for field, fmt in _FEATURE_TOTALS.items() if field in features]
+    parts.append(f"first {features['first']}, last {features['last']}")
+    if "avg_interval_min" in features:
+        parts.append(f"every ~{features['avg_interval_min']} min, longest gap {features['longest_gap_min']} min")
+    return ", ".join(parts)
+
+
+def baby_gpt_prompt(features: dict) -> str:
+    return build_prompt(
+        "baby_analysis", BABY_GPT_TEMPLATE, model="gpt-4o",
+        as_of=features.get("as_of", ""),
+        **{key: describe_features(features.get(key)) for key in ("feed", "sleep", "diaper", "cry", "bowel", "outside")}
+    )
+
 # ✅ 可扩展：分析宝宝 tips（未来扩展用）
 def baby_tips_prompt(data: dict) -> str:
     return f"""
@@ -8,6 +8,7 @@ class BabyAgentState(BaseModel):
     db: Session                     # 数据库连接
     analysis: str = ""              # GPT 分析结果
     records: Optional[Dict[str, Any]] = None  # 宝宝记录数据
+    features: Optional[Dict[str, Any]] = None  # 今天记录的压缩特征（给 GPT prompt 用）
 
     summary: str = ""               # 摘要信息（暂时保留）
     next_action: str = ""           # 下一步建议
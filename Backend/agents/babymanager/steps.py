@@ -1,5 +1,6 @@
 from .schema import BabyAgentState
-from agents.baby_manager import get_baby_health_today
+from agents.baby_manager import fetch_baby_logs_today, group_logs
+from core.baby_features import day_features
 from utils.gpt_calls import gpt_call
 from utils.gpt_parse import parse_gpt_response
 from agents.babymanager.prompts import baby_gpt_prompt
@@ -8,19 +9,19 @@ from typing import List
 # ✅ 第一步：从数据库中获取今天所有记录
 
 def fetch_records_step(state: BabyAgentState) -> BabyAgentState:
-    data = get_baby_health_today(state.user_id, state.db)
+    rows = fetch_baby_logs_today(state.user_id, state.db)
     return state.copy(update={
-        "records": data,
+        "records": group_logs(rows),
+        "features": day_features(rows),  # 给 GPT 用的固定大小特征
         "analysis": ""  # 初始化为空字符串
     })
 
 # ✅ 第二步：调用 GPT 分析宝宝的状态，并生成 summary 和 next_action
 
-def analyze_with_gpt_step(state: BabyAgentState) -> BabyAgentState:
-    data = state.records or {}
-    prompt = baby_gpt_prompt(data)  # 从 prompts.py 引入模板
+async def analyze_with_gpt_step(state: BabyAgentState) -> BabyAgentState:
+    prompt = baby_gpt_prompt(state.features or {})  # 从 prompts.py 引入模板
 
-    response = gpt_call(prompt)
+    response = await gpt_call(prompt, endpoint="baby_analysis")
     parsed = parse_gpt_response(response)
     if not parsed:
         parsed = {
@@ -1,13 +1,12 @@
 from .emotionmanager.schema import EmotionAgentState
-from .emotionmanager.graph import build_emotion_graph
+from .graph_registry import graphs
 
 async def run_emotion_analysis(user_id: str, baby_id: str, mom_data: dict, baby_data: dict):
-    graph = build_emotion_graph()
     state = EmotionAgentState(
         user_id=user_id,
         baby_id=baby_id,
         mom_data=mom_data,
         baby_data=baby_data
     )
-    result = await graph.ainvoke(state)
+    result = await graphs.ainvoke("emotion", state)
     return result
@@ -1,11 +1,9 @@
-from openai import OpenAI
+from core.llm_gateway import get_llm
 
-client = OpenAI()
-
-def generate_emotion_card_image(message: str, months_old: int, baby_name: str) -> str:
+async def generate_emotion_card_image(message: str, months_old: int, baby_name: str) -> str:
     image_prompt = f"A warm, soft baby milestone card for {baby_name} turning {months_old} months. Include a quote: '{message}', white background, emotional tone"
     
-    image = client.images.generate(
+    image = await get_llm().generate_image(
         model="dall-e-3",
         prompt=image_prompt,
         n=1,
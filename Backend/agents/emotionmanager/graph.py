@@ -1,6 +1,6 @@
-from langgraph.graph import StateGraph, END
+from langgraph.graph import StateGraph, START, END
 from .schema import EmotionAgentState
-from .steps import generate_emotion_analysis_step, generate_gentle_message_step, generate_celebration_message_step, check_celebration_step
+from .steps import generate_emotion_analysis_step, generate_gentle_message_step, generate_celebration_message_step, check_celebration_step, join_step, celebration_route
 
 def build_emotion_graph():
     graph = StateGraph(EmotionAgentState)
@@ -9,15 +9,20 @@ def build_emotion_graph():
     graph.add_node("analyze_emotion", generate_emotion_analysis_step)
     graph.add_node("generate_message", generate_gentle_message_step)
     graph.add_node("check_celebration", check_celebration_step)
+    graph.add_node("join", join_step)
     graph.add_node("generate_celebration", generate_celebration_message_step)
 
-    # 🚪 2. 设置起点（入口）
-    graph.set_entry_point("analyze_emotion")
+    # 🚪 2. 三个互不依赖的步骤从起点并行执行（两个 GPT 调用同时进行）
+    graph.add_edge(START, "analyze_emotion")
+    graph.add_edge(START, "generate_message")
+    graph.add_edge(START, "check_celebration")
 
-    # 🔗 3. 构建主流程链路
-    graph.add_edge("analyze_emotion", "generate_message")
-    graph.add_edge("generate_message", "check_celebration")
-    graph.add_edge("check_celebration", "generate_celebration")
+    # 🔗 3. 全部完成后汇合，只有今天有庆祝的日子才调用庆祝语 GPT
+    graph.add_edge(["analyze_emotion", "generate_message", "check_celebration"], "join")
+    graph.add_conditional_edges("join", celebration_route, {
+        "celebrate": "generate_celebration",
+        "done": END
+    })
     graph.add_edge("generate_celebration", END)
 
     # ✅ 4. 编译 Graph
@@ -1,16 +1,16 @@
-from openai import OpenAI
 from jinja2 import Template
 import json
 import re
 from .schema import EmotionAgentState
 from .prompts import emotion_prompt_narrative as emotion_prompt, gentle_message_prompt_cn as gentle_message_prompt, celebration_prompt, task_detect_prompt_template
 from datetime import date, datetime
+from typing import Any, Dict
 from core.supabase import get_supabase
 from agents.llm import call_gpt_json
+from core.llm_gateway import get_llm
 
 
 supabase = get_supabase()
-client = OpenAI()
 
 def extract_json(text: str) -> dict:
     """从文本中提取 JSON 对象"""
@@ -33,7 +33,8 @@ def replace_template_variables(text: str, data: dict) -> str:
         text = text.replace(f"{{{key}}}", str(value))
     return text
 
-async def generate_emotion_analysis_step(state: EmotionAgentState) -> EmotionAgentState:
+# 图中的节点只返回自己写入的字段，这样并行分支的更新不会互相冲突
+async def generate_emotion_analysis_step(state: EmotionAgentState) -> Dict[str, Any]:
     mom = state.mom_data
     baby = state.baby_data
 
@@ -49,28 +50,31 @@ async def generate_emotion_analysis_step(state: EmotionAgentState) -> EmotionAge
 
     prompt = Template(emotion_prompt).render(**template_data)
 
-    response = client.chat.completions.create(
+    response = await get_llm().chat(
         model="gpt-4o",
         messages=[
             {"role": "system", "content": "You are a family emotion assistant."},
             {"role": "user", "content": prompt}
-        ]
+        ],
+        endpoint="emotion_analysis"
     )
 
     try:
         content = response.choices[0].message.content
         parsed = extract_json(content)
-        state.summary = replace_template_variables(parsed.get("summary", ""), template_data)
-        state.emotion_label = parsed.get("emotion_label", "uncertain")
-        state.suggestions = parsed.get("suggestions", [])
+        return {
+            "summary": replace_template_variables(parsed.get("summary", ""), template_data),
+            "emotion_label": parsed.get("emotion_label", "uncertain"),
+            "suggestions": parsed.get("suggestions", []),
+        }
     except Exception as e:
-        state.summary = replace_template_variables(content, template_data)
-        state.emotion_label = "uncertain"
-        state.suggestions = []
+        return {
+            "summary": replace_template_variables(content, template_data),
+            "emotion_label": "uncertain",
+            "suggestions": [],
+        }
 
-    return state
-
-async def generate_gentle_message_step(state: EmotionAgentState) -> EmotionAgentState:
+async def generate_gentle_message_step(state: EmotionAgentState) -> Dict[str, Any]:
     mom = state.mom_data
     baby = state.baby_data
 
@@ -85,20 +89,20 @@ async def generate_gentle_message_step(state: EmotionAgentState) -> EmotionAgent
 
     prompt = Template(gentle_message_prompt).render(**template_data)
 
-    response = client.chat.completions.create(
+    response = await get_llm().chat(
         model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}]
+        messages=[{"role": "user", "content": prompt}],
+        endpoint="emotion_gentle_message"
     )
     content = response.choices[0].message.content
     parsed = extract_json(content)
-    state.gentle_message = replace_template_variables(parsed.get("message", content.strip()), template_data)
-    return state
+    return {"gentle_message": replace_template_variables(parsed.get("message", content.strip()), template_data)}
 
 async def detect_task_from_chat_step(state: EmotionAgentState) -> EmotionAgentState:
     user_input = state.user_text
     prompt = task_detect_prompt_template.render(text=user_input)
 
-    response = await call_gpt_json(prompt)
+    response = await call_gpt_json(prompt, endpoint="emotion_task_detect")
     state.extracted_tasks = response.get("tasks", [])
     return state
 
@@ -119,21 +123,28 @@ def get_baby_months_old(birthday: str) -> int:
     birth = datetime.fromisoformat(birthday).date()
     return (today.year - birth.year) * 12 + today.month - birth.month
 
-async def check_celebration_step(state: EmotionAgentState) -> EmotionAgentState:
+async def check_celebration_step(state: EmotionAgentState) -> Dict[str, Any]:
     baby_birthday = state.baby_data.get("birthday")
     baby_name = state.baby_data.get("name", "Your baby")
 
     if not baby_birthday:
-        return state
+        return {}
 
     months_old = get_baby_months_old(baby_birthday)
     if date.today().day == datetime.fromisoformat(baby_birthday).day:
-        state.celebration_text = f"{baby_name} turns {months_old} months today!"
-    return state
+        return {"celebration_text": f"{baby_name} turns {months_old} months today!"}
+    return {}
+
+async def join_step(state: EmotionAgentState) -> Dict[str, Any]:
+    """汇合点：等待并行分支全部完成后再决定是否生成庆祝语"""
+    return {}
+
+def celebration_route(state: EmotionAgentState) -> str:
+    return "celebrate" if state.celebration_text else "done"
 
-async def generate_celebration_message_step(state: EmotionAgentState) -> EmotionAgentState:
+async def generate_celebration_message_step(state: EmotionAgentState) -> Dict[str, Any]:
     if not state.celebration_text:
-        return state
+        return {}
 
     prompt = Template(celebration_prompt).render(
         occasion=state.celebration_text,
@@ -141,10 +152,11 @@ async def generate_celebration_message_step(state: EmotionAgentState) -> Emotion
         months_old=get_baby_months_old(state.baby_data["birthday"])
     )
 
-    response = client.chat.completions.create(
+    response = await get_llm().chat(
         model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}]
+        messages=[{"role": "user", "content": prompt}],
+        endpoint="emotion_celebration"
     )
 
-    state.gentle_message = response.choices[0].message.content.strip()
-    return state
\ No newline at end of file
+    # 有庆祝的日子时，庆祝语替换普通的温柔提醒
+    return {"gentle_message": response.choices[0].message.content.strip()}
\ No newline at end of file
@@ -0,0 +1,122 @@
+# agents/graph_registry.py
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class NodeTimingCallback(BaseCallbackHandler):
+    """Records how long each LangGraph node (and the whole run) takes."""
+
+    run_inline = True
+
+    def __init__(self, graph_name: str):
+        self.graph_name = graph_name
+        self._started: Dict[UUID, tuple] = {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, parent_run_id: Optional[UUID] = None,
+                       metadata: Optional[Dict[str, Any]] = None, **kwargs):
+        if parent_run_id is None:
+            self._started[run_id] = (None, time.perf_counter())
+            return
+        node = (metadata or {}).get("langgraph_node")
+        # Only the node's own run, not the runnables nested inside it
+        if node and kwargs.get("name") == node:
+            self._started[run_id] = (node, time.perf_counter())
+
+    def _finish(self, run_id: UUID, ok: bool):
+        entry = self._started.pop(run_id, None)
+        if entry is None:
+            return
+        node, started = entry
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if node is None:
+            metrics.observe("graph.run_ms", elapsed_ms, graph=self.graph_name)
+            if not ok:
+                metrics.increment("graph.errors", graph=self.graph_name)
+        else:
+            metrics.observe("graph.node_ms", elapsed_ms, graph=self.graph_name, node=node)
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs):
+        self._finish(run_id, True)
+
+    def on_chain_error(self, error, *, run_id: UUID, **kwargs):
+        self._finish(run_id, False)
+
+
+class GraphRegistry:
+    """
+    Compiles each agent graph once and hands the same compiled graph to every request.
+
+    Compiled graphs without a checkpointer keep no per-run state, so sharing them
+    across concurrent requests is safe. `compile_all` runs at startup; a graph that
+    was not compiled yet is compiled on first use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._builders: Dict[str, Callable[[], Any]] = {}
+        self._compiled: Dict[str, Any] = {}
+
+    def register(self, name: str, builder: Callable[[], Any]):
+        with self._lock:
+            self._builders[name] = builder
+            self._compiled.pop(name, None)
+
+    def _compile(self, name: str):
+        started = time.perf_counter()
+        compiled = self._builders[name]()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        metrics.set_gauge("graph.compile_ms", round(elapsed_ms, 2), graph=name)
+        logger.info(f"Compiled graph {name} in {elapsed_ms:.1f} ms")
+        return compiled
+
+    def get(self, name: str):
+        compiled = self._compiled.get(name)
+        if compiled is None:
+            with self._lock:
+                compiled = self._compiled.get(name)
+                if compiled is None:
+                    if name not in self._builders:
+                        raise KeyError(f"Unknown graph: {name}")
+                    compiled = self._compiled[name] = self._compile(name)
+        return compiled
+
+    def compile_all(self) -> Dict[str, Any]:
+        for name in list(self._builders):
+            self.get(name)
+        return dict(self._compiled)
+
+    def _config(self, name: str, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        config = dict(config or {})
+        config["callbacks"] = list(config.get("callbacks") or []) + [NodeTimingCallback(name)]
+        return config
+
+    async def ainvoke(self, name: str, state: Any, config: Optional[Dict[str, Any]] = None):
+        return await self.get(name).ainvoke(state, config=self._config(name, config))
+
+    def invoke(self, name: str, state: Any, config: Optional[Dict[str, Any]] = None):
+        return self.get(name).invoke(state, config=self._config(name, config))
+
+
+def _register_default_graphs(registry: GraphRegistry):
+    from agents.emotionmanager.graph import build_emotion_graph
+    from agents.babymanager.graph import build_baby_manager_graph
+    from agents.mommanager.graph import build_mom_manager_graph
+    from agents.taskmanager.graph import build_task_graph
+
+    registry.register("emotion", build_emotion_graph)
+    registry.register("baby_manager", build_baby_manager_graph)
+    registry.register("mom_manager", build_mom_manager_graph)
+    registry.register("task", build_task_graph)
+
+
+graphs = GraphRegistry()
+_register_default_graphs(graphs)
@@ -1,17 +1,14 @@
 import json
 import re
-from typing import Dict, Optional
-from openai import OpenAI
+from typing import AsyncIterator, Dict, List, Optional
 from dotenv import load_dotenv
-import os
+from core.llm_gateway import get_llm
+from core.prompt_budget import budget_for
 
 load_dotenv()
 
 CATEGORIES = ["Health", "Family", "Baby", "Other"]
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 def parse_gpt_category(content: str) -> str:
     try:
         # 优先用正则提取 JSON 代码块
@@ -71,29 +68,39 @@ def parse_gpt_json(content: str):
         return {"tasks": []}
 
 
-def call_gpt_json_newversion(prompt: str) -> Dict:
+def _json_message_messages(prompt: str) -> List[Dict]:
+    return [
+        {
+            "role": "system",
+            "content": [
+                {"type": "text", "text": "你是一个温柔体贴的 AI 助手，只返回 JSON 结构，格式如下：{\"message\": \"...\"}，不要多余说明。"}
+            ]
+        },
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt}
+            ]
+        }
+    ]
+
+
+def _output_tokens(endpoint: Optional[str], default: Optional[int] = None) -> Optional[int]:
+    """max_tokens for a call: the endpoint's output budget when it has one"""
+    return budget_for(endpoint).output_tokens if endpoint else default
+
+
+async def call_gpt_json_newversion(prompt: str, endpoint: Optional[str] = None) -> Dict:
     try:
         print("📨 正在调用 GPT...")
         print("📝 Prompt:", prompt)
 
-        response = client.chat.completions.create(
+        response = await get_llm().chat(
             model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": [
-                        {"type": "text", "text": "你是一个温柔体贴的 AI 助手，只返回 JSON 结构，格式如下：{\"message\": \"...\"}，不要多余说明。"}
-                    ]
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt}
-                    ]
-                }
-            ],
+            messages=_json_message_messages(prompt),
             temperature=0.6,
-            max_tokens=800
+            max_tokens=_output_tokens(endpoint, 800),
+            endpoint=endpoint
             #print("📬 GPT 回复内容:", response)
         )
 
@@ -117,20 +124,33 @@ def call_gpt_json_newversion(prompt: str) -> Dict:
     except Exception as e:
         print("❌ GPT 调用失败:", str(e))
         return {"message": "🤖 出现错误，稍后再试"}
+
+
+def stream_gpt_json_newversion(prompt: str, endpoint: Optional[str] = None) -> AsyncIterator[str]:
+    """call_gpt_json_newversion 的流式版本：逐段返回原始输出（用 JsonFieldStream 取出 message）"""
+    return get_llm().chat_stream(
+        model="gpt-4o",
+        messages=_json_message_messages(prompt),
+        temperature=0.6,
+        max_tokens=_output_tokens(endpoint, 800),
+        endpoint=endpoint
+    )
     
 
-def call_gpt_json(prompt: str) -> dict:
+async def call_gpt_json(prompt: str, endpoint: Optional[str] = None) -> dict:
     try:
         print("📨 正在调用 GPT...")
         print("📝 Prompt:", prompt)
         
-        response = client.chat.completions.create(
+        response = await get_llm().chat(
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "你是一个善于将任务结构化的生活助理，只返回 JSON 格式的任务列表"},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.3
+            temperature=0.3,
+            endpoint=endpoint,
+            **({"max_tokens": _output_tokens(endpoint)} if endpoint else {})
         )
         print("📬 GPT 回复内容:", response)
         content = response.choices[0].message.content
@@ -171,7 +191,7 @@ def call_gpt_json(prompt: str) -> dict:
 
 
 
-def detect_task_category(task_title: str) -> Optional[str]:
+async def detect_task_category(task_title: str) -> Optional[str]:
     """
     Uses LLM to detect the category of a task based on its title/description.
 
@@ -196,13 +216,14 @@ Which category does this task belong to? Only reply with the category name.
 """
 
     try:
-        response = client.chat.completions.create(
+        response = await get_llm().chat(
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "你是一个善于将任务结构化的生活助理，只返回 JSON 格式的任务列表"},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.3
+            temperature=0.3,
+            endpoint="task_category"
         )
         content = response.choices[0].message.content.strip()
         if isinstance(content, str):
@@ -1,14 +1,30 @@
-from openai import OpenAI
 from dotenv import load_dotenv
-import os
+from core.llm_gateway import get_llm
+from core.llm_cache import get_llm_cache
+from core.prompt_budget import budget_for
 from agents.mommanager.prompts import mom_health_prompt
-from supabase import create_client, Client
+from supabase import Client
 from datetime import date
 from typing import Dict, Any
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+# 缓存 key 的模板标识，修改 mom_health_prompt 时同步升级版本号
+MOM_ANALYSIS_TEMPLATE = "mom_health_prompt:v1"
+
+
+def mom_health_fields(record: Dict[str, Any]) -> Dict[str, Any]:
+    """mom_health 记录 -> 统一的健康数据字段（缺失的字段给默认值）"""
+    return {
+        "hrv": record.get("hrv", 0),
+        "sleep_hours": record.get("sleep_hours", 0),
+        "steps": record.get("steps", 0),
+        "mood": record.get("mood", "normal"),
+        "stress_level": record.get("stress_level", "normal"),
+        "calories_burned": record.get("calories_burned", 0),
+        "resting_heart_rate": record.get("resting_heart_rate", 0),
+        "breathing_rate": record.get("breathing_rate", 0)
+    }
 
 def get_mom_health_today(user_id: str, supabase: Client) -> Dict[str, Any]:
     """
@@ -77,16 +93,7 @@ def get_mom_health_today(user_id: str, supabase: Client) -> Dict[str, Any]:
         result = {
             "success": True,
             "message": "Health data loaded successfully",
-            "data": {
-                "hrv": health_result.data.get("hrv", 0),
-                "sleep_hours": health_result.data.get("sleep_hours", 0),
-                "steps": health_result.data.get("steps", 0),
-                "mood": health_result.data.get("mood", "normal"),
-                "stress_level": health_result.data.get("stress_level", "normal"),
-                "calories_burned": health_result.data.get("calories_burned", 0),
-                "resting_heart_rate": health_result.data.get("resting_heart_rate", 0),
-                "breathing_rate": health_result.data.get("breathing_rate", 0)
-            }
+            "data": mom_health_fields(health_result.data)
         }
         print(f"返回的健康数据：{result}")
         return result
@@ -101,9 +108,11 @@ def get_mom_health_today(user_id: str, supabase: Client) -> Dict[str, Any]:
 
 
 
-def call_gpt_mom_analysis(data: dict) -> str:
+async def call_gpt_mom_analysis(data: dict) -> str:
     """
     用于 GPT 分析妈妈健康状况，返回 summary 文本（用于 /api/mom/summary）
+    相同的健康数据直接返回缓存结果，不重复调用 GPT。
+    缓存 key 包含全部健康数值，数据一变就是新 key，所以不需要按妈妈失效。
     """
     # 设置默认值
     default_values = {
@@ -129,27 +138,40 @@ def call_gpt_mom_analysis(data: dict) -> str:
         breathing_rate=data["breathing_rate"]
     )
 
+    cache = get_llm_cache()
+    cache_inputs = {field: data[field] for field in default_values}
+    cached = await cache.get("gpt-4o", MOM_ANALYSIS_TEMPLATE, cache_inputs)
+    if cached is not None:
+        return cached
+
     print("🧠 prompt 发送给 GPT：\n", prompt)
 
     # GPT 请求
-    response = client.chat.completions.create(
+    response = await get_llm().chat(
         model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}]
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=budget_for("mom_analysis").output_tokens,
+        endpoint="mom_analysis"
     )
 
-    return response.choices[0].message.content.strip()
+    summary = (response.choices[0].message.content or "").strip()
+    # 被 max_tokens 截断或为空的回复不缓存
+    if summary and response.choices[0].finish_reason != "length":
+        await cache.set("gpt-4o", MOM_ANALYSIS_TEMPLATE, cache_inputs, summary)
+    return summary
 
 
-def call_gpt_mom_onesentence(data: dict) -> str:
+async def call_gpt_mom_onesentence(data: dict) -> str:
     try:
         prompt = mom_health_prompt(
             hrv=data["hrv"],
             sleep_hours=data["sleep"],
             steps=data["steps"],
             resting_heart_rate=data["resting_heart_rate"],
-            breathing_rate=data["breathing_rate"])
+            breathing_rate=data["breathing_rate"],
+            endpoint="mom_onesentence")
         
-        response = client.chat.completions.create(
+        response = await get_llm().chat(
             model="gpt-4o",
             messages=[
                 {
@@ -162,7 +184,8 @@ def call_gpt_mom_onesentence(data: dict) -> str:
                 }
             ],
             temperature=0.6,
-            max_tokens=100
+            max_tokens=budget_for("mom_onesentence").output_tokens,
+            endpoint="mom_onesentence"
         )
         result = response.choices[0].message.content.strip()
         return result
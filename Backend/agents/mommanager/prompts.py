@@ -1,7 +1,7 @@
 # ✅ prompts/mom_prompt.py
+from core.prompt_budget import build_prompt
 
-def mom_health_prompt(hrv: int, sleep_hours: int, steps: int, resting_heart_rate: int, breathing_rate: int) -> str:
-    return f"""
+MOM_HEALTH_TEMPLATE = """
 You are the mom's friend works for her physical and emotional health. keep her well and happy, let her know you are always there for her. and you are not only a mom, also yourself. 
 
 Based on her health data:
@@ -23,3 +23,12 @@ return in this format, summray sentence first, followed by most worrying points,
 you are a super mom, but you need to take care of yourself!
 I see you only slept 6 hours last night, you should take a easy day today!
 """
+
+
+def mom_health_prompt(hrv: int, sleep_hours: int, steps: int, resting_heart_rate: int, breathing_rate: int,
+                      endpoint: str = "mom_analysis") -> str:
+    return build_prompt(
+        endpoint, MOM_HEALTH_TEMPLATE, model="gpt-4o",
+        hrv=hrv, sleep_hours=sleep_hours, steps=steps,
+        resting_heart_rate=resting_heart_rate, breathing_rate=breathing_rate
+    )
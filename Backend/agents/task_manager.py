@@ -1,13 +1,13 @@
 from typing import Dict, Any
 from .taskmanager.schema import TaskManagerInput
-from .taskmanager.graph import task_graph
+from .graph_registry import graphs
 from .taskmanager.steps import task_manager_node
 
-def run_task_manager(input_data: Dict[str, Any]) -> Dict[str, Any]:
+async def run_task_manager(input_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     直接将输入字典传给流程图，获取 TaskManagerOutput
     """
-    graph_output = task_graph.invoke(input_data)
+    graph_output = await graphs.ainvoke("task", input_data)
     return {
         "task_output": graph_output,
         "status": "success"
@@ -1,3 +1,6 @@
+from core.prompt_budget import build_prompt
+
+
 def build_task_prompt(
     input_text: str,
     mom_health_status: dict,
@@ -49,15 +52,10 @@ input：going outisde with the baby，返回下面任务：
 """
  
 
-    # 将状态信息转成字符串，确保可以安全 format
-    mom_status_str = str(mom_health_status) if mom_health_status else "{}"
-    baby_status_str = str(baby_health_status) if baby_health_status else "{}"
-
-    # 拼接最终 Prompt
-    final_prompt = PROMPT_TEMPLATE.format(
+    # 拼接最终 Prompt：状态信息压缩成紧凑 JSON，超出 task_breakdown 的 token 预算时裁剪
+    return build_prompt(
+        "task_breakdown", PROMPT_TEMPLATE, model="gpt-4o",
         input_text=input_text,
-        mom_health_status=mom_status_str,
-        baby_health_status=baby_status_str
-    )
-
-    return final_prompt
\ No newline at end of file
+        mom_health_status=mom_health_status or {},
+        baby_health_status=baby_health_status or {}
+    )
\ No newline at end of file
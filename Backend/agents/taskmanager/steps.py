@@ -18,7 +18,7 @@ from core.supabase import get_supabase
 #     gpt_result = call_gpt_json(prompt_str)
 #     print("GPT result:", gpt_result)
 
-def task_manager_node(input: TaskManagerInput) -> TaskManagerOutput:
+async def task_manager_node(input: TaskManagerInput) -> TaskManagerOutput:
     try:
         # 1️⃣ 构建 prompt
         prompt_str = build_task_prompt(
@@ -28,7 +28,7 @@ def task_manager_node(input: TaskManagerInput) -> TaskManagerOutput:
         )
 
         # 2️⃣ 调 GPT
-        gpt_result = call_gpt_json(prompt_str)
+        gpt_result = await call_gpt_json(prompt_str, endpoint="task_breakdown")
         print("🧠 GPT 原始返回结果:", gpt_result)
 
         if "tasks" not in gpt_result or not isinstance(gpt_result["tasks"], list):
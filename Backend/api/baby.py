@@ -15,7 +15,10 @@ from datetime import datetime
 from fastapi.responses import JSONResponse
 from agents.baby_manager import get_baby_health_today
 from core.supabase import get_supabase
-from agents.baby_manager import call_gpt_baby_analysis
+from core.baby_rollup import get_daily_rollups_sync
+from fastapi.concurrency import run_in_threadpool
+from agents.baby_manager import call_gpt_baby_analysis, get_baby_features_today
+from core.baby_features import has_logs
 
 
 router = APIRouter()
@@ -52,73 +55,21 @@ def get_weekly_baby_summary(baby_id: str, user_id: str = Depends(get_current_use
         today = datetime.utcnow().date()
         start_date = today - timedelta(days=6)  # 包含今天，共7天
 
-        # Ensure logs_result is directly used as it returns a list of results
-        logs_result = supabase.query(
-            "baby_logs",
-            {"baby_id": baby_id}
-        )
-
-        # If the query is successful, logs_result will be a list of entries
-        daily_summary = {}
-        for row in logs_result:  # Directly iterate over the list
-            dt = datetime.fromisoformat(row["logged_at"])
-            day = dt.date().isoformat()
-            daily = daily_summary.setdefault(day, {
-                "date": day,
-                "feed_total_ml": 0,
-                "sleep_total_hours": 0,
-                "diaper_count": 0,
-                "bowel_count": 0,
-                "outside_total_minutes": 0,
-                "cry_total_minutes": 0
-            })
-
-            log_type = row["log_type"]
-            data = row["log_data"]
-
-            if log_type == "feeding":
-                amount = data.get("feedAmount", 0)
-                try:
-                    daily["feed_total_ml"] += int(amount)
-                except:
-                    pass
-
-            elif log_type == "sleep":
-                duration = data.get("duration", 0) / 3600  # 秒转小时
-                start = datetime.strptime(data.get('sleepStart'), "%H:%M")
-                end = datetime.strptime(data.get('sleepEnd'), "%H:%M")
-                daily["sleep_total_hours"] += (end - start).total_seconds() / 3600
-        
-
-            elif log_type == "diaper":
-                daily["diaper_count"] += 1
-                if data.get("diaperSolid") == True:
-                    daily["bowel_count"] += 1
-
-            elif log_type == "outside":
-                duration = data.get("outsideDuration", 0)
-                daily["outside_total_minutes"] += int(duration)
-
-            elif log_type == "cry":
-                duration = data.get("cryDuration", 0)
-                daily["cry_total_minutes"] += int(duration)
-
-        # Print statement for debugging
-        print("************************Weekly baby output", daily_summary)
-
-        # 补全空天数
-        output = []
-        for i in range(7):
-            day = (start_date + timedelta(days=i)).isoformat()
-            output.append(daily_summary.get(day, {
-                "date": day,
-                "feed_total_ml": 0,
-                "sleep_total_hours": 0,
-                "diaper_count": 0,
-                "bowel_count": 0,
-                "outside_total_minutes": 0,
-                "cry_total_minutes": 0
-            }))
+        # 每天一行的汇总表（baby_log_daily），不再逐条读取全部日志
+        rollups = get_daily_rollups_sync(supabase.client, baby_id, start_date, today)
+
+        output = [
+            {
+                "date": row["day"],
+                "feed_total_ml": row["feed_ml"],
+                "sleep_total_hours": round(row["sleep_minutes"] / 60, 2),
+                "diaper_count": row["diaper_count"],
+                "bowel_count": row["diaper_solid_count"] + row["bowel_count"],
+                "outside_total_minutes": row["outside_minutes"],
+                "cry_total_minutes": row["cry_minutes"]
+            }
+            for row in rollups
+        ]
         print("************************Weekly baby output", output)
         return {"success": True, "data": output}
 
@@ -129,7 +80,7 @@ def get_weekly_baby_summary(baby_id: str, user_id: str = Depends(get_current_use
 @router.get("/api/baby/health/daily", status_code=status.HTTP_200_OK)
 async def get_baby_health_daily(baby_id: str, user_id: str = Depends(get_current_user)):
     try:
-        analysis: Dict[str, Any] = get_baby_health_today(baby_id, supabase.client)
+        analysis: Dict[str, Any] = await run_in_threadpool(get_baby_health_today, baby_id, supabase.client)
         return {"success": True, "summary": analysis}
     except Exception as e:
         return JSONResponse(status_code=500, content={"success": False, "summary": str(e)})
@@ -137,19 +88,20 @@ async def get_baby_health_daily(baby_id: str, user_id: str = Depends(get_current
 
 
 @router.get("/api/baby/summary", status_code=status.HTTP_200_OK)
-def get_today_baby_summary(baby_id: str, user_id: str = Depends(get_current_user)):
+async def get_today_baby_summary(baby_id: str, user_id: str = Depends(get_current_user)):
     try:
-        data = get_baby_health_today(baby_id, supabase.client)
-        print(f"✅ 获取到的宝宝数据: {data}")
+        # 今天的记录压缩成固定大小的特征，prompt 大小不随记录条数增长
+        features = await run_in_threadpool(get_baby_features_today, baby_id, supabase.client)
+        print(f"✅ 获取到的宝宝数据特征: {features}")
 
-        if not data or all(len(v) == 0 for k, v in data.items() if k != "babyName"):
+        if not has_logs(features):
             return JSONResponse(
                 status_code=400,
                 content={"success": False, "summary": "今天没有记录"}
             )
 
         # 调用 GPT 分析
-        result = call_gpt_baby_analysis(baby_id, supabase.client)
+        result = await call_gpt_baby_analysis(baby_id, supabase.client, features)
         return {
             "success": True,
             "summary": result["summary"],
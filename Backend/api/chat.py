@@ -1,29 +1,33 @@
 from utils.emotion_utils import is_baby_milestone_tomorrow, count_consecutive_low_sleep, is_mom_birthday_today, days_since_baby_birth, get_baby_months_old, generate_celebration_text
 from datetime import date, timedelta, datetime
 from agents.emotionmanager.schema import EmotionAgentState
-from agents.emotionmanager.graph import build_emotion_graph
+from agents.graph_registry import graphs
 from fastapi import Body, Depends
-from fastapi.responses import JSONResponse
-from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, status
 from core.supabase import get_supabase
 from agents.mom_manager import get_mom_health_today
 from agents.baby_manager import get_baby_health_today
 from agents.emotionmanager.steps import get_baby_months_old
 from pydantic import BaseModel
 from typing import List, Dict, Optional
-from openai import OpenAI
 import os
+import json
 from dotenv import load_dotenv
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
-from core.supabase import SupabaseService, get_supabase
+from core.supabase import SupabaseService, get_supabase, AsyncSupabaseService, get_async_supabase
 from core.auth import get_current_user
+from core.write_behind import write_behind
+from core.chat_context import ChatContext, chat_context
+from core.prompt_budget import build_prompt
+from fastapi.concurrency import run_in_threadpool
 router = APIRouter()
-from agents.llm import call_gpt_json_newversion
+from agents.llm import call_gpt_json_newversion, stream_gpt_json_newversion
+from utils.gpt_parse import JsonFieldStream
 
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 supabase = get_supabase()
 security = HTTPBearer()
@@ -57,15 +61,15 @@ def estimate_score(emotion_label: str, target_emotion: str) -> int:
 
 @router.post("/api/chat/emotion", status_code=status.HTTP_200_OK)
 async def emotion_chat_handler(baby_id: str, user_id: str = Depends(get_current_user),
-    task_count: int = Body(default=0)):
+    task_count: int = Body(default=0), db: AsyncSupabaseService = Depends(get_async_supabase)):
     today = date.today()
 
     # 1. 获取 mom + baby + emotion_dates 数据
-    mom_data = get_mom_health_today(user_id, supabase)
-    baby_data = get_baby_health_today(baby_id, supabase)
+    mom_data = await run_in_threadpool(get_mom_health_today, user_id, supabase.client)
+    baby_data = await run_in_threadpool(get_baby_health_today, baby_id, supabase.client)
 
-    profile = supabase.table("emotion_dates") \
-        .select("*").eq("mom_id", user_id).eq("baby_id", baby_id).single().execute().data
+    profile = (await db.table("emotion_dates") \
+        .select("*").eq("mom_id", user_id).eq("baby_id", baby_id).single().execute()).data
 
     baby_birthday = profile["baby_birthday"]
     baby_name = profile.get("baby_nickname", "Your baby")
@@ -83,10 +87,10 @@ async def emotion_chat_handler(baby_id: str, user_id: str = Depends(get_current_
         baby_data=baby_data
     )
 
-    result = build_emotion_graph().invoke(state)
+    result = EmotionAgentState(**(await graphs.ainvoke("emotion", state)))
 
-    # 3. 插入情绪日志 emotion_log
-    supabase.table("emotion_log").insert({
+    # 3. 插入情绪日志 emotion_log（write-behind，不阻塞响应）
+    write_behind.enqueue("emotion_log", {
         "mom_id": user_id,
         "date": today.isoformat(),
         "emotion_label": result.emotion_label,
@@ -96,7 +100,7 @@ async def emotion_chat_handler(baby_id: str, user_id: str = Depends(get_current_
         "score_anxiety": estimate_score(result.emotion_label, "stressed"),
         "gentle_message": result.gentle_message,
         "celebration_text": result.celebration_text
-    }).execute()
+    })
 
     # 4. 判断明天是否宝宝满月
     from utils.emotion_utils import (
@@ -110,10 +114,10 @@ async def emotion_chat_handler(baby_id: str, user_id: str = Depends(get_current_
         celebration_pre_notice = f"🎂 Tomorrow is {baby_name}'s {months}-month milestone! Want a card ready?"
 
     # 5. 连续疲劳识别（睡眠<5.5 或 HRV<40）
-    weekly_data = supabase.table("mom_health") \
+    weekly_data = (await db.table("mom_health") \
         .select("sleep_hours, hrv, created_at") \
         .eq("mom_id", user_id).gte("created_at", (today - timedelta(days=7)).isoformat()) \
-        .order("created_at", desc=True).execute().data
+        .order("created_at", desc=True).execute()).data
 
     fatigue_days = count_consecutive_low_sleep(weekly_data)
     fatigue_reinforcement = ""
@@ -142,20 +146,18 @@ async def emotion_chat_handler(baby_id: str, user_id: str = Depends(get_current_
 @router.get("/chat/history", response_model=List[ChatMessage])
 async def get_chat_history(
     limit: int = 50,
-    supabase: SupabaseService = Depends(get_supabase),
+    supabase: AsyncSupabaseService = Depends(get_async_supabase),
     user_id: str = Depends(get_current_user)
 ):
     try:
-        result = (
-            supabase.client
-            .table("chat_logs")
-            .select("*")
+        return await (
+            supabase
+            .select("chat_logs", "message", "role", "timestamp", "emotion_label", "source", key=None)
             .eq("mom_id", user_id)
             .order("timestamp", desc=True)
             .limit(limit)
             .execute()
         )
-        return result.data or []
 
     except Exception as e:
         print(f"❌ /chat/history 错误: {e}")
@@ -163,27 +165,11 @@ async def get_chat_history(
     
 
 
-@router.post("/chat/send", response_model=ChatResponse)
-async def send_chat_message(
-    chat_message: ChatMessageCreate,
-    supabase: SupabaseService = Depends(get_supabase),
-    user_id: str = Depends(get_current_user)
-):
-    try:
-        # 1️⃣ 保存用户消息到 chat_logs
-        user_log = supabase.insert("chat_logs", {
-            "mom_id": user_id,
-            "role": "user",
-            "message": chat_message.message,
-            "source": "chatbot",
-            "timestamp": datetime.now().isoformat()
-        })
+CHAT_FALLBACK_MESSAGE = "🤖 抱歉，我现在无法理解你的意思"
+SSE_MEDIA_TYPE = "text/event-stream"
 
-        if not user_log:
-            raise HTTPException(status_code=500, detail="❌ Failed to insert user message")
 
-        # 2️⃣ 构建 prompt 并调用 GPT
-        prompt = f"""Mom says: "{chat_message.message}"
+CHAT_PROMPT_TEMPLATE = """{history}Mom says: "{message}"
         You are the mom's friend works for her physical and emotional health. keep her well and happy, let her know you are always there for her. and you are not only a mom, also yourself. 
         Reply with short, emotionally supportive sentence, **and** try to keep the conversation going but try not to ask too many questions.
         or even get start the conversation.
@@ -194,20 +180,84 @@ async def send_chat_message(
         If the input message is in Chinese, reply in Chinese.  
         Do not include any explanations, comments, or non-JSON output."""
 
-        response = call_gpt_json_newversion(prompt)
-        ai_message = response.get("message", "🤖 抱歉，我现在无法理解你的意思")
 
-        # 3️⃣ 保存 AI 回复
-        ai_log = supabase.insert("chat_logs", {
-            "mom_id": user_id,
-            "role": "assistant",
-            "message": ai_message,
-            "source": "chatbot",
-            "timestamp": datetime.now().isoformat()
-        })
+def _chat_prompt(message: str, context: Optional[ChatContext] = None) -> str:
+    # 对话上下文：滚动摘要 + 最近几条原文，token 有上限，长对话也不会让 prompt 变大
+    history = context.as_prompt() if context else ""
+    history = f"{history}\n\n        " if history else ""
+    return build_prompt("chat", CHAT_PROMPT_TEMPLATE, model="gpt-4o", history=history, message=message)
 
-        if not ai_log:
-            raise HTTPException(status_code=500, detail="❌ Failed to insert assistant message")
+
+def _save_chat_log(user_id: str, role: str, message: str):
+    """chat_logs 写入走 write-behind 队列，批量落库，不阻塞响应；同时更新对话上下文"""
+    chat_context.record(user_id, role, message)
+    write_behind.enqueue("chat_logs", {
+        "mom_id": user_id,
+        "role": role,
+        "message": message,
+        "source": "chatbot",
+        "timestamp": datetime.now().isoformat()
+    })
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _stream_chat_reply(chat_message: ChatMessageCreate, user_id: str, context: ChatContext) -> StreamingResponse:
+    """
+    SSE 版本的 /chat/send：
+      event: delta  data: {"delta": "..."}                 回复内容，边生成边发送
+      event: done   data: {"success": true, "message": "..."} 完整回复（和 ChatResponse 一样）
+      event: error  data: {"success": false, "message": "..."}
+    用户消息立即进入写入队列；AI 回复在流结束时进入队列。
+    """
+    _save_chat_log(user_id, "user", chat_message.message)
+
+    async def events():
+        parser = JsonFieldStream("message")
+        try:
+            async for chunk in stream_gpt_json_newversion(_chat_prompt(chat_message.message, context), endpoint="chat"):
+                delta = parser.feed(chunk)
+                if delta:
+                    yield _sse("delta", {"delta": delta})
+        except Exception as e:
+            print("❌ Chat stream error:", str(e))
+            yield _sse("error", {"success": False, "message": "🤖 出现错误，稍后再试"})
+            return
+        ai_message = parser.result().get("message") or CHAT_FALLBACK_MESSAGE
+        _save_chat_log(user_id, "assistant", ai_message)
+        yield _sse("done", {"success": True, "message": ai_message})
+
+    return StreamingResponse(
+        events(),
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/chat/send", response_model=ChatResponse)
+async def send_chat_message(
+    chat_message: ChatMessageCreate,
+    request: Request,
+    stream: bool = False,
+    user_id: str = Depends(get_current_user)
+):
+    """With `stream=true` or `Accept: text/event-stream` the reply is streamed as SSE (see _stream_chat_reply)."""
+    # 先取上下文（不含本条消息），再保存本条消息
+    context = await chat_context.get(user_id)
+    if stream or SSE_MEDIA_TYPE in request.headers.get("accept", ""):
+        return _stream_chat_reply(chat_message, user_id, context)
+    try:
+        # 1️⃣ 保存用户消息到 chat_logs
+        _save_chat_log(user_id, "user", chat_message.message)
+
+        # 2️⃣ 构建 prompt（带对话上下文）并调用 GPT
+        response = await call_gpt_json_newversion(_chat_prompt(chat_message.message, context), endpoint="chat")
+        ai_message = response.get("message", CHAT_FALLBACK_MESSAGE)
+
+        # 3️⃣ 保存 AI 回复
+        _save_chat_log(user_id, "assistant", ai_message)
 
         # 4️⃣ 返回响应
         return ChatResponse(success=True, message=ai_message)
@@ -220,12 +270,12 @@ async def send_chat_message(
 @router.post("/chat/save", response_model=ChatResponse)
 async def save_chat_message(
     chat_message: ChatMessageCreate,
-    supabase: SupabaseService = Depends(get_supabase),
+    supabase: AsyncSupabaseService = Depends(get_async_supabase),
     user_id: str = Depends(get_current_user)
 ):
     try:
         
-        result = supabase.insert("chat_logs", {
+        result = await supabase.insert("chat_logs", {
             "mom_id": user_id,
             "role": chat_message.role,
             "message": chat_message.message,
@@ -236,6 +286,7 @@ async def save_chat_message(
 
         if not result:
             raise HTTPException(status_code=500, detail="Failed to insert chat")
+        chat_context.record(user_id, chat_message.role, chat_message.message)
 
         return ChatResponse(success=True, message="Saved")
     except Exception as e:
@@ -1,20 +1,17 @@
 import os
 from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from agents.babymanager.steps import analyze_with_gpt_step
 from agents.babymanager.schema import BabyAgentState
-from supabase import create_client, Client
+from supabase import Client
+from core.supabase import get_supabase_client
 from dotenv import load_dotenv
 import jwt
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 load_dotenv()
 
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
-
-supabase: Client = create_client(supabase_url, supabase_key)
-
 router = APIRouter()
 
 security = HTTPBearer()
@@ -39,7 +36,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 
 
 @router.get("/dev/mock_analysis/{baby_id}")
-def get_mock_analysis(baby_id: str, user_id: str = Depends(get_current_user)):
+async def get_mock_analysis(baby_id: str, user_id: str = Depends(get_current_user), supabase: Client = Depends(get_supabase_client)):
     # mock_records = {
     #     "feed": [{"startTime": "08:00", "amount": 100}, {"startTime": "12:30", "amount": 90}],
     #     "sleep": [{"startTime": "10:00", "endTime": "11:00"}],
@@ -50,12 +47,14 @@ def get_mock_analysis(baby_id: str, user_id: str = Depends(get_current_user)):
     yesterday = datetime.now(timezone.utc) - timedelta(days=1)
     yesterday_iso = yesterday.isoformat()
 
-    response = supabase.table("baby_logs") \
-    .select("log_type, log_data") \
-    .eq("baby_id", baby_id) \
-    .gte("logged_at", yesterday_iso) \
-    .order("logged_at", desc=False) \
-    .execute()
+    response = await run_in_threadpool(
+        supabase.table("baby_logs") \
+        .select("log_type, log_data") \
+        .eq("baby_id", baby_id) \
+        .gte("logged_at", yesterday_iso) \
+        .order("logged_at", desc=False) \
+        .execute
+    )
 
     print(response);
 
@@ -67,7 +66,7 @@ def get_mock_analysis(baby_id: str, user_id: str = Depends(get_current_user)):
         next_action=""
     )
 
-    updated_state = analyze_with_gpt_step(state)
+    updated_state = await analyze_with_gpt_step(state)
 
     return {
         "summary": updated_state.analysis,
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Query, Depends
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from core.supabase import get_supabase
 from supabase import Client
-from agents.emotionmanager.graph import build_emotion_graph
+from agents.graph_registry import graphs
 from agents.emotionmanager.schema import EmotionAgentState
 from typing import Optional
 from datetime import date, datetime, timedelta
@@ -15,7 +16,9 @@ from dotenv import load_dotenv
 import jwt
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi import HTTPException, status
-from core.supabase import get_supabase
+from core.supabase import get_supabase, get_supabase_client, AsyncSupabaseService, get_async_supabase
+from core.baby_rollup import get_daily_rollups, get_daily_rollups_sync
+from core.task_stats import task_stats
 
 router = APIRouter()
 
@@ -47,25 +50,16 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 
 
 @router.get("/api/emotion/today", status_code=status.HTTP_200_OK)
-async def get_today_emotion(baby_id: str, user_id: str = Depends(get_current_user)):
+async def get_today_emotion(baby_id: str, user_id: str = Depends(get_current_user), db: AsyncSupabaseService = Depends(get_async_supabase)):
     try:
         today_str = date.today().isoformat()
 
-        # ✅ 0. 查询今天已完成任务数
-        main_result = (
-                supabase.table("tasks")
-                .select("task_id")
-                .eq("mom_id", user_id)
-                .eq("status", "completed")
-                .gte("complete_date", today_str)
-                .execute()
-            )
-        
-        task_count = len(main_result.data) + len(sub_result.data)
+        # ✅ 0. 今天已完成任务数（主任务和子任务都带 mom_id，一个 count 就够）
+        task_count = (await task_stats.get(db, user_id))["completed_today"]
 
         # ✅ 1. 查询 mom 健康数据
-        mom_profile = (
-            supabase
+        mom_profile = await (
+            db
             .table("mom_profiles")
             .select("id")
             .eq("id", user_id)
@@ -78,8 +72,8 @@ async def get_today_emotion(baby_id: str, user_id: str = Depends(get_current_use
 
         mom_id = mom_profile.data["id"]
 
-        mom_result = (
-            supabase
+        mom_result = await (
+            db
             .table("mom_health")
             .select("hrv, sleep_hours, resting_heart_rate, record_date")
             .eq("mom_id", mom_id)
@@ -94,30 +88,14 @@ async def get_today_emotion(baby_id: str, user_id: str = Depends(get_current_use
 
         mom = mom_result.data[0]
 
-        # ✅ 2. 查询 baby 今日日志
-        baby_logs = (
-            supabase
-            .table("baby_logs")
-            .select("log_type, log_data, logged_at")
-            .eq("baby_id", baby_id)
-            .gte("logged_at", today_str)
-            .execute()
-        ).data
-
+        # ✅ 2. 查询 baby 今日汇总（baby_log_daily）
+        today_rollup = (await get_daily_rollups(db, baby_id, today_str, today_str))[0]
         baby = {
-            "sleep_total_hours": 0,
-            "cry_total_minutes": 0
+            "sleep_total_hours": round(today_rollup["sleep_minutes"] / 60, 2),
+            "cry_total_minutes": today_rollup["cry_minutes"]
         }
-        for row in baby_logs:
-            log_type = row["log_type"]
-            data = row["log_data"]
-            if log_type == "sleep":
-                baby["sleep_total_hours"] += data.get("duration", 0) / 3600  # 秒转小时
-            elif log_type == "cry":
-                baby["cry_total_minutes"] += data.get("duration_minutes", 0)
 
         # ✅ 3. 构建 LangGraph Emotion Agent
-        graph = build_emotion_graph()
         state = EmotionAgentState(
             user_id=user_id,
             baby_id=baby_id,
@@ -126,7 +104,7 @@ async def get_today_emotion(baby_id: str, user_id: str = Depends(get_current_use
             baby_data=baby
         )
 
-        result = await graph.ainvoke(state)
+        result = await graphs.ainvoke("emotion", state)
         result_dict = dict(result)
 
         return {
@@ -154,10 +132,12 @@ def get_emotion_card(user_id: str, baby_id: str):
     }
 
 @router.get("/api/emotion/card")
-def get_emotion_card(user_id: str, baby_id: str, supabase: Client = Depends(get_supabase)):
+async def get_emotion_card(user_id: str, baby_id: str, supabase: Client = Depends(get_supabase_client)):
     try:
         # 获取 emotion_dates
-        profile = supabase.table("emotion_dates").select("*").eq("mom_id", user_id).eq("baby_id", baby_id).single().execute().data
+        profile = (await run_in_threadpool(
+            supabase.table("emotion_dates").select("*").eq("mom_id", user_id).eq("baby_id", baby_id).single().execute
+        )).data
         
         baby_name = profile["baby_nickname"]
         baby_birthday = profile["baby_birthday"]
@@ -169,7 +149,7 @@ def get_emotion_card(user_id: str, baby_id: str, supabase: Client = Depends(get_
 
         # 生成祝福语
         message = generate_celebration_text(baby_name, months_old)
-        image_url = generate_emotion_card_image(message, months_old, baby_name)
+        image_url = await generate_emotion_card_image(message, months_old, baby_name)
 
         return {
             "success": True,
@@ -191,7 +171,7 @@ def get_emotion_scrapbook(user_id: str, supabase: Client = Depends(get_supabase)
     return {"success": True, "data": logs}
 
 @router.get("/api/emotion/trend")
-def get_emotion_trend(user_id: str, baby_id: str, supabase: Client = Depends(get_supabase)):
+def get_emotion_trend(user_id: str, baby_id: str, supabase: Client = Depends(get_supabase_client)):
     today = date.today()
     start_date = today - timedelta(days=7)
 
@@ -202,23 +182,11 @@ def get_emotion_trend(user_id: str, baby_id: str, supabase: Client = Depends(get
         .gte("created_at", start_date.isoformat()) \
         .order("created_at").execute().data
 
-    # baby logs
-    logs = supabase.table("baby_logs") \
-        .select("log_type, log_data, logged_at") \
-        .eq("baby_id", baby_id) \
-        .gte("logged_at", start_date.isoformat()) \
-        .execute().data
-
-    # baby logs 聚合
-    baby_summary = {}
-    for row in logs:
-        day = row["logged_at"][:10]
-        if day not in baby_summary:
-            baby_summary[day] = {"cry": 0, "sleep": 0}
-        if row["log_type"] == "cry":
-            baby_summary[day]["cry"] += row["log_data"].get("duration_minutes", 0)
-        if row["log_type"] == "sleep":
-            baby_summary[day]["sleep"] += row["log_data"].get("duration", 0) / 3600  # 秒转小时
+    # baby 每日汇总（baby_log_daily）
+    baby_summary = {
+        row["day"]: {"cry": row["cry_minutes"], "sleep": round(row["sleep_minutes"] / 60, 2)}
+        for row in get_daily_rollups_sync(supabase, baby_id, start_date, today)
+    }
 
     # 汇总对照数据
     result = []
@@ -6,7 +6,7 @@ from dotenv import load_dotenv
 import os
 import logging
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from core.supabase import get_supabase, SupabaseService
+from core.supabase import get_supabase, SupabaseService, AsyncSupabaseService, get_async_supabase
 from core.auth import get_current_user
 
 load_dotenv()
@@ -31,10 +31,10 @@ class SaveUserFeaturesRequest(BaseModel):
 # ----------------------
 
 @router.post("/api/saveUserFeatures", status_code=status.HTTP_201_CREATED)
-async def save_user_features(payload: SaveUserFeaturesRequest, supabase: SupabaseService = Depends(get_supabase)):
+async def save_user_features(payload: SaveUserFeaturesRequest, supabase: AsyncSupabaseService = Depends(get_async_supabase)):
     try:
         # 1. 删除该用户的所有已选feature
-        delete_query = supabase.client.table("settings").delete().eq("mom_id", payload.userId).execute()
+        delete_query = await supabase.table("settings").delete().eq("mom_id", payload.userId).execute()
         logger.debug(f"Delete response: {delete_query}")
 
         # 2. 插入新的feature选择
@@ -47,7 +47,7 @@ async def save_user_features(payload: SaveUserFeaturesRequest, supabase: Supabas
         ]
         
         if insert_data:  # 只在有数据时执行插入
-            res = supabase.client.table("settings").insert(insert_data).execute()
+            res = await supabase.table("settings").insert(insert_data).execute()
             logger.debug(f"Insert response: {res}")
 
         return {"success": True, "message": "Features saved"}
@@ -60,10 +60,10 @@ async def save_user_features(payload: SaveUserFeaturesRequest, supabase: Supabas
 # ----------------------
 
 @router.get("/api/getUserFeatures")
-async def get_user_features(user_id: str = Depends(get_current_user), supabase: SupabaseService = Depends(get_supabase)):
+async def get_user_features(user_id: str = Depends(get_current_user), supabase: AsyncSupabaseService = Depends(get_async_supabase)):
     try:
         # 从settings表获取用户选择的features
-        res = supabase.client.table("settings").select("feature_id").eq("mom_id", user_id).execute()
+        res = await supabase.table("settings").select("feature_id").eq("mom_id", user_id).execute()
         logger.debug(f"Get features response: {res}")
 
         if not res or not hasattr(res, 'data'):
@@ -80,13 +80,13 @@ async def get_user_features(user_id: str = Depends(get_current_user), supabase:
 # Recommend Features based on age
 # ----------------------
 @router.get("/api/recommendFeatures")
-async def recommend_features(ageInMonths: int, supabase: SupabaseService = Depends(get_supabase)):
+async def recommend_features(ageInMonths: int, supabase: AsyncSupabaseService = Depends(get_async_supabase)):
     try:
         logger.info(f"Querying features for age: {ageInMonths} months")
-        query = supabase.client.table("features").select("*").lte("age_min", ageInMonths).gte("age_max", ageInMonths)
+        query = supabase.table("features").select("*").lte("age_min", ageInMonths).gte("age_max", ageInMonths)
         logger.debug(f"Query built: {query}")
         
-        res = query.execute()
+        res = await query.execute()
         logger.debug(f"Query response: {res}")
 
         if not res or not hasattr(res, 'data'):
@@ -1,35 +1,38 @@
 # ✅ api/mom.py
 from fastapi import APIRouter, Depends, Query, HTTPException, status
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from supabase import create_client, Client
+from supabase import Client
 from core.auth import get_current_user
-from core.supabase import get_supabase
-from typing import Dict, Any
+from core.supabase import get_supabase, get_supabase_client, AsyncSupabaseService, get_async_supabase
+from core.metrics import metrics
+from core.mom_sentences import mom_sentences
+from core.task_stats import task_stats
+from typing import Dict, Any, Awaitable
 from supabase import Client
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from dotenv import load_dotenv
 import jwt
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import os
-import random
+import asyncio
 # LangGraph 结构分析
 from agents.mommanager.graph import build_mom_manager_graph
 from agents.mommanager.schema import MomAgentState
 
 # GPT 分析（温柔鼓励）
-from agents.mom_manager import call_gpt_mom_analysis, get_mom_health_today, call_gpt_mom_onesentence
+from agents.mom_manager import call_gpt_mom_analysis, get_mom_health_today, call_gpt_mom_onesentence, mom_health_fields
 
 load_dotenv()
 
-router = APIRouter()
-
+# /api/mom/onesentence 的数据查询总时长预算，超时的查询用默认值代替
+MOM_ONESENTENCE_BUDGET_MS = int(os.getenv("MOM_ONESENTENCE_BUDGET_MS", "800"))
+MOM_PROFILE_COLUMNS = ("display_name", "last_period_start_date", "average_cycle_days", "period_tracking_enabled")
 
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
+router = APIRouter()
 
-supabase: Client = create_client(supabase_url, supabase_key)
 
 router = APIRouter()
 
@@ -91,8 +94,15 @@ def check_period_expected(user_id: str, supabase) -> bool:
             .single() \
             .execute()
 
-        profile_data = mom_profile.data
+        return period_expected_from_profile(mom_profile.data)
+
+    except Exception as e:
+        print(f"Error checking period expected: {e}")
+        return False
 
+def period_expected_from_profile(profile_data: dict) -> bool:
+    """check_period_expected 的计算部分：profile 需要包含 MOM_PROFILE_COLUMNS 里的经期字段"""
+    try:
         if not profile_data or not profile_data.get("period_tracking_enabled"):
             return False
 
@@ -167,61 +177,57 @@ def get_mom_mood_tag(health_data: dict, period_expected: bool = False, pending_t
     # 6. 正常情况
     return "normal"
 
+async def _gather_within_budget(fetches: Dict[str, Awaitable], defaults: Dict[str, Any], budget_ms: int) -> Dict[str, Any]:
+    """并发执行所有查询；失败或超出预算的查询返回对应的默认值（不会拖慢整个请求）"""
+    tasks = {name: asyncio.ensure_future(fetch) for name, fetch in fetches.items()}
+    done, pending = await asyncio.wait(tasks.values(), timeout=budget_ms / 1000)
+    for task in pending:
+        task.cancel()
+    results = {}
+    for name, task in tasks.items():
+        if task in done and task.exception() is None:
+            results[name] = task.result()
+            continue
+        reason = "timeout" if task in pending else "error"
+        print(f"⚠️ onesentence 查询 {name} {reason}: {'' if task in pending else task.exception()}，使用默认值")
+        metrics.increment("mom_onesentence.degraded", part=name, reason=reason)
+        results[name] = defaults[name]
+    return results
+
+async def _maybe_row(query) -> Dict[str, Any]:
+    result = await query.maybe_single().execute()
+    return (result.data if result else None) or {}
+
 @router.get("/api/mom/onesentence", response_model=MomOneSentenceResponse, status_code=status.HTTP_200_OK)
-def get_today_mom_onesentence(user_id: str = Depends(get_current_user)):
+async def get_today_mom_onesentence(user_id: str = Depends(get_current_user), db: AsyncSupabaseService = Depends(get_async_supabase)):
     try:
-        # 1. 获取妈妈的健康数据
-        health_data = get_mom_health_today(user_id, supabase)
-
-        # 2. 检查period是否即将来
-        period_expected = check_period_expected(user_id, supabase)
-
-        # 3. 获取今天的pending任务数量（如果有）
-        pending_tasks_query = supabase.table("tasks")\
-            .select("*") \
-            .eq("mom_id", user_id) \
-            .eq("status", "pending") \
-            .execute()
-        pending_tasks = len(pending_tasks_query.data)if pending_tasks_query.data else 0
-     
-
-        completed_task_query = supabase.table("tasks")\
-            .select("*") \
-            .eq("mom_id", user_id) \
-            .eq("status", "completed") \
-            .eq("created_at", datetime.utcnow().date()) \
-            .execute()
-        completed_tasks_today = len(completed_task_query.data) if completed_task_query.data else 0
-    
-        # 4. 推断mood_tag
-        mood_tag = get_mom_mood_tag(health_data.get("data", {}), period_expected, pending_tasks, completed_tasks_today)
-
-        # 5. 获取妈妈名字
-        mom_profile = supabase.table("mom_profiles") \
-            .select("display_name") \
-            .eq("id", user_id) \
-            .single() \
-            .execute()
-        mom_name = mom_profile.data.get("display_name", "Mom")
+        # 所有查询互不依赖，并发执行，总时长受 MOM_ONESENTENCE_BUDGET_MS 限制
+        data = await _gather_within_budget(
+            {
+                # 1. 妈妈今天的健康数据
+                "health": _maybe_row(db.table("mom_health").select("*").eq("mom_id", user_id).eq("record_date", date.today().isoformat())),
+                # 2. 名字 + 经期字段（一次 profile 查询）
+                "profile": _maybe_row(db.table("mom_profiles").select(*MOM_PROFILE_COLUMNS).eq("id", user_id)),
+                # 3. pending 任务数 / 今天完成的任务数（count-only 查询，按天缓存）
+                "task_stats": task_stats.get(db, user_id),
+                # 4. 句子模板在内存索引里，只有过期时才会重新加载
+                "sentences": mom_sentences.ensure_loaded(db),
+            },
+            defaults={"health": {}, "profile": {}, "task_stats": {}, "sentences": None},
+            budget_ms=MOM_ONESENTENCE_BUDGET_MS,
+        )
 
-        # 6. 根据mood_tag去mom_sentences表随机拿一句话
-        sentence_query = supabase.table("mom_sentences") \
-            .select("message_template") \
-            .eq("mood_tag", mood_tag) \
-            .execute()
-        sentences = sentence_query.data
-        
-        if not sentences or len(sentences) == 0:
-            fallback_query = supabase.table("mom_sentences") \
-                .select("message_template") \
-                .eq("mood_tag", "normal") \
-                .execute()
-            sentences = fallback_query.data
-
-        # 8. 如果有句子，从中随机选一条
-        if sentences and len(sentences) > 0:
-            selected = random.choice(sentences)
-            message = selected["message_template"].replace("{name}", mom_name)
+        # 5. 推断mood_tag
+        health_data = mom_health_fields(data["health"]) if data["health"] else {}
+        period_expected = period_expected_from_profile(data["profile"])
+        stats = data["task_stats"]
+        mood_tag = get_mom_mood_tag(health_data, period_expected, stats.get("pending", 0), stats.get("completed_today", 0))
+        mom_name = data["profile"].get("display_name") or "Mom"
+
+        # 6. 根据mood_tag加权随机拿一句（没有就用 normal 的句子，避开这个用户最近看过的）
+        template = mom_sentences.pick(mood_tag, user_id)
+        if template:
+            message = template.replace("{name}", mom_name)
         else:
             # 极端fallback：固定鼓励句子
             message = f"Hey {mom_name}, you're doing amazing today! ✨"
@@ -234,9 +240,9 @@ def get_today_mom_onesentence(user_id: str = Depends(get_current_user)):
 
 # ✅ 1. GPT 文本分析（用于 summary）
 @router.get("/api/mom/summary", response_model=MomAnalysisResponse, status_code=status.HTTP_200_OK)
-def get_today_mom_summary(user_id: str = Depends(get_current_user)):
+async def get_today_mom_summary(user_id: str = Depends(get_current_user), supabase: Client = Depends(get_supabase_client)):
     try:
-        data = get_mom_health_today(user_id, supabase)
+        data = await run_in_threadpool(get_mom_health_today, user_id, supabase)
         print(f"获取到的健康数据：{data}")
         
         if not data.get("success"):
@@ -262,7 +268,7 @@ def get_today_mom_summary(user_id: str = Depends(get_current_user)):
         }
         print(f"发送给 GPT 的数据：{prompt_input}")
         
-        analysis = call_gpt_mom_analysis(prompt_input)
+        analysis = await call_gpt_mom_analysis(prompt_input)
         return {"success": True, "summary": analysis}
     except Exception as e:
         print(f"发生错误：{str(e)}")
@@ -271,7 +277,7 @@ def get_today_mom_summary(user_id: str = Depends(get_current_user)):
 
 ######### ✅ 2. 每日健康数据（图表卡片用）
 @router.get("/api/mom/health/daily", status_code=status.HTTP_200_OK)
-def get_mom_health_daily(user_id: str = Depends(get_current_user)):
+def get_mom_health_daily(user_id: str = Depends(get_current_user), supabase: Client = Depends(get_supabase_client)):
     try:
         print(f"👩 正在获取 mom health，用户 ID: {user_id}")
         result = get_mom_health_today(user_id, supabase)
@@ -306,7 +312,7 @@ def get_mom_health_daily(user_id: str = Depends(get_current_user)):
     
 # ✅ 3. 每周健康趋势图表
 @router.get("/api/mom/health/weekly", status_code=status.HTTP_200_OK)
-def get_mom_weekly_health(user_id: str = Depends(get_current_user)):
+def get_mom_weekly_health(user_id: str = Depends(get_current_user), supabase: Client = Depends(get_supabase_client)):
     try:
         today = datetime.utcnow().date()
         start_date = today - timedelta(days=6)
@@ -362,7 +368,7 @@ def get_mom_weekly_health(user_id: str = Depends(get_current_user)):
 
 
 #@router.get("/api/mom/onesentence", response_model=MomOneSentenceResponse, status_code=status.HTTP_200_OK)
-# def get_today_mom_onesentence(user_id: str = Depends(get_current_user)):
+# def get_today_mom_onesentence(user_id: str = Depends(get_current_user), supabase: Client = Depends(get_supabase_client)):
 #     try:
 #         # 1. 获取妈妈的健康数据
 #         data = get_mom_health_today(user_id, supabase)
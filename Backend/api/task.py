@@ -1,14 +1,19 @@
 # api/task.py
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
 import jwt
+import json
+import asyncio
+import hashlib
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 from typing import Optional, Dict, Any, List
 from dotenv import load_dotenv
 import os
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from core.supabase import get_supabase
+from core.supabase import get_supabase, AsyncSupabaseService, get_async_supabase, encode_cursor, decode_cursor
+from core.task_stats import task_stats
 # 直接引入 graph 和输入定义
 from agents.task_manager import run_task_manager
 from agents.llm import detect_task_category
@@ -17,6 +22,12 @@ from datetime import datetime, timezone
 load_dotenv()
 supabase = get_supabase()
 
+# /api/task/incomplete 分页：主任务按 (created_at, task_id) keyset 翻页
+TASKS_MAX_PAGE_SIZE = 200
+# 子任务按 parent_id IN (...) 批量查询，每批最多这么多个父任务（控制 URL 长度）
+SUBTASK_PARENT_BATCH = 100
+SUBTASK_COLUMNS = ("task_id", "parent_id", "title", "status")
+
 router = APIRouter()
 
 security = HTTPBearer()
@@ -75,6 +86,9 @@ class TaskUpdateRequest(BaseModel):
     main_task: TaskUpdate
     sub_tasks: List[TaskUpdate]
 
+class TaskBulkUpdateRequest(BaseModel):
+    tasks: List[TaskUpdate] = Field(..., min_length=1, max_length=500)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         token = credentials.credentials
@@ -100,9 +114,12 @@ async def create_task_from_gpt(req: GPTTaskRequest = Body(...), user_id: str = D
     """
     # 1️⃣ 直接调用任务管理器的 run_task_manager 函数
     # 调用 runner 获取任务输出
-    result = run_task_manager(req.model_dump())
+    # 任务拆分和分类互不依赖，两个 GPT 请求并发执行
+    result, category = await asyncio.gather(
+        run_task_manager(req.model_dump()),
+        detect_task_category(req.input_text),
+    )
     task_output = result["task_output"]
-    category = detect_task_category(req.input_text)
     tasks = task_output["tasks"]
 
     if not isinstance(tasks, list) or not tasks:
@@ -151,62 +168,145 @@ def save_task(request: SaveTaskRequest, user_id: str = Depends(get_current_user)
     if subtask_payloads:
         subInserts = supabase.client.table("tasks").insert(subtask_payloads).execute()
 
+    task_stats.invalidate(user_id)
+
     return {"success": True}
 
 @router.post("/api/task/update")
-async def update_task_status_api(req: TaskUpdateRequest = Body(...)):
-    try:
-        update_task_status(req.main_task)
-        for sub in req.sub_tasks:
-            update_task_status(sub)
-        return {"success": True, "message": "All tasks updated successfully"}
-    except Exception as e:
-        return {"success": False, "message": str(e)}
-
-def update_task_status(task):
-    status = "completed" if task.done else "pending"
-    update_data = {"status": status}
-    if status == "completed":
-        update_data["complete_date"] = datetime.utcnow().isoformat()
+async def update_task_status_api(req: TaskUpdateRequest = Body(...), user_id: str = Depends(get_current_user), db: AsyncSupabaseService = Depends(get_async_supabase)):
+    results = await update_task_statuses([req.main_task, *req.sub_tasks], user_id, db)
+    failed = [r for r in results if not r["updated"]]
+    if failed:
+        return {"success": False, "message": f"{len(failed)} of {len(results)} tasks were not updated", "results": results}
+    return {"success": True, "message": "All tasks updated successfully", "results": results}
+
+@router.post("/api/task/update/bulk")
+async def update_task_status_bulk(req: TaskBulkUpdateRequest = Body(...), user_id: str = Depends(get_current_user), db: AsyncSupabaseService = Depends(get_async_supabase)):
+    """任意一组任务的完成状态批量更新，每个任务单独返回结果"""
+    results = await update_task_statuses(req.tasks, user_id, db)
+    return {"success": all(r["updated"] for r in results), "results": results}
+
+async def update_task_statuses(tasks: List[TaskUpdate], user_id: str, db: AsyncSupabaseService) -> List[Dict[str, Any]]:
+    """
+    按目标状态分组，每组一条 `task_id IN (...)` 的 update（只更新当前用户的任务）。
+    Returns one result per input item, in order: {"id", "done", "updated", "error"?}.
+    """
+    groups: Dict[bool, List[str]] = {}
+    for task in tasks:
+        groups.setdefault(task.done, [])
+        if task.id not in groups[task.done]:
+            groups[task.done].append(task.id)
+
+    async def apply(done: bool, task_ids: List[str]):
+        update_data = {"status": "completed" if done else "pending"}
+        if done:
+            update_data["complete_date"] = datetime.now(timezone.utc).isoformat()
+        result = await db.table("tasks").update(update_data).in_("task_id", task_ids).eq("mom_id", user_id).execute()
+        return {row["task_id"] for row in result.data or []}
+
+    outcomes = await asyncio.gather(*(apply(done, ids) for done, ids in groups.items()), return_exceptions=True)
+    task_stats.invalidate(user_id)
+    updated_by_status = dict(zip(groups, outcomes))
+
+    results = []
+    for task in tasks:
+        outcome = updated_by_status[task.done]
+        result = {"id": task.id, "done": task.done, "updated": False}
+        if isinstance(outcome, Exception):
+            print(f"❌ 更新任务状态失败 {task.id}: {str(outcome)}")
+            result["error"] = str(outcome)
+        elif task.id in outcome:
+            result["updated"] = True
+        else:
+            result["error"] = "Task not found"
+        results.append(result)
+    return results
+
+async def _load_subtasks(parent_ids: List[str], db: AsyncSupabaseService) -> Dict[str, List[SubTask]]:
+    """所有父任务的未完成子任务：parent_id IN (...) 批量查询，再按 parent_id 建索引"""
+    by_parent: Dict[str, List[SubTask]] = {parent_id: [] for parent_id in parent_ids}
+    batches = [parent_ids[i:i + SUBTASK_PARENT_BATCH] for i in range(0, len(parent_ids), SUBTASK_PARENT_BATCH)]
+    results = await asyncio.gather(*(
+        db.select("tasks", *SUBTASK_COLUMNS, key="task_id")
+        .in_("parent_id", batch)
+        .neq("status", "completed")
+        .order("created_at")
+        .execute()
+        for batch in batches
+    ))
+    for rows in results:
+        for subtask in rows:
+            by_parent[subtask["parent_id"]].append(SubTask(
+                id=subtask["task_id"],
+                text=subtask["title"],
+                done=subtask["status"] == "completed"
+            ))
+    return by_parent
 
-    return supabase.client.table("tasks").update(update_data).eq("task_id", task.id).execute()
+def _task_list_etag(tasks: List[Task], next_cursor: Optional[str]) -> str:
+    payload = json.dumps([jsonable_encoder(tasks), next_cursor], sort_keys=True, ensure_ascii=False)
+    return f'W/"{hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]}"'
 
 @router.get("/api/task/incomplete", response_model=List[Task])
-async def get_incomplete_tasks(user_id: str = Depends(get_current_user)):
+async def get_incomplete_tasks(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=TASKS_MAX_PAGE_SIZE),
+    user_id: str = Depends(get_current_user),
+    db: AsyncSupabaseService = Depends(get_async_supabase)
+):
     """
     Get all incomplete tasks and their subtasks for the current user.
+
+    Two round trips regardless of the number of tasks: one for the main tasks and one
+    (per SUBTASK_PARENT_BATCH parents) for their subtasks. With `limit` the main tasks
+    are paged and the next page's cursor is sent in `X-Next-Cursor`. The response has
+    an ETag; a matching `If-None-Match` gets 304 Not Modified.
     """
     # Fetch main tasks that are not completed and belong to the user
-    main_tasks_response = supabase.client.table("tasks").select("*").eq("mom_id", user_id).neq("status", "completed").is_("parent_id", None).execute()
-    main_tasks_data = main_tasks_response.data
-
-    incomplete_tasks: List[Task] = []
-
-    for main_task in main_tasks_data:
-        # Fetch subtasks for the current main task that are not completed
-        subtasks_response = supabase.client.table("tasks").select("*").eq("parent_id", main_task["task_id"]).neq("status", "completed").execute()
-        subtasks_data = subtasks_response.data
-
-        subtasks_list: List[SubTask] = [
-            SubTask(
-                id=subtask["task_id"],
-                text=subtask["title"],
-                done=subtask["status"] == "completed"
-            ) for subtask in subtasks_data
-        ]
-
-        incomplete_tasks.append(
-            Task(
-                id=main_task["task_id"],
-                text=main_task["title"],
-                type=main_task["category"], # Assuming 'category' field exists in your tasks table
-                done=main_task["status"] == "completed",
-                subTasks=subtasks_list,
-                title=main_task["title"],
-                description=main_task.get("description", ""), # Assuming 'description' field might exist
-                created_at=main_task["created_at"],
-                completed=main_task["status"] == "completed"
-            )
+    query = (
+        db.select("tasks", "*", key="task_id")
+        .eq("mom_id", user_id)
+        .neq("status", "completed")
+        .is_("parent_id", None)
+        .order("created_at")
+    )
+    if cursor:
+        try:
+            query = query.after(decode_cursor(cursor, ("created_at", "task_id")))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if limit:
+        query = query.limit(limit)
+        main_tasks_data = await query.execute()
+        next_cursor = encode_cursor(query.next_cursor(main_tasks_data))
+    else:
+        main_tasks_data = [task async for task in query]
+        next_cursor = None
+
+    subtasks_by_parent = await _load_subtasks([task["task_id"] for task in main_tasks_data], db)
+
+    incomplete_tasks: List[Task] = [
+        Task(
+            id=main_task["task_id"],
+            text=main_task["title"],
+            type=main_task["category"], # Assuming 'category' field exists in your tasks table
+            done=main_task["status"] == "completed",
+            subTasks=subtasks_by_parent[main_task["task_id"]],
+            title=main_task["title"],
+            description=main_task.get("description") or "", # Assuming 'description' field might exist
+            created_at=main_task["created_at"],
+            completed=main_task["status"] == "completed"
         )
-
+        for main_task in main_tasks_data
+    ]
+
+    etag = _task_list_etag(incomplete_tasks, next_cursor)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
     return incomplete_tasks
@@ -39,11 +39,27 @@ class TimelineItem(BaseModel):
         return data
 
 
+TIMELINE_COLUMNS = ("id", "baby_id", "user_id", "date", "title", "emoji", "description", "image_url", "created_at")
+
+
 @router.get("/api/timeline", status_code=200)
-def get_timeline(baby_id: str = Query(...), supabase: SupabaseService = Depends(get_supabase)):
+def get_timeline(
+    baby_id: str = Query(...),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    supabase: SupabaseService = Depends(get_supabase)
+):
     try:
         logger.info(f"Fetching timeline for baby_id: {baby_id}")
-        result = supabase.query("timeline", {"baby_id": baby_id})
+        result = (
+            supabase.select("timeline", *TIMELINE_COLUMNS)
+            .eq("baby_id", baby_id)
+            .between("date", start_date, end_date)
+            .order("date")
+            .limit(limit)
+            .execute()
+        )
         logger.info(f"Found {len(result)} timeline items")
         return result
     except Exception as e:
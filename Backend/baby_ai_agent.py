@@ -1,6 +1,7 @@
 import os
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Any
+from bisect import bisect_left, insort
+from typing import List, Dict, Any, Tuple, Optional, Callable
 from supabase import Client, create_client
 from dotenv import load_dotenv
 
@@ -8,6 +9,17 @@ from models import ReminderCreate, BabyLogCreate
 
 load_dotenv()
 
+# Define typical intervals (these should ideally be configurable per baby).
+# 'sleep' logs mark the *end* of a sleep period, so its interval is time since waking up.
+REMINDER_INTERVALS = {
+    "feeding": timedelta(hours=2),
+    "diaper": timedelta(hours=2),
+    "sleep": timedelta(hours=2),
+}
+
+# An open reminder within this distance of the expected time counts as a duplicate
+DEDUP_BUFFER = timedelta(hours=1)
+
 class BabyAIAgent:
     """
     Agent responsible for analyzing baby logs and generating reminders.
@@ -23,29 +35,89 @@ class BabyAIAgent:
             raise ValueError("Supabase client must be provided.")
         self.supabase = supabase_client
 
+    def _fetch_all(self, build_query, page_size: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Runs a query page by page with `range()` so large result sets are not
+        truncated by PostgREST's max-rows limit.
+
+        Args:
+            build_query: Callable returning a fresh, ordered query builder.
+            page_size: Rows per request.
+        """
+        rows: List[Dict[str, Any]] = []
+        offset = 0
+        while True:
+            page = build_query().range(offset, offset + page_size - 1).execute().data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            offset += page_size
+
     def _fetch_recent_logs(self, baby_id: str, lookback_hours: int = 48) -> List[Dict[str, Any]]:
         """
         Fetches baby logs within a specified lookback period.
 
         Args:
             baby_id: The ID of the baby.
-            lookback_hours: How many hours back to fetch logs (default: 24).
+            lookback_hours: How many hours back to fetch logs (default: 48).
 
         Returns:
             A list of baby log dictionaries, ordered by logged_at descending.
         """
+        return self._fetch_recent_logs_batch([baby_id], lookback_hours).get(baby_id, [])
+
+    def _fetch_recent_logs_batch(self, baby_ids: List[str], lookback_hours: int = 48) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Fetches the reminder-relevant logs of a whole batch of babies in one query.
+
+        Args:
+            baby_ids: The IDs of the babies.
+            lookback_hours: How many hours back to fetch logs (default: 48).
+
+        Returns:
+            A dict of baby_id -> logs, each list ordered by logged_at descending.
+
+        Raises:
+            Exception: If the query fails, so the whole batch is reported as failed
+                instead of as babies without logs.
+        """
         try:
             time_threshold = datetime.now(timezone.utc) - timedelta(hours=lookback_hours)
-            result = self.supabase.table("baby_logs") \
-                .select("*") \
-                .eq("baby_id", baby_id) \
-                .gte("logged_at", time_threshold.isoformat()) \
-                .order("logged_at", desc=True) \
-                .execute()
-            return result.data if result.data else []
+            rows = self._fetch_all(lambda: self.supabase.table("baby_logs")
+                .select("id, baby_id, log_type, logged_at")
+                .in_("baby_id", baby_ids)
+                .in_("log_type", list(REMINDER_INTERVALS))
+                .gte("logged_at", time_threshold.isoformat())
+                .order("logged_at", desc=True)
+                .order("id"))
         except Exception as e:
-            print(f"Error fetching recent logs for baby {baby_id}: {e}")
-            return []
+            print(f"Error fetching recent logs for {len(baby_ids)} babies: {e}")
+            raise
+
+        logs_by_baby: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            logs_by_baby.setdefault(row["baby_id"], []).append(row)
+        return logs_by_baby
+
+    def prefetch_open_reminders(self, baby_ids: List[str], window_start: datetime, window_end: datetime) -> "ReminderIndex":
+        """
+        Loads every open reminder of the given babies inside [window_start, window_end]
+        with a single query and indexes it for in-memory dedup.
+        """
+        index = ReminderIndex()
+        if not baby_ids:
+            return index
+        rows = self._fetch_all(lambda: self.supabase.table("reminders")
+            .select("id, baby_id, reminder_type, reminder_time")
+            .in_("baby_id", baby_ids)
+            .eq("is_completed", False)
+            .gte("reminder_time", window_start.isoformat())
+            .lte("reminder_time", window_end.isoformat())
+            .order("reminder_time")
+            .order("id"))
+        for row in rows:
+            index.add(row["baby_id"], row["reminder_type"], _parse_time(row["reminder_time"]))
+        return index
 
     def generate_reminders_from_baby_logs(self, baby_id: str, current_time: datetime) -> List[Dict[str, Any]]:
         """
@@ -58,76 +130,100 @@ class BabyAIAgent:
         Returns:
             A list of newly created reminder dictionaries.
         """
-        print(f"Generating reminders for baby {baby_id} at {current_time.isoformat()}")
-        recent_logs = self._fetch_recent_logs(baby_id)
-        if not recent_logs:
-            print(f"No recent logs found for baby {baby_id}. Cannot generate reminders.")
-            return []
+        return self.generate_reminders_for_babies([baby_id], current_time).get(baby_id, [])
+
+    def generate_reminders_for_babies(
+        self,
+        baby_ids: List[str],
+        current_time: datetime,
+        on_latest: Optional[Callable[[str, Dict[str, datetime]], None]] = None,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Generates reminders for a batch of babies with a constant number of queries:
+        one for recent logs, one for open reminders (dedup) and one bulk insert.
+
+        Args:
+            baby_ids: The UUIDs of the babies.
+            current_time: The timestamp at the time of generation (should be timezone-aware, preferably UTC).
+            on_latest: Optional callback receiving (baby_id, latest log time per type),
+                used to seed the incremental reminder engine.
+
+        Returns:
+            A dict of baby_id -> newly created reminder dictionaries.
+
+        Raises:
+            Exception: If reading the logs or creating the reminders fails.
+        """
+        print(f"Generating reminders for {len(baby_ids)} babies at {current_time.isoformat()}")
+        logs_by_baby = self._fetch_recent_logs_batch(baby_ids)
 
         # --- Reminder Logic (Basic Example) ---
         # This logic needs refinement based on actual requirements/patterns.
         # It currently checks the time since the last log of each type.
+        candidates = []
+        for baby_id in baby_ids:
+            recent_logs = logs_by_baby.get(baby_id)
+            if not recent_logs:
+                continue
+            last_log_times = latest_log_times(recent_logs)
+            if on_latest:
+                on_latest(baby_id, last_log_times)
 
-        reminders_to_create: List[ReminderCreate] = []
-        last_log_times = {
-            "feeding": None,
-            "diaper": None,
-            "sleep": None # Assuming 'sleep' logs mark the *end* of a sleep period
-        }
-
-        # Find the latest log time for each relevant type
-        for log in recent_logs:
-            log_type = log.get("log_type")
-            logged_at_str = log.get("logged_at")
-            if log_type in last_log_times and logged_at_str:
-                logged_at = datetime.fromisoformat(logged_at_str)
-                if last_log_times[log_type] is None or logged_at > last_log_times[log_type]:
-                     last_log_times[log_type] = logged_at
-
-        # Define typical intervals (these should ideally be configurable per baby)
-        intervals = {
-            "feeding": timedelta(hours=2),
-            "diaper": timedelta(hours=2),
-            "sleep": timedelta(hours=2) # Time since last *waking up*
-        }
-
-        # Generate reminders if interval has passed since last log
-        for log_type, interval in intervals.items():
-            last_time = last_log_times.get(log_type)
-            # Map log type to reminder type (ensure these match ReminderCreate Literal)
-            # Type assertion to ensure it matches the Literal
-            reminder_type: Literal["feeding", "diaper", "sleep"] = log_type
-
-            if last_time:
-                # Ensure the time is timezone-aware (UTC) before adding interval
-                if last_time.tzinfo is None:
-                    last_time = last_time.replace(tzinfo=timezone.utc) # Assume UTC if naive
-                
-                next_expected_time = last_time + interval
-                if current_time >= last_time: 
-                    # Check if a similar reminder already exists and is not completed
-                    existing_reminder = self._check_existing_reminder(baby_id, reminder_type, next_expected_time)
-                    if not existing_reminder:
-                        print(f"Generating {reminder_type} reminder for baby {baby_id}")
-                        reminders_to_create.append(
-                            ReminderCreate(
-                                baby_id=baby_id,
-                                reminder_type=reminder_type,
-                                reminder_time=next_expected_time,  # Schedule for the expected time
-                                notes=f"Based on last {log_type} at {last_time.strftime('%H:%M')}",
-                            )
-                        )
-                    else:
-                        print(f"Skipping {reminder_type} reminder for baby {baby_id} - similar one exists.")
-
-            else:
-                # No recent log of this type, maybe generate a baseline reminder?
-                # Or requires manual setup / different logic
-                print(f"No recent '{log_type}' log found for baby {baby_id}. Skipping reminder generation for this type.")
+            # Generate reminders if interval has passed since last log
+            for log_type in REMINDER_INTERVALS:
+                last_time = last_log_times.get(log_type)
+                if not last_time:
+                    # No recent log of this type; requires manual setup / different logic
+                    continue
+                if current_time >= last_time:
+                    candidates.append((baby_id, log_type, last_time))
+
+        return self.create_reminders(candidates)
+
+    def create_reminders(self, candidates: List[Tuple[str, str, datetime]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Creates one reminder per (baby_id, reminder_type, last_log_time) candidate, skipping
+        those that already have an open reminder near the expected time.
+
+        Args:
+            candidates: Tuples of baby id, reminder type and the time of the last log of that type.
+
+        Returns:
+            A dict of baby_id -> newly created reminder dictionaries.
+
+        Raises:
+            Exception: If the dedup query or the insert fails, so callers can retry
+                the candidates (nothing was created in that case).
+        """
+        if not candidates:
+            return {}
+        candidates = [(b, t, last, last + REMINDER_INTERVALS[t]) for b, t, last in candidates]
 
+        # Dedup against open reminders around every expected time, loaded in one query
+        expected_times = [c[3] for c in candidates]
+        existing = self.prefetch_open_reminders(
+            list({c[0] for c in candidates}),
+            min(expected_times) - DEDUP_BUFFER,
+            max(expected_times) + DEDUP_BUFFER,
+        )
+
+        reminders_to_create: List[ReminderCreate] = []
+        for baby_id, reminder_type, last_time, next_expected_time in candidates:
+            if existing.has_near(baby_id, reminder_type, next_expected_time, DEDUP_BUFFER):
+                continue
+            reminders_to_create.append(
+                ReminderCreate(
+                    baby_id=baby_id,
+                    reminder_type=reminder_type,
+                    reminder_time=next_expected_time,  # Schedule for the expected time
+                    notes=f"Based on last {reminder_type} at {last_time.strftime('%H:%M')}",
+                )
+            )
+            # Keep the index current so duplicates inside this batch are caught too
+            existing.add(baby_id, reminder_type, next_expected_time)
 
         # --- Save Reminders ---
-        created_reminders = []
+        created_by_baby: Dict[str, List[Dict[str, Any]]] = {}
         if reminders_to_create:
             # Convert reminder_time to ISO format before inserting
             reminders_data = [
@@ -139,32 +235,51 @@ class BabyAIAgent:
             ]
             try:
                 result = self.supabase.table("reminders").insert(reminders_data).execute()
-                created_reminders = result.data if result.data else []
-                print(f"Successfully created {len(created_reminders)} reminders for baby {baby_id}.")
+                for reminder in result.data or []:
+                    created_by_baby.setdefault(reminder["baby_id"], []).append(reminder)
+                print(f"Successfully created {len(result.data or [])} reminders for {len(created_by_baby)} babies.")
             except Exception as e:
-                print(f"Error creating reminders for baby {baby_id}: {e}")
+                print(f"Error creating {len(reminders_data)} reminders: {e}")
+                raise
 
-        return created_reminders
+        return created_by_baby
 
-    def _check_existing_reminder(self, baby_id: str, reminder_type: str, expected_time: datetime, buffer: timedelta = timedelta(hours=1)) -> bool:
-        """Checks if a non-completed reminder of the same type exists around the expected time."""
-        try:
-            time_lower_bound = expected_time - buffer
-            time_upper_bound = expected_time + buffer
-
-            result = self.supabase.table("reminders") \
-                .select("id") \
-                .eq("baby_id", baby_id) \
-                .eq("reminder_type", reminder_type) \
-                .eq("is_completed", False) \
-                .gte("reminder_time", time_lower_bound.isoformat()) \
-                .lte("reminder_time", time_upper_bound.isoformat()) \
-                .limit(1) \
-                .execute()
-            return bool(result.data) # True if any reminder is found
-        except Exception as e:
-            print(f"Error checking existing reminders for baby {baby_id}, type {reminder_type}: {e}")
-            return False # Assume no existing reminder on error to be safe
+
+class ReminderIndex:
+    """Sorted reminder times per (baby_id, reminder_type) for in-memory interval lookups."""
+
+    def __init__(self):
+        self._times: Dict[Tuple[str, str], List[datetime]] = {}
+
+    def add(self, baby_id: str, reminder_type: str, reminder_time: datetime):
+        insort(self._times.setdefault((baby_id, reminder_type), []), reminder_time)
+
+    def has_near(self, baby_id: str, reminder_type: str, expected_time: datetime, buffer: timedelta = DEDUP_BUFFER) -> bool:
+        """True if a reminder of the same type exists within `buffer` of the expected time."""
+        times = self._times.get((baby_id, reminder_type))
+        if not times:
+            return False
+        i = bisect_left(times, expected_time - buffer)
+        return i < len(times) and times[i] <= expected_time + buffer
+
+
+def _parse_time(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    # Ensure the time is timezone-aware (UTC)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def latest_log_times(logs: List[Dict[str, Any]]) -> Dict[str, datetime]:
+    """Latest logged_at per reminder-relevant log type."""
+    last_log_times: Dict[str, datetime] = {}
+    for log in logs:
+        log_type = log.get("log_type")
+        logged_at_str = log.get("logged_at")
+        if log_type in REMINDER_INTERVALS and logged_at_str:
+            logged_at = _parse_time(logged_at_str)
+            if log_type not in last_log_times or logged_at > last_log_times[log_type]:
+                last_log_times[log_type] = logged_at
+    return last_log_times
 
 
 # Example Usage (Optional - for testing)
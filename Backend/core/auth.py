@@ -1,7 +1,8 @@
 import os
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from supabase import create_client, Client
+from supabase import Client
+from core.supabase import get_supabase_client
 import jwt
 from dotenv import load_dotenv
 
@@ -10,12 +11,10 @@ load_dotenv()
 _supabase_url = os.getenv("SUPABASE_URL")
 _supabase_key = os.getenv("SUPABASE_KEY")
 
-supabase: Client = create_client(_supabase_url, _supabase_key)
-
 security = HTTPBearer()
 
 def get_supabase() -> Client:
-    return supabase
+    return get_supabase_client()
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -0,0 +1,86 @@
+# core/baby_features.py
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from core.baby_rollup import log_contribution
+
+# `as_of` is rounded down to this many minutes so identical days give identical
+# features (and LLM cache hits) within the window
+BABY_FEATURES_RESOLUTION_MINUTES = int(os.getenv("BABY_FEATURES_RESOLUTION_MINUTES", "15"))
+
+# Feature key per log_type, and the rollup total (see log_contribution) reported for it
+FEATURE_TYPES = {
+    "feeding": ("feed", "feed_ml"),
+    "sleep": ("sleep", "sleep_minutes"),
+    "diaper": ("diaper", "diaper_solid_count"),
+    "cry": ("cry", "cry_minutes"),
+    "bowel": ("bowel", None),
+    "outside": ("outside", "outside_minutes"),
+}
+
+
+def _parse_time(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed.astimezone(timezone.utc)
+
+
+def _round(value: float):
+    return int(value) if float(value).is_integer() else round(value, 1)
+
+
+def _type_features(times: List[datetime], total: Optional[float], total_field: Optional[str]) -> Dict[str, Any]:
+    features: Dict[str, Any] = {"count": len(times)}
+    if total_field:
+        features[total_field] = _round(total or 0)
+    if not times:
+        return features
+    times.sort()
+    features["first"] = times[0].strftime("%H:%M")
+    features["last"] = times[-1].strftime("%H:%M")
+    if len(times) > 1:
+        gaps = [(later - earlier).total_seconds() / 60 for earlier, later in zip(times, times[1:])]
+        features["avg_interval_min"] = round(sum(gaps) / len(gaps))
+        features["longest_gap_min"] = round(max(gaps))
+    return features
+
+
+def day_features(rows: Iterable[Dict[str, Any]], now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Fixed-size summary of one day of baby_logs rows (log_type, log_data, logged_at)
+    for LLM prompts: per log type the count, its rollup total, first/last event
+    time (HH:MM UTC), average interval and longest gap between events, in minutes.
+    Its size does not depend on how many logs the day has.
+    """
+    now = now or datetime.now(timezone.utc)
+    as_of = now.astimezone(timezone.utc).replace(second=0, microsecond=0)
+    resolution = min(max(1, BABY_FEATURES_RESOLUTION_MINUTES), 60)
+    as_of = as_of.replace(minute=as_of.minute - as_of.minute % resolution)
+
+    times: Dict[str, List[datetime]] = {key: [] for key, _ in FEATURE_TYPES.values()}
+    totals: Dict[str, float] = {}
+    for row in rows:
+        mapping = FEATURE_TYPES.get(row.get("log_type"))
+        logged_at = _parse_time(row.get("logged_at")) if row.get("logged_at") else None
+        if mapping is None or logged_at is None or not row.get("log_data"):
+            continue
+        key, total_field = mapping
+        times[key].append(logged_at)
+        if total_field:
+            delta = log_contribution(row["log_type"], row["log_data"]).get(total_field, 0)
+            totals[key] = totals.get(key, 0) + delta
+
+    features: Dict[str, Any] = {"as_of": as_of.strftime("%H:%M")}
+    for key, total_field in FEATURE_TYPES.values():
+        features[key] = _type_features(times[key], totals.get(key), total_field)
+    return features
+
+
+def has_logs(features: Dict[str, Any]) -> bool:
+    return any(value.get("count") for value in features.values() if isinstance(value, dict))
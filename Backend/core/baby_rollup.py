@@ -0,0 +1,304 @@
+# core/baby_rollup.py
+import os
+import sys
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, Iterable, Tuple, Union
+
+from supabase import Client
+
+from core.metrics import metrics
+from core.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_TABLE = "baby_log_daily"
+ROLLUP_RPC = "increment_baby_log_daily"
+ROLLUP_FIELDS = (
+    "feed_ml",
+    "feed_count",
+    "sleep_minutes",
+    "diaper_count",
+    "diaper_solid_count",
+    "diaper_wet_count",
+    "bowel_count",
+    "cry_minutes",
+    "outside_minutes",
+    "log_count",
+)
+
+# Day rows read through `get_rollup_days` are cached per (baby, day). New logs recorded
+# by this process drop their day at once; the TTL bounds staleness from other replicas.
+ROLLUP_CACHE_TTL_SECONDS = float(os.getenv("ROLLUP_CACHE_TTL_SECONDS", "300"))
+ROLLUP_CACHE_MAX_ENTRIES = int(os.getenv("ROLLUP_CACHE_MAX_ENTRIES", "10000"))
+
+DayLike = Union[date, datetime, str]
+
+
+def _number(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _hhmm_minutes(value: str) -> int:
+    hours, minutes = value.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def sleep_minutes(log_data: Dict[str, Any]) -> float:
+    """Minutes slept: sleepStart/sleepEnd (HH:MM, may cross midnight), else legacy `duration` in seconds."""
+    start, end = log_data.get("sleepStart"), log_data.get("sleepEnd")
+    if start and end:
+        try:
+            minutes = _hhmm_minutes(end) - _hhmm_minutes(start)
+            return float(minutes + 24 * 60 if minutes < 0 else minutes)
+        except (ValueError, AttributeError):
+            pass
+    return _number(log_data.get("duration")) / 60
+
+
+def cry_minutes(log_data: Dict[str, Any]) -> float:
+    if log_data.get("cryDuration") is not None:
+        return _number(log_data.get("cryDuration"))
+    return _number(log_data.get("duration_minutes"))
+
+
+def log_contribution(log_type: str, log_data: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    What a single log adds to its day's rollup row. These are the only aggregation
+    rules; every daily/weekly reader goes through the rollup instead of re-parsing logs.
+    """
+    log_data = log_data or {}
+    delta: Dict[str, float] = {"log_count": 1}
+    if log_type == "feeding":
+        delta["feed_ml"] = _number(log_data.get("feedAmount"))
+        delta["feed_count"] = 1
+    elif log_type == "sleep":
+        delta["sleep_minutes"] = sleep_minutes(log_data)
+    elif log_type == "diaper":
+        delta["diaper_count"] = 1
+        # Logs without an explicit diaperSolid flag count as neither solid nor wet
+        if log_data.get("diaperSolid") is True:
+            delta["diaper_solid_count"] = 1
+        elif log_data.get("diaperSolid") is False:
+            delta["diaper_wet_count"] = 1
+    elif log_type == "bowel":
+        delta["bowel_count"] = 1
+    elif log_type == "cry":
+        delta["cry_minutes"] = cry_minutes(log_data)
+    elif log_type == "outside":
+        delta["outside_minutes"] = _number(log_data.get("outsideDuration"))
+    return delta
+
+
+def log_day(logged_at: DayLike) -> str:
+    """Rollup day of a log: the UTC date of `logged_at`."""
+    if isinstance(logged_at, str):
+        logged_at = datetime.fromisoformat(logged_at.replace("Z", "+00:00"))
+    if isinstance(logged_at, datetime):
+        if logged_at.tzinfo is not None:
+            logged_at = logged_at.astimezone(timezone.utc)
+        return logged_at.date().isoformat()
+    return logged_at.isoformat()
+
+
+def utc_day_start(day: DayLike) -> datetime:
+    """Start of a rollup day as an aware UTC datetime (for raw `logged_at` filters)."""
+    return datetime.combine(date.fromisoformat(log_day(day)), datetime.min.time(), tzinfo=timezone.utc)
+
+
+def empty_day(baby_id: str, day: str) -> Dict[str, Any]:
+    row: Dict[str, Any] = {"baby_id": baby_id, "day": day}
+    row.update({field: 0 for field in ROLLUP_FIELDS})
+    return row
+
+
+def aggregate_logs(rows: Iterable[Dict[str, Any]], baby_id: Optional[str] = None) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Folds raw log rows into rollup rows keyed by (baby_id, day)."""
+    totals: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for row in rows:
+        if not row.get("logged_at"):
+            continue
+        key = (row.get("baby_id") or baby_id, log_day(row["logged_at"]))
+        daily = totals.get(key)
+        if daily is None:
+            daily = totals[key] = empty_day(*key)
+        for field, value in log_contribution(row.get("log_type"), row.get("log_data")).items():
+            daily[field] += value
+    return totals
+
+
+def _normalize(row: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(row)
+    for field in ROLLUP_FIELDS:
+        value = _number(out.get(field))
+        out[field] = int(value) if value.is_integer() else round(value, 2)
+    return out
+
+
+def _fill_days(baby_id: str, rows: List[Dict[str, Any]], start_day: str, end_day: str) -> List[Dict[str, Any]]:
+    by_day = {row["day"]: _normalize(row) for row in rows}
+    start, end = date.fromisoformat(start_day), date.fromisoformat(end_day)
+    days = [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+    return [by_day.get(day) or empty_day(baby_id, day) for day in days]
+
+
+def _range_query(table_query, baby_id: str, start_day: str, end_day: str):
+    return table_query.select("*").eq("baby_id", baby_id).gte("day", start_day).lte("day", end_day).order("day")
+
+
+async def get_daily_rollups(db, baby_id: str, start_day: DayLike, end_day: DayLike) -> List[Dict[str, Any]]:
+    """One row per day in [start_day, end_day] (inclusive), zero-filled. `db` is an AsyncSupabaseService."""
+    start_day, end_day = log_day(start_day), log_day(end_day)
+    result = await _range_query(db.table(ROLLUP_TABLE), baby_id, start_day, end_day).execute()
+    return _fill_days(baby_id, result.data or [], start_day, end_day)
+
+
+def get_daily_rollups_sync(client: Client, baby_id: str, start_day: DayLike, end_day: DayLike) -> List[Dict[str, Any]]:
+    """Synchronous `get_daily_rollups` for routes and agents on the sync client."""
+    start_day, end_day = log_day(start_day), log_day(end_day)
+    result = _range_query(client.table(ROLLUP_TABLE), baby_id, start_day, end_day).execute()
+    return _fill_days(baby_id, result.data or [], start_day, end_day)
+
+
+class _DayCache:
+    def __init__(self, ttl: float = ROLLUP_CACHE_TTL_SECONDS, max_entries: int = ROLLUP_CACHE_MAX_ENTRIES):
+        self._entries: TTLCache = TTLCache(ttl, max_entries)
+
+    def get(self, baby_id: str, day: str) -> Optional[Dict[str, Any]]:
+        row = self._entries.get((baby_id, day))
+        return None if row is None else dict(row)
+
+    def set_many(self, rows: Iterable[Dict[str, Any]]):
+        for row in rows:
+            self._entries.set((row["baby_id"], row["day"]), dict(row))
+
+    def invalidate(self, baby_id: Optional[str] = None, day: Optional[str] = None):
+        if baby_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop((baby_id, day))
+
+
+day_cache = _DayCache()
+
+
+async def get_rollup_days(db, baby_id: str, days: Iterable[DayLike]) -> Dict[str, Dict[str, Any]]:
+    """
+    Rollup rows for a set of days (zero-filled), keyed by day: cached days first,
+    then one `day IN (...)` query for the rest.
+    """
+    wanted = sorted({log_day(day) for day in days})
+    found: Dict[str, Dict[str, Any]] = {}
+    missing = []
+    for day in wanted:
+        row = day_cache.get(baby_id, day)
+        if row is None:
+            missing.append(day)
+        else:
+            found[day] = row
+    metrics.increment("rollup.cache_hits", len(found))
+    if missing:
+        metrics.increment("rollup.cache_misses", len(missing))
+        result = await db.table(ROLLUP_TABLE).select("*").eq("baby_id", baby_id).in_("day", missing).execute()
+        by_day = {row["day"]: _normalize(row) for row in result.data or []}
+        rows = [by_day.get(day) or empty_day(baby_id, day) for day in missing]
+        day_cache.set_many(rows)
+        found.update({row["day"]: row for row in rows})
+    return found
+
+
+async def _increment(db, baby_id: str, day: str, delta: Dict[str, float]):
+    try:
+        await db.client.rpc(ROLLUP_RPC, {"p_baby_id": baby_id, "p_day": day, "p_delta": delta}).execute()
+        metrics.increment("rollup.increments")
+    except Exception as e:
+        metrics.increment("rollup.errors")
+        logger.error(f"Error updating {ROLLUP_TABLE} for baby {baby_id}: {e}")
+    finally:
+        day_cache.invalidate(baby_id, day)
+
+
+async def record_log(db, baby_id: str, log_type: str, log_data: Optional[Dict[str, Any]], logged_at: DayLike):
+    """
+    Adds a newly inserted log to its day row. Failures are logged, not raised: the
+    log itself is already stored and a backfill repairs the rollup.
+    """
+    await _increment(db, baby_id, log_day(logged_at), log_contribution(log_type, log_data))
+
+
+async def record_logs(db, rows: Iterable[Dict[str, Any]]):
+    """`record_log` for a batch of inserted rows: one increment per (baby, day), not per log."""
+    for (baby_id, day), daily in aggregate_logs(rows).items():
+        delta = {field: daily[field] for field in ROLLUP_FIELDS if daily[field]}
+        await _increment(db, baby_id, day, delta)
+
+
+def backfill(client: Client, baby_ids: Optional[List[str]] = None, page_size: int = 1000, chunk_size: int = 500,
+             until: Optional[DayLike] = None) -> int:
+    """
+    Rebuilds rollup rows from the `baby_logs` history (optionally for some babies
+    only). Rows are recomputed and upserted, so re-running it is safe.
+    Returns the number of day rows written.
+
+    Only days before `until` (default: the UTC day the scan starts) are rebuilt.
+    Their rows are overwritten with totals, so an increment that `record_log` makes
+    while the scan runs would be lost; logs for days before today are not normally
+    written any more, and today's row is left to the incremental RPC. Passing a
+    later `until` rebuilds today too and needs a maintenance window with log writes
+    stopped. A log backdated into an earlier day during the run can still be missed;
+    re-running the backfill repairs it.
+    """
+    cutoff = utc_day_start(until if until is not None else datetime.now(timezone.utc))
+    totals: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    last_id: Optional[str] = None
+    scanned = 0
+    while True:
+        query = client.table("baby_logs").select("id, baby_id, log_type, log_data, logged_at") \
+            .lt("logged_at", cutoff.isoformat()).order("id").limit(page_size)
+        if baby_ids:
+            query = query.in_("baby_id", baby_ids)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.execute().data or []
+        if not rows:
+            break
+        scanned += len(rows)
+        for key, daily in aggregate_logs(rows).items():
+            current = totals.get(key)
+            if current is None:
+                totals[key] = daily
+            else:
+                for field in ROLLUP_FIELDS:
+                    current[field] += daily[field]
+        if len(rows) < page_size:
+            break
+        last_id = rows[-1]["id"]
+
+    now = datetime.now(timezone.utc).isoformat()
+    rows = [dict(_normalize(row), updated_at=now) for row in totals.values()]
+    for i in range(0, len(rows), chunk_size):
+        client.table(ROLLUP_TABLE).upsert(rows[i:i + chunk_size], on_conflict="baby_id,day").execute()
+    day_cache.invalidate()
+    logger.info(f"Backfilled {len(rows)} {ROLLUP_TABLE} rows before {cutoff.date()} from {scanned} logs")
+    return len(rows)
+
+
+if __name__ == "__main__":
+    # python -m core.baby_rollup backfill [--include-today] [baby_id ...]
+    # --include-today also rebuilds today's rows: only run it with log writes stopped
+    from core.supabase import SupabaseClients
+
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] != "backfill":
+        print("Usage: python -m core.baby_rollup backfill [--include-today] [baby_id ...]")
+        sys.exit(1)
+    args = sys.argv[2:]
+    until = None
+    if "--include-today" in args:
+        args.remove("--include-today")
+        until = datetime.now(timezone.utc) + timedelta(days=1)
+    written = backfill(SupabaseClients.get_client(), args or None, until=until)
+    print(f"Backfilled {written} day rows")
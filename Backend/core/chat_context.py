@@ -0,0 +1,239 @@
+# core/chat_context.py
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional
+
+from core.metrics import metrics
+from core.supabase import get_async_supabase
+from core.tokens import count_tokens, truncate_tokens
+from core.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+CHAT_LOGS_TABLE = "chat_logs"
+CHAT_SUMMARIES_TABLE = "chat_summaries"
+# Latest messages kept verbatim in the prompt, and their token budgets
+CHAT_CONTEXT_RECENT_MESSAGES = int(os.getenv("CHAT_CONTEXT_RECENT_MESSAGES", "8"))
+CHAT_CONTEXT_RECENT_TOKENS = int(os.getenv("CHAT_CONTEXT_RECENT_TOKENS", "1200"))
+CHAT_CONTEXT_MESSAGE_TOKENS = int(os.getenv("CHAT_CONTEXT_MESSAGE_TOKENS", "300"))
+# Rolling summary of everything older: size cap, and how many new messages trigger an update
+CHAT_CONTEXT_SUMMARY_TOKENS = int(os.getenv("CHAT_CONTEXT_SUMMARY_TOKENS", "300"))
+CHAT_CONTEXT_SUMMARIZE_EVERY = int(os.getenv("CHAT_CONTEXT_SUMMARIZE_EVERY", "10"))
+# Older messages folded into the summary per LLM call, and calls per update
+CHAT_CONTEXT_FOLD_TOKENS = int(os.getenv("CHAT_CONTEXT_FOLD_TOKENS", "3000"))
+CHAT_CONTEXT_FOLD_MESSAGES = int(os.getenv("CHAT_CONTEXT_FOLD_MESSAGES", "100"))
+CHAT_CONTEXT_MAX_FOLDS = int(os.getenv("CHAT_CONTEXT_MAX_FOLDS", "4"))
+CHAT_CONTEXT_SUMMARY_MODEL = os.getenv("CHAT_CONTEXT_SUMMARY_MODEL", "gpt-4o-mini")
+# Cached per-mom state is re-read after this long (summaries written by other replicas)
+CHAT_CONTEXT_TTL_SECONDS = float(os.getenv("CHAT_CONTEXT_TTL_SECONDS", "600"))
+CHAT_CONTEXT_MAX_MOMS = int(os.getenv("CHAT_CONTEXT_MAX_MOMS", "10000"))
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running memory of a chat between a mom and her supportive AI friend. "
+    "Merge the new messages into the existing summary. Keep facts about the mom, her baby, "
+    "her feelings, plans and anything she asked to be remembered; drop small talk. "
+    "Write in the language the mom uses, in plain sentences, at most {words} words. "
+    "Return only the summary."
+)
+
+
+@dataclass
+class ChatContext:
+    summary: str = ""
+    turns: List[Dict[str, str]] = field(default_factory=list)
+
+    def as_prompt(self) -> str:
+        """Context block for the chat prompt (empty for a new conversation)."""
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of your earlier conversation with her:\n{self.summary}")
+        if self.turns:
+            lines = [f"{'Mom' if turn['role'] == 'user' else 'You'}: {turn['message']}" for turn in self.turns]
+            parts.append("Recent messages (oldest first):\n" + "\n".join(lines))
+        return "\n\n".join(parts)
+
+
+@dataclass
+class _MomState:
+    summary: str = ""
+    summarized_until: Optional[str] = None
+    recent: Deque[Dict[str, str]] = field(default_factory=deque)
+    unsummarized: int = 0
+
+
+class ChatContextManager:
+    """
+    Bounded conversation context for /chat/send.
+
+    The prompt carries the last CHAT_CONTEXT_RECENT_MESSAGES messages verbatim plus a
+    rolling summary of everything older, each under a token budget, so its size does
+    not grow with the conversation. The summary lives in `chat_summaries` (one row per
+    mom, with the timestamp of the last message folded in). Every
+    CHAT_CONTEXT_SUMMARIZE_EVERY recorded messages a background task folds the
+    messages that have left the verbatim window into it.
+
+    Recent messages are kept in memory as they are recorded, because chat_logs rows
+    go through the write-behind queue and may not be readable yet.
+    """
+
+    def __init__(self, db_getter, recent_messages: int = CHAT_CONTEXT_RECENT_MESSAGES,
+                 summarize_every: int = CHAT_CONTEXT_SUMMARIZE_EVERY, ttl: float = CHAT_CONTEXT_TTL_SECONDS,
+                 max_moms: int = CHAT_CONTEXT_MAX_MOMS):
+        self._db_getter = db_getter
+        self.recent_messages = max(1, recent_messages)
+        self.summarize_every = max(1, summarize_every)
+        # Guards the fields of the cached _MomState objects
+        self._lock = threading.Lock()
+        self._moms: TTLCache = TTLCache(ttl, max_moms)
+        self._folds: Dict[str, asyncio.Task] = {}
+
+    def _state(self, mom_id: str) -> Optional[_MomState]:
+        return self._moms.get(mom_id)
+
+    async def _load(self, mom_id: str) -> _MomState:
+        db = self._db_getter()
+        summary_rows, recent_rows = await asyncio.gather(
+            db.select(CHAT_SUMMARIES_TABLE, "summary", "summarized_until", key=None).eq("mom_id", mom_id).execute(),
+            db.select(CHAT_LOGS_TABLE, "role", "message", "timestamp", key=None)
+            .eq("mom_id", mom_id).order("timestamp", desc=True).limit(self.recent_messages).execute(),
+        )
+        row = summary_rows[0] if summary_rows else {}
+        state = _MomState(
+            summary=row.get("summary") or "",
+            summarized_until=row.get("summarized_until"),
+            recent=deque(({"role": r["role"], "message": r.get("message") or ""} for r in reversed(recent_rows)),
+                         maxlen=self.recent_messages),
+        )
+        previous = self._moms.get(mom_id)
+        if previous is not None:
+            with self._lock:
+                # Keep the count of messages recorded since the last summary update
+                state.unsummarized = previous.unsummarized
+        self._moms.set(mom_id, state)
+        metrics.increment("chat_context.loads")
+        return state
+
+    async def get(self, mom_id: str) -> ChatContext:
+        """Summary and recent turns for the next prompt, trimmed to their token budgets."""
+        state = self._state(mom_id)
+        if state is None:
+            try:
+                state = await self._load(mom_id)
+            except Exception as e:
+                # The reply matters more than its context: answer cold rather than fail
+                metrics.increment("chat_context.load_errors")
+                logger.error(f"Error loading chat context for {mom_id}: {e}")
+                return ChatContext()
+
+        turns: List[Dict[str, str]] = []
+        budget = CHAT_CONTEXT_RECENT_TOKENS
+        for turn in reversed(list(state.recent)):
+            message = truncate_tokens(turn["message"], CHAT_CONTEXT_MESSAGE_TOKENS)
+            cost = count_tokens(message) + 2
+            if cost > budget:
+                break
+            budget -= cost
+            turns.append({"role": turn["role"], "message": message})
+        turns.reverse()
+        context = ChatContext(summary=truncate_tokens(state.summary, CHAT_CONTEXT_SUMMARY_TOKENS), turns=turns)
+        metrics.observe("chat_context.tokens", count_tokens(context.as_prompt()))
+        return context
+
+    def record(self, mom_id: str, role: str, message: str):
+        """Notes a message just saved to chat_logs; schedules a summary update every N messages."""
+        state = self._moms.get(mom_id)
+        if state is None:
+            return
+        with self._lock:
+            state.recent.append({"role": role, "message": message or ""})
+            state.unsummarized += 1
+            due = state.unsummarized >= self.summarize_every
+        if due:
+            self._schedule_fold(mom_id)
+
+    def _schedule_fold(self, mom_id: str):
+        running = self._folds.get(mom_id)
+        if running is not None and not running.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.summarize(mom_id))
+        self._folds[mom_id] = task
+        task.add_done_callback(lambda t: self._folds.pop(mom_id, None) if self._folds.get(mom_id) is t else None)
+
+    async def summarize(self, mom_id: str):
+        """Folds messages older than the verbatim window into the stored summary."""
+        db = self._db_getter()
+        try:
+            state = self._state(mom_id) or await self._load(mom_id)
+            with self._lock:
+                state.unsummarized = 0
+            for _ in range(CHAT_CONTEXT_MAX_FOLDS):
+                query = db.select(CHAT_LOGS_TABLE, "role", "message", "timestamp", key=None).eq("mom_id", mom_id)
+                if state.summarized_until:
+                    query = query.gt("timestamp", state.summarized_until)
+                limit = CHAT_CONTEXT_FOLD_MESSAGES + self.recent_messages
+                rows = await query.order("timestamp").limit(limit).execute()
+                # The newest messages stay verbatim in the prompt; only older ones are folded
+                older = rows[:len(rows) - self.recent_messages]
+                batch, budget = [], CHAT_CONTEXT_FOLD_TOKENS
+                for row in older:
+                    line = f"{'Mom' if row['role'] == 'user' else 'Friend'}: " \
+                           f"{truncate_tokens(row.get('message') or '', CHAT_CONTEXT_MESSAGE_TOKENS)}"
+                    budget -= count_tokens(line)
+                    if batch and budget < 0:
+                        break
+                    batch.append((row, line))
+                if not batch:
+                    return
+                state.summary = await self._fold(state.summary, [line for _, line in batch])
+                state.summarized_until = batch[-1][0]["timestamp"]
+                await db.table(CHAT_SUMMARIES_TABLE).upsert({
+                    "mom_id": mom_id,
+                    "summary": state.summary,
+                    "summarized_until": state.summarized_until,
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                }, on_conflict="mom_id").execute()
+                metrics.increment("chat_context.summarized_messages", len(batch))
+                if len(batch) == len(older) and len(rows) < limit:
+                    return
+        except Exception as e:
+            metrics.increment("chat_context.summary_errors")
+            logger.error(f"Error updating chat summary for {mom_id}: {e}")
+
+    async def _fold(self, summary: str, lines: List[str]) -> str:
+        from core.llm_gateway import get_llm
+
+        started = time.perf_counter()
+        words = CHAT_CONTEXT_SUMMARY_TOKENS * 2 // 3
+        text = await get_llm().chat_text(
+            model=CHAT_CONTEXT_SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT.format(words=words)},
+                {"role": "user", "content": f"Existing summary:\n{summary or '(none)'}\n\nNew messages:\n" + "\n".join(lines)},
+            ],
+            temperature=0.3,
+            max_tokens=CHAT_CONTEXT_SUMMARY_TOKENS,
+            endpoint="chat_summary",
+        )
+        metrics.observe("chat_context.summary_ms", (time.perf_counter() - started) * 1000)
+        return truncate_tokens(text.strip(), CHAT_CONTEXT_SUMMARY_TOKENS) or summary
+
+    async def close(self):
+        """Cancels in-flight summary updates (they resume from `summarized_until` later)."""
+        tasks = [task for task in self._folds.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._folds.clear()
+
+
+chat_context = ChatContextManager(get_async_supabase)
@@ -0,0 +1,163 @@
+# core/llm_cache.py
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Optional, Dict, Any, Iterable
+
+from core.metrics import metrics
+from core.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "21600"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+# redis://... enables the shared backend (needs the optional `redis` package)
+LLM_CACHE_URL = os.getenv("LLM_CACHE_URL")
+
+
+def normalize_inputs(value: Any) -> Any:
+    """
+    Canonical form of a prompt input so equal data hashes equally: dict keys are
+    sorted, floats rounded, strings stripped and `None` entries dropped.
+    """
+    if isinstance(value, dict):
+        return {str(k): normalize_inputs(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0])) if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [normalize_inputs(v) for v in value]
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else round(value, 3)
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def content_key(model: str, template: str, inputs: Dict[str, Any]) -> str:
+    payload = json.dumps(
+        {"model": model, "template": template, "inputs": normalize_inputs(inputs)},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    """In-process TTL + LRU store."""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self._entries: TTLCache = TTLCache(None, max_entries, name="llm_cache")
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: str, ttl: int):
+        self._entries.set(key, value, ttl=ttl)
+
+    async def get_version(self, tag: str) -> int:
+        with self._lock:
+            return self._versions.get(tag, 0)
+
+    async def bump_version(self, tag: str):
+        with self._lock:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Shared store for multi-worker deployments. Redis handles TTL and LRU (maxmemory-policy)."""
+
+    def __init__(self, url: str, prefix: str = "llmcache:"):
+        import redis.asyncio as redis  # optional dependency
+
+        self.prefix = prefix
+        self._redis = redis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._redis.get(self.prefix + key)
+
+    async def set(self, key: str, value: str, ttl: int):
+        await self._redis.set(self.prefix + key, value, ex=ttl)
+
+    async def get_version(self, tag: str) -> int:
+        return int(await self._redis.get(f"{self.prefix}tag:{tag}") or 0)
+
+    async def bump_version(self, tag: str):
+        await self._redis.incr(f"{self.prefix}tag:{tag}")
+
+
+class LLMCache:
+    """
+    Content-addressed cache for LLM responses.
+
+    Keys hash the model, the prompt template id and the normalized inputs, so any
+    change in the data produces a new key. Entries can also carry tags such as
+    `baby:<id>`; each tag has a version that is part of the key, and `invalidate`
+    bumps it, which orphans every entry for that tag without scanning the store.
+    """
+
+    _instance: Optional['LLMCache'] = None
+
+    def __init__(self, backend=None, ttl: int = LLM_CACHE_TTL_SECONDS):
+        self.backend = backend if backend is not None else self._default_backend()
+        self.ttl = ttl
+
+    @staticmethod
+    def _default_backend():
+        if LLM_CACHE_URL:
+            try:
+                return RedisCacheBackend(LLM_CACHE_URL)
+            except ImportError:
+                logger.warning("LLM_CACHE_URL is set but the redis package is not installed; using the in-process cache")
+        return MemoryCacheBackend()
+
+    @classmethod
+    def get_instance(cls) -> 'LLMCache':
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    async def _key(self, model: str, template: str, inputs: Dict[str, Any], tags: Iterable[str]) -> str:
+        tags = sorted(tags)
+        versions = await asyncio.gather(*(self.backend.get_version(tag) for tag in tags))
+        base = content_key(model, template, inputs)
+        if not tags:
+            return base
+        suffix = ",".join(f"{tag}@{version}" for tag, version in zip(tags, versions))
+        return hashlib.sha256(f"{base}|{suffix}".encode("utf-8")).hexdigest()
+
+    async def get(self, model: str, template: str, inputs: Dict[str, Any], tags: Iterable[str] = ()) -> Optional[Any]:
+        try:
+            raw = await self.backend.get(await self._key(model, template, inputs, tags))
+        except Exception as e:
+            logger.warning(f"LLM cache read failed: {e}")
+            raw = None
+        if raw is None:
+            metrics.increment("llm_cache.misses", template=template)
+            return None
+        metrics.increment("llm_cache.hits", template=template)
+        return json.loads(raw)
+
+    async def set(self, model: str, template: str, inputs: Dict[str, Any], value: Any,
+                  tags: Iterable[str] = (), ttl: Optional[int] = None):
+        try:
+            key = await self._key(model, template, inputs, tags)
+            await self.backend.set(key, json.dumps(value, ensure_ascii=False), ttl or self.ttl)
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {e}")
+
+    async def invalidate(self, *tags: str):
+        for tag in tags:
+            try:
+                await self.backend.bump_version(tag)
+                metrics.increment("llm_cache.invalidations")
+            except Exception as e:
+                logger.warning(f"LLM cache invalidation of {tag} failed: {e}")
+
+
+def get_llm_cache() -> LLMCache:
+    return LLMCache.get_instance()
@@ -0,0 +1,220 @@
+# core/llm_gateway.py
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Optional, Dict, Any, List, AsyncIterator, Tuple
+
+from openai import (
+    AsyncOpenAI,
+    RateLimitError,
+    APITimeoutError,
+    APIConnectionError,
+    InternalServerError,
+)
+from dotenv import load_dotenv
+
+from core.metrics import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# OPENAI_BASE_URL lets tests point every agent at a local stub server
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+# Default in-flight limit per model; override per model with e.g. "gpt-4o=16,dall-e-3=2"
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MODEL_CONCURRENCY = os.getenv("LLM_MODEL_CONCURRENCY", "")
+# USD per 1M tokens as "input:output"; add or override models with e.g. "gpt-4o=2.5:10,gpt-4o-mini=0.15:0.6"
+LLM_PRICES = os.getenv("LLM_PRICES", "")
+DEFAULT_LLM_PRICES = {
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-4": (30.0, 60.0),
+}
+
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+
+def _parse_model_limits(spec: str) -> Dict[str, int]:
+    limits = {}
+    for item in spec.split(","):
+        model, _, value = item.partition("=")
+        if model.strip() and value.strip().isdigit():
+            limits[model.strip()] = int(value)
+    return limits
+
+
+def _parse_prices(spec: str) -> Dict[str, Tuple[float, float]]:
+    prices = dict(DEFAULT_LLM_PRICES)
+    for item in spec.split(","):
+        model, _, value = item.partition("=")
+        prompt_price, _, completion_price = value.partition(":")
+        try:
+            prices[model.strip()] = (float(prompt_price), float(completion_price or prompt_price))
+        except ValueError:
+            continue
+    return prices
+
+
+def backoff_delay(attempt: int, base: float = LLM_BACKOFF_BASE, cap: float = LLM_BACKOFF_MAX) -> float:
+    """Exponential backoff with full jitter: uniform(0, min(cap, base * 2**attempt))."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class LLMGateway:
+    """
+    Single entry point for OpenAI calls.
+
+    Owns one `AsyncOpenAI` client (and its connection pool), caps in-flight requests
+    per model, retries transient failures with jittered backoff and records latency,
+    token usage and estimated cost in `core.metrics`. The SDK's own retries are
+    disabled so the gateway is the only place retry behaviour is decided.
+
+    Every call method takes an optional `endpoint` name (e.g. "baby_analysis"); it
+    is added as a metric label so expensive prompts can be told apart.
+    """
+
+    _instance: Optional['LLMGateway'] = None
+
+    def __init__(self):
+        self._client: Optional[AsyncOpenAI] = None
+        self._model_limits = _parse_model_limits(LLM_MODEL_CONCURRENCY)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._prices = _parse_prices(LLM_PRICES)
+
+    @classmethod
+    def get_instance(cls) -> 'LLMGateway':
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        # Created on first use so importing an agent module opens nothing
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                base_url=OPENAI_BASE_URL,
+                timeout=LLM_TIMEOUT,
+                max_retries=0,
+            )
+        return self._client
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(model)
+        if semaphore is None:
+            semaphore = self._semaphores[model] = asyncio.Semaphore(
+                self._model_limits.get(model, LLM_MAX_CONCURRENCY)
+            )
+        return semaphore
+
+    def _record_usage(self, model: str, endpoint: Optional[str], usage):
+        if usage is None:
+            return
+        prompt_tokens, completion_tokens = usage.prompt_tokens or 0, usage.completion_tokens or 0
+        metrics.increment("llm.prompt_tokens", prompt_tokens, model=model, endpoint=endpoint)
+        metrics.increment("llm.completion_tokens", completion_tokens, model=model, endpoint=endpoint)
+        price = self._prices.get(model)
+        if price is not None:
+            cost = (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+            metrics.increment("llm.cost_usd", cost, model=model, endpoint=endpoint)
+
+    async def _call(self, kind: str, model: str, request, limited: bool = True, endpoint: Optional[str] = None):
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                if limited:
+                    async with self._semaphore(model):
+                        response = await request()
+                else:
+                    response = await request()
+            except RETRYABLE_ERRORS as e:
+                metrics.increment("llm.errors", model=model, kind=kind, endpoint=endpoint)
+                if attempt >= LLM_MAX_RETRIES:
+                    logger.error(f"LLM {kind} call to {model} failed after {attempt + 1} attempts: {e}")
+                    raise
+                delay = backoff_delay(attempt)
+                attempt += 1
+                metrics.increment("llm.retries", model=model, kind=kind, endpoint=endpoint)
+                logger.warning(f"LLM {kind} call to {model} failed ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                metrics.increment("llm.errors", model=model, kind=kind, endpoint=endpoint)
+                raise
+
+            metrics.observe("llm.latency_ms", (time.perf_counter() - started) * 1000,
+                            model=model, kind=kind, endpoint=endpoint)
+            metrics.increment("llm.requests", model=model, kind=kind, endpoint=endpoint)
+            self._record_usage(model, endpoint, getattr(response, "usage", None))
+            return response
+
+    async def chat(self, model: str, messages: List[Dict[str, Any]], endpoint: Optional[str] = None, **kwargs):
+        """`chat.completions.create` with concurrency limits, retries and metrics."""
+        return await self._call(
+            "chat", model,
+            lambda: self.client.chat.completions.create(model=model, messages=messages, **kwargs),
+            endpoint=endpoint,
+        )
+
+    async def chat_text(self, model: str, messages: List[Dict[str, Any]], endpoint: Optional[str] = None, **kwargs) -> str:
+        """Same as `chat` but returns the first choice's message content."""
+        response = await self.chat(model, messages, endpoint=endpoint, **kwargs)
+        return response.choices[0].message.content or ""
+
+    async def chat_stream(self, model: str, messages: List[Dict[str, Any]], endpoint: Optional[str] = None,
+                          **kwargs) -> AsyncIterator[str]:
+        """
+        Streams the first choice's content deltas. The model's concurrency slot is held
+        until the stream ends; failures before the response starts are retried like
+        `chat`, later ones propagate to the caller.
+        """
+        async with self._semaphore(model):
+            started = time.perf_counter()
+            stream = await self._call(
+                "chat_stream", model,
+                lambda: self.client.chat.completions.create(
+                    model=model, messages=messages, stream=True,
+                    stream_options={"include_usage": True}, **kwargs,
+                ),
+                limited=False,
+                endpoint=endpoint,
+            )
+            first_token = True
+            try:
+                async for chunk in stream:
+                    self._record_usage(model, endpoint, chunk.usage)
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    if first_token:
+                        first_token = False
+                        metrics.observe("llm.ttft_ms", (time.perf_counter() - started) * 1000,
+                                        model=model, endpoint=endpoint)
+                    yield chunk.choices[0].delta.content
+            finally:
+                await stream.close()
+                metrics.observe("llm.stream_ms", (time.perf_counter() - started) * 1000,
+                                model=model, endpoint=endpoint)
+
+    async def generate_image(self, model: str, prompt: str, **kwargs):
+        return await self._call(
+            "image", model,
+            lambda: self.client.images.generate(model=model, prompt=prompt, **kwargs),
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+        self._semaphores.clear()
+
+
+def get_llm() -> LLMGateway:
+    return LLMGateway.get_instance()
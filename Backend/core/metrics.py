@@ -0,0 +1,86 @@
+# core/metrics.py
+import math
+import threading
+from collections import deque
+from typing import Dict, Any, Deque, Optional
+
+
+def metric_name(base: str, **labels: Any) -> str:
+    """Builds a flat metric key such as `llm.latency_ms[model=gpt-4o]`."""
+    if not labels:
+        return base
+    label_str = ",".join(f"{k}={v}" for k, v in sorted(labels.items()) if v is not None)
+    return f"{base}[{label_str}]" if label_str else base
+
+
+def percentile(samples, pct: float) -> Optional[float]:
+    """Nearest-rank percentile of a sequence of numbers (None when empty)."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class _Timing:
+    def __init__(self, max_samples: int):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: Deque[float] = deque(maxlen=max_samples)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def summary(self) -> Dict[str, Any]:
+        samples = list(self.samples)
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 3) if self.count else None,
+            "p50": percentile(samples, 50),
+            "p95": percentile(samples, 95),
+            "max": round(self.max, 3),
+        }
+
+
+class Metrics:
+    """Process-local counters, gauges and timings exposed on `/metrics`."""
+
+    def __init__(self, max_samples: int = 1024):
+        self._lock = threading.Lock()
+        self._max_samples = max_samples
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, Any] = {}
+        self._timings: Dict[str, _Timing] = {}
+
+    def increment(self, name: str, value: float = 1, **labels: Any):
+        key = metric_name(name, **labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: Any, **labels: Any):
+        key = metric_name(name, **labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels: Any):
+        key = metric_name(name, **labels)
+        with self._lock:
+            timing = self._timings.get(key)
+            if timing is None:
+                timing = self._timings[key] = _Timing(self._max_samples)
+            timing.observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "timings": {k: t.summary() for k, t in self._timings.items()},
+            }
+
+
+metrics = Metrics()
@@ -0,0 +1,106 @@
+# core/mom_sentences.py
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from core.metrics import metrics
+from core.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+MOM_SENTENCES_TABLE = "mom_sentences"
+MOM_SENTENCES_FALLBACK_TAG = "normal"
+MOM_SENTENCES_REFRESH_SECONDS = float(os.getenv("MOM_SENTENCES_REFRESH_SECONDS", "600"))
+# A user does not see the same template again within their last N picks (when the tag has enough)
+MOM_SENTENCES_NO_REPEAT = int(os.getenv("MOM_SENTENCES_NO_REPEAT", "5"))
+MOM_SENTENCES_MAX_USERS = int(os.getenv("MOM_SENTENCES_MAX_USERS", "10000"))
+
+
+def _weight(row: Dict[str, Any]) -> float:
+    if row.get("weight") is None:
+        return 1.0
+    try:
+        return max(float(row["weight"]), 0.0)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+class MomSentenceIndex:
+    """
+    In-memory copy of the `mom_sentences` templates, indexed by mood tag.
+
+    The table is small, static content edited by hand in Supabase, so it is loaded
+    once and refreshed every MOM_SENTENCES_REFRESH_SECONDS (edits show up within
+    that interval on every worker). Picks are weighted by an optional `weight` column and avoid each
+    user's recent templates, without touching the database.
+    """
+
+    def __init__(self, refresh_seconds: float = MOM_SENTENCES_REFRESH_SECONDS,
+                 no_repeat: int = MOM_SENTENCES_NO_REPEAT, max_users: int = MOM_SENTENCES_MAX_USERS):
+        self.refresh_seconds = refresh_seconds
+        self.no_repeat = no_repeat
+        self._loaded = False
+        self._loaded_at = 0.0
+        self._by_tag: Dict[str, List[Dict[str, Any]]] = {}
+        self._load_lock = asyncio.Lock()
+        # Each user's recent templates, least recently active users evicted first
+        self._history: "TTLCache[str, Deque[str]]" = TTLCache(None, max_users)
+
+    def _stale(self) -> bool:
+        return not self._loaded or time.monotonic() - self._loaded_at >= self.refresh_seconds
+
+    async def load(self, db):
+        """Reloads the templates. `db` is an AsyncSupabaseService."""
+        result = await db.table(MOM_SENTENCES_TABLE).select("*").execute()
+        by_tag: Dict[str, List[Dict[str, Any]]] = {}
+        for row in result.data or []:
+            if row.get("message_template"):
+                by_tag.setdefault(row.get("mood_tag"), []).append(row)
+        self._by_tag = by_tag
+        self._loaded = True
+        self._loaded_at = time.monotonic()
+        metrics.increment("mom_sentences.loads")
+        metrics.set_gauge("mom_sentences.templates", sum(len(rows) for rows in by_tag.values()))
+        logger.info(f"Loaded {MOM_SENTENCES_TABLE}: {len(by_tag)} mood tags")
+
+    async def ensure_loaded(self, db):
+        if not self._stale():
+            return
+        async with self._load_lock:
+            if not self._stale():
+                return
+            try:
+                await self.load(db)
+            except Exception as e:
+                metrics.increment("mom_sentences.load_errors")
+                logger.error(f"Error loading {MOM_SENTENCES_TABLE}: {e}")
+                if not self._loaded:
+                    raise
+                # Keep serving the previous copy; retry after another interval
+                self._loaded_at = time.monotonic()
+
+    def pick(self, mood_tag: str, user_id: Optional[str] = None) -> Optional[str]:
+        """A weighted random template for the tag (falling back to `normal`), or None if there are none."""
+        rows = self._by_tag.get(mood_tag) or self._by_tag.get(MOM_SENTENCES_FALLBACK_TAG) or []
+        rows = [row for row in rows if _weight(row) > 0] or rows
+        if not rows:
+            return None
+        recent = self._history.get(user_id) if user_id else None
+        # Never exclude every template: with n templates only the last n-1 picks are avoided
+        avoid = set(list(recent)[-(len(rows) - 1):]) if recent and len(rows) > 1 else set()
+        candidates = [row for row in rows if row["message_template"] not in avoid] or rows
+        weights = [_weight(row) for row in candidates]
+        template = random.choices(candidates, weights=weights if any(weights) else None)[0]["message_template"]
+        if user_id and self.no_repeat > 0:
+            if recent is None:
+                recent = deque(maxlen=self.no_repeat)
+                self._history.set(user_id, recent)
+            recent.append(template)
+        return template
+
+
+mom_sentences = MomSentenceIndex()
@@ -0,0 +1,63 @@
+# core/ownership_cache.py
+import os
+from typing import Dict, Iterable, Optional
+
+from core.metrics import metrics
+from core.ttl_cache import TTLCache
+
+OWNERSHIP_CACHE_TTL_SECONDS = float(os.getenv("OWNERSHIP_CACHE_TTL_SECONDS", "60"))
+# "Not yours" answers expire sooner: a profile created on another replica shows up quickly
+OWNERSHIP_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("OWNERSHIP_CACHE_NEGATIVE_TTL_SECONDS", "10"))
+OWNERSHIP_CACHE_MAX_ENTRIES = int(os.getenv("OWNERSHIP_CACHE_MAX_ENTRIES", "10000"))
+
+
+class OwnershipCache:
+    """
+    Per-process TTL + LRU cache of "does baby_id belong to user_id" answers.
+
+    Both outcomes are cached (negative ones with a shorter TTL). Lookup errors are
+    never cached. Creating or deleting a profile must call `invalidate` so this
+    replica sees the change at once; other replicas see it within the TTL.
+    """
+
+    def __init__(self, ttl: float = OWNERSHIP_CACHE_TTL_SECONDS,
+                 negative_ttl: float = OWNERSHIP_CACHE_NEGATIVE_TTL_SECONDS,
+                 max_entries: int = OWNERSHIP_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: TTLCache = TTLCache(ttl, max_entries)
+
+    def get(self, user_id: str, baby_id: str) -> Optional[bool]:
+        """True/False if the answer is cached, None on a miss."""
+        owned = self._entries.get((user_id, baby_id))
+        if owned is None:
+            metrics.increment("ownership_cache.misses")
+            return None
+        metrics.increment("ownership_cache.hits", result="owned" if owned else "denied")
+        return owned
+
+    def get_many(self, user_id: str, baby_ids: Iterable[str]) -> Dict[str, bool]:
+        """Cached answers for the ids that have one; missing ids are left out."""
+        found = {}
+        for baby_id in baby_ids:
+            owned = self.get(user_id, baby_id)
+            if owned is not None:
+                found[baby_id] = owned
+        return found
+
+    def set(self, user_id: str, baby_id: str, owned: bool):
+        self._entries.set((user_id, baby_id), owned, ttl=self.ttl if owned else self.negative_ttl)
+
+    def invalidate(self, user_id: Optional[str] = None, baby_id: Optional[str] = None):
+        """Drops the entries matching `user_id` and/or `baby_id` (everything when both are None)."""
+        if user_id is None and baby_id is None:
+            self._entries.clear()
+            return
+        self._entries.pop_where(lambda k: (user_id is None or k[0] == user_id) and (baby_id is None or k[1] == baby_id))
+        metrics.increment("ownership_cache.invalidations")
+
+    def __len__(self):
+        return len(self._entries)
+
+
+ownership_cache = OwnershipCache()
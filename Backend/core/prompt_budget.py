@@ -0,0 +1,127 @@
+# core/prompt_budget.py
+import os
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from core.metrics import metrics
+from core.tokens import count_tokens, truncate_tokens
+
+logger = logging.getLogger(__name__)
+
+PROMPT_DEFAULT_INPUT_TOKENS = int(os.getenv("PROMPT_DEFAULT_INPUT_TOKENS", "2000"))
+PROMPT_DEFAULT_OUTPUT_TOKENS = int(os.getenv("PROMPT_DEFAULT_OUTPUT_TOKENS", "800"))
+# Per-endpoint "input:output" token budgets; override with e.g. "baby_analysis=1200:300,chat=4000:800"
+PROMPT_BUDGETS = os.getenv("PROMPT_BUDGETS", "")
+DEFAULT_PROMPT_BUDGETS = {
+    "baby_analysis": (1500, 400),
+    "task_breakdown": (1500, 400),
+    "mom_analysis": (800, 300),
+    "mom_onesentence": (800, 100),
+    "chat": (3000, 800),
+}
+
+
+@dataclass(frozen=True)
+class PromptBudget:
+    input_tokens: int
+    output_tokens: int
+
+
+def _parse_budgets(spec: str) -> Dict[str, PromptBudget]:
+    budgets = {name: PromptBudget(*limits) for name, limits in DEFAULT_PROMPT_BUDGETS.items()}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        input_tokens, _, output_tokens = value.partition(":")
+        if name.strip() and input_tokens.strip().isdigit():
+            default_output = budgets.get(name.strip(), PromptBudget(0, PROMPT_DEFAULT_OUTPUT_TOKENS)).output_tokens
+            budgets[name.strip()] = PromptBudget(
+                int(input_tokens), int(output_tokens) if output_tokens.strip().isdigit() else default_output
+            )
+    return budgets
+
+
+_budgets = _parse_budgets(PROMPT_BUDGETS)
+
+
+def budget_for(endpoint: str) -> PromptBudget:
+    return _budgets.get(endpoint) or PromptBudget(PROMPT_DEFAULT_INPUT_TOKENS, PROMPT_DEFAULT_OUTPUT_TOKENS)
+
+
+def _strip_empty(value: Any) -> Any:
+    if isinstance(value, dict):
+        stripped = {k: _strip_empty(v) for k, v in value.items()}
+        return {k: v for k, v in stripped.items() if v not in (None, "", [], {})}
+    if isinstance(value, (list, tuple)):
+        return [_strip_empty(v) for v in value]
+    return value
+
+
+def compact_value(value: Any) -> str:
+    """Prompt text for a section: strings as-is, lists/dicts as compact JSON without empty fields."""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(_strip_empty(value), ensure_ascii=False, separators=(",", ":"), default=str)
+    return str(value)
+
+
+def fit_value(value: Any, max_tokens: int, model: Optional[str] = None) -> str:
+    """
+    `compact_value(value)` within `max_tokens`. Lists lose entries from the front
+    (with a note of how many were left out) before anything is cut mid-entry.
+    """
+    text = compact_value(value)
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    if isinstance(value, (list, tuple)) and len(value) > 1:
+        # Largest tail of the list that still fits, found by bisection
+        low, high, best = 1, len(value) - 1, None
+        while low <= high:
+            keep = (low + high) // 2
+            candidate = f"{compact_value(list(value[-keep:]))} (+{len(value) - keep} earlier entries omitted)"
+            if count_tokens(candidate, model) <= max_tokens:
+                best, low = candidate, keep + 1
+            else:
+                high = keep - 1
+        if best is not None:
+            return best
+    return truncate_tokens(text, max_tokens, model)
+
+
+def build_prompt(endpoint: str, template: str, model: Optional[str] = None, **sections: Any) -> str:
+    """
+    Renders `template` (str.format placeholders) with the compacted `sections`,
+    keeping the whole prompt within the endpoint's input budget.
+
+    The template text itself is never cut. When the sections do not fit in what is
+    left, small sections are kept whole and the larger ones share the rest equally
+    (see `fit_value`). Prompt size and trimming are recorded per endpoint.
+    """
+    budget = budget_for(endpoint)
+    texts = {name: compact_value(value) for name, value in sections.items()}
+    sizes = {name: count_tokens(text, model) for name, text in texts.items()}
+    available = max(budget.input_tokens - count_tokens(template.format(**{name: "" for name in sections}), model), 0)
+
+    trimmed = 0
+    if sum(sizes.values()) > available:
+        remaining = available
+        ordered = sorted(sections, key=sizes.get)
+        for i, name in enumerate(ordered):
+            share = remaining // (len(ordered) - i)
+            if sizes[name] > share:
+                texts[name] = fit_value(sections[name], share, model)
+                trimmed += sizes[name] - count_tokens(texts[name], model)
+            remaining -= min(count_tokens(texts[name], model), remaining)
+
+    prompt = template.format(**texts)
+    tokens = count_tokens(prompt, model)
+    metrics.observe("prompt.tokens", tokens, endpoint=endpoint)
+    if trimmed:
+        metrics.increment("prompt.trimmed", endpoint=endpoint)
+        metrics.increment("prompt.trimmed_tokens", trimmed, endpoint=endpoint)
+        logger.info(f"Trimmed {trimmed} tokens from the {endpoint} prompt ({tokens} tokens, budget {budget.input_tokens})")
+    return prompt
@@ -0,0 +1,116 @@
+# core/reminder_engine.py
+import os
+import heapq
+import asyncio
+import logging
+import itertools
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, List, Tuple
+
+from baby_ai_agent import REMINDER_INTERVALS
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Reminders are written this long before they are due. The default matches the
+# reminder interval, so a new log still produces its reminder on the next tick.
+REMINDER_LEAD_MINUTES = int(os.getenv("REMINDER_LEAD_MINUTES", "120"))
+# Logs older than the agent's lookback window never produce reminders.
+REMINDER_LOOKBACK_HOURS = int(os.getenv("REMINDER_LOOKBACK_HOURS", "48"))
+
+
+def _as_utc(value) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class ReminderEngine:
+    """
+    Incremental reminder scheduling driven by new baby logs.
+
+    Keeps the latest log time per (baby, reminder type) and a min-heap of
+    `next_expected_time` entries. A tick only pops entries that are due, so idle
+    babies cost no database work. Heap entries are invalidated lazily: when a newer
+    log arrives, the old entry stays in the heap and is dropped when popped.
+
+    State is per process. Logs written through another replica are picked up by the
+    periodic reconciliation scan (`ReminderRunner.run`), which also seeds this engine.
+    """
+
+    def __init__(self, agent, lead: timedelta = timedelta(minutes=REMINDER_LEAD_MINUTES)):
+        self.agent = agent
+        self.lead = lead
+        self._lock = threading.Lock()
+        self._last: Dict[str, Dict[str, datetime]] = {}
+        self._heap: List[Tuple[datetime, int, str, str, datetime]] = []
+        self._seq = itertools.count()
+
+    def on_log(self, baby_id: str, log_type: str, logged_at) -> bool:
+        """
+        Records a new log. Returns True if it changed the baby's "last event" state
+        and a reminder was queued.
+        """
+        if log_type not in REMINDER_INTERVALS or not logged_at:
+            return False
+        logged_at = _as_utc(logged_at)
+        if logged_at < datetime.now(timezone.utc) - timedelta(hours=REMINDER_LOOKBACK_HOURS):
+            return False
+        with self._lock:
+            state = self._last.setdefault(baby_id, {})
+            current = state.get(log_type)
+            if current is not None and logged_at <= current:
+                return False
+            state[log_type] = logged_at
+            heapq.heappush(self._heap, (logged_at + REMINDER_INTERVALS[log_type], next(self._seq), baby_id, log_type, logged_at))
+        metrics.increment("reminder_engine.state_changes")
+        return True
+
+    def seed(self, baby_id: str, last_log_times: Dict[str, datetime]):
+        """Loads state found by a full scan without queueing already-handled reminders."""
+        with self._lock:
+            state = self._last.setdefault(baby_id, {})
+            for log_type, logged_at in last_log_times.items():
+                if state.get(log_type) is None or logged_at > state[log_type]:
+                    state[log_type] = logged_at
+
+    def pop_due(self, now: Optional[datetime] = None) -> List[Tuple[str, str, datetime]]:
+        """Pops every still-current entry whose reminder falls inside the lead window."""
+        horizon = (now or datetime.now(timezone.utc)) + self.lead
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= horizon:
+                _, _, baby_id, log_type, logged_at = heapq.heappop(self._heap)
+                if self._last.get(baby_id, {}).get(log_type) != logged_at:
+                    continue  # superseded by a newer log
+                due.append((baby_id, log_type, logged_at))
+        return due
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._heap)
+
+    def tick(self) -> Dict[str, List[dict]]:
+        """Creates reminders for every due entry (one dedup query and one insert)."""
+        due = self.pop_due()
+        metrics.set_gauge("reminder_engine.queue_size", self.pending())
+        if not due:
+            return {}
+        try:
+            created = self.agent.create_reminders(due)
+        except Exception as e:
+            logger.error(f"Error creating {len(due)} queued reminders: {e}")
+            # The dedup query or the insert failed and nothing was created:
+            # put the entries back so the next tick retries them
+            for baby_id, log_type, logged_at in due:
+                with self._lock:
+                    heapq.heappush(self._heap, (logged_at + REMINDER_INTERVALS[log_type], next(self._seq), baby_id, log_type, logged_at))
+            return {}
+        metrics.increment("reminder_engine.reminders_created", sum(len(v) for v in created.values()))
+        return created
+
+    async def run_tick(self, executor=None) -> Dict[str, List[dict]]:
+        """Runs `tick` off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self.tick)
@@ -0,0 +1,250 @@
+# core/reminder_runner.py
+import os
+import time
+import uuid
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, Iterator
+
+from supabase import Client
+
+from core.metrics import metrics, percentile
+
+logger = logging.getLogger(__name__)
+
+REMINDER_WORKERS = int(os.getenv("REMINDER_WORKERS", "8"))
+REMINDER_PAGE_SIZE = int(os.getenv("REMINDER_PAGE_SIZE", "500"))
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "100"))
+REMINDER_SHARD_INDEX = int(os.getenv("REMINDER_SHARD_INDEX", "0"))
+REMINDER_SHARD_COUNT = int(os.getenv("REMINDER_SHARD_COUNT", "1"))
+# Reconciliation re-reads logs created this long before its previous run, to cover
+# clock skew between replicas and the database and inserts committed late
+REMINDER_RECONCILE_OVERLAP_SECONDS = float(os.getenv("REMINDER_RECONCILE_OVERLAP_SECONDS", "120"))
+
+
+def baby_in_shard(baby_id: str, shard_index: int, shard_count: int) -> bool:
+    """Stable N-of-M assignment of a baby to a replica, based on its UUID."""
+    if shard_count <= 1:
+        return True
+    try:
+        key = uuid.UUID(str(baby_id)).int
+    except ValueError:
+        key = sum(str(baby_id).encode())
+    return key % shard_count == shard_index
+
+
+def iter_baby_id_pages(supabase: Client, page_size: int = REMINDER_PAGE_SIZE) -> Iterator[List[str]]:
+    """
+    Pages through `baby_profiles` ids with keyset pagination (`id > last_id`),
+    so each request stays cheap no matter how many profiles exist.
+    """
+    last_id: Optional[str] = None
+    while True:
+        query = supabase.table("baby_profiles").select("id").order("id").limit(page_size)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.execute().data or []
+        if not rows:
+            return
+        ids = [row["id"] for row in rows]
+        yield ids
+        if len(rows) < page_size:
+            return
+        last_id = ids[-1]
+
+
+def iter_active_baby_id_pages(supabase: Client, since: datetime,
+                              page_size: int = REMINDER_PAGE_SIZE) -> Iterator[List[str]]:
+    """
+    Pages through the babies with logs created after `since` (`created_at`, so
+    backdated logs count too), keyset-paged by log id. Each baby is yielded once.
+    """
+    seen = set()
+    last_id: Optional[str] = None
+    while True:
+        query = supabase.table("baby_logs").select("id, baby_id") \
+            .gt("created_at", since.isoformat()).order("id").limit(page_size)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.execute().data or []
+        if not rows:
+            return
+        ids = []
+        for row in rows:
+            if row.get("baby_id") and row["baby_id"] not in seen:
+                seen.add(row["baby_id"])
+                ids.append(row["baby_id"])
+        if ids:
+            yield ids
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+class ReminderRunStats:
+    """Throughput and per-batch latency numbers for one scheduler run."""
+
+    def __init__(self, shard_index: int, shard_count: int, mode: str = "full"):
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.mode = mode
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.scanned = 0
+        self.processed = 0
+        self.errors = 0
+        self.batches = 0
+        self.latencies_ms: List[float] = []
+
+    def record(self, ok: bool, babies: int, latency_ms: float):
+        if ok:
+            self.processed += babies
+        else:
+            self.errors += babies
+        self.batches += 1
+        self.latencies_ms.append(latency_ms)
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        handled = self.processed + self.errors
+        p50 = percentile(self.latencies_ms, 50)
+        p95 = percentile(self.latencies_ms, 95)
+        return {
+            "started_at": self.started_at.isoformat(),
+            "shard": f"{self.shard_index}/{self.shard_count}",
+            "mode": self.mode,
+            "scanned": self.scanned,
+            "processed": self.processed,
+            "errors": self.errors,
+            "batches": self.batches,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_per_s": round(handled / elapsed, 2) if elapsed > 0 else None,
+            "latency_ms_p50": round(p50, 2) if p50 is not None else None,
+            "latency_ms_p95": round(p95, 2) if p95 is not None else None,
+            "latency_ms_max": round(max(self.latencies_ms), 2) if self.latencies_ms else None,
+        }
+
+
+class ReminderRunner:
+    """
+    Runs `BabyAIAgent` reminder generation for every baby on a bounded thread pool.
+
+    Babies are handed to the agent in batches, which costs a constant number of
+    queries per batch. The agent uses the synchronous Supabase client, so each
+    batch runs on a worker thread and the event loop stays free for HTTP requests.
+
+    The first run scans every baby profile and seeds the engine. Later runs only
+    reconcile babies with logs created since the previous successful run (logs
+    written through other replicas); idle babies cost no queries.
+    """
+
+    def __init__(
+        self,
+        supabase: Client,
+        agent,
+        workers: int = REMINDER_WORKERS,
+        page_size: int = REMINDER_PAGE_SIZE,
+        batch_size: int = REMINDER_BATCH_SIZE,
+        shard_index: int = REMINDER_SHARD_INDEX,
+        shard_count: int = REMINDER_SHARD_COUNT,
+        engine=None,
+    ):
+        if shard_count < 1 or not 0 <= shard_index < shard_count:
+            raise ValueError(f"Invalid reminder shard {shard_index}/{shard_count}")
+        self.supabase = supabase
+        self.agent = agent
+        self.workers = max(1, workers)
+        self.page_size = page_size
+        self.batch_size = max(1, batch_size)
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        # Optional ReminderEngine, seeded with the latest log times seen by each scan
+        self.engine = engine
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="reminders")
+        self.last_run: Optional[Dict[str, Any]] = None
+        # Start of the last run that processed every baby it found without errors
+        self.reconciled_at: Optional[datetime] = None
+
+    def _generate_for_batch(self, baby_ids: List[str], current_time: datetime):
+        started = time.perf_counter()
+        try:
+            on_latest = self.engine.seed if self.engine else None
+            result = self.agent.generate_reminders_for_babies(baby_ids, current_time, on_latest=on_latest)
+            return True, result, (time.perf_counter() - started) * 1000
+        except Exception as e:
+            logger.error(f"Error processing reminders for {len(baby_ids)} babies: {e}")
+            return False, None, (time.perf_counter() - started) * 1000
+
+    async def generate_for_baby(self, baby_id: str, current_time: Optional[datetime] = None):
+        """Generates reminders for a single baby without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        ok, result, _ = await loop.run_in_executor(
+            self.executor, self._generate_for_batch, [baby_id], current_time or datetime.now(timezone.utc)
+        )
+        return result.get(baby_id, []) if ok else None
+
+    async def run(self, full: bool = False) -> Dict[str, Any]:
+        """
+        Processes this replica's shard and returns the run summary: every baby in
+        `baby_profiles` on the first run (or when `full`), otherwise only babies
+        with logs created since the last successful run.
+        """
+        loop = asyncio.get_running_loop()
+        current_time = datetime.now(timezone.utc)
+        full = full or self.reconciled_at is None
+        stats = ReminderRunStats(self.shard_index, self.shard_count, "full" if full else "active")
+        # Bound the number of in-flight batches so a large fleet never piles up
+        # thousands of pending futures on the executor queue.
+        slots = asyncio.Semaphore(self.workers * 2)
+        pending = set()
+
+        async def handle(batch: List[str]):
+            try:
+                ok, _, latency_ms = await loop.run_in_executor(
+                    self.executor, self._generate_for_batch, batch, current_time
+                )
+                stats.record(ok, len(batch), latency_ms)
+                metrics.observe("reminders.batch_latency_ms", latency_ms)
+            finally:
+                slots.release()
+
+        if full:
+            pages = iter_baby_id_pages(self.supabase, self.page_size)
+        else:
+            since = self.reconciled_at - timedelta(seconds=REMINDER_RECONCILE_OVERLAP_SECONDS)
+            pages = iter_active_baby_id_pages(self.supabase, since, self.page_size)
+        while True:
+            page = await loop.run_in_executor(self.executor, next, pages, None)
+            if page is None:
+                break
+            stats.scanned += len(page)
+            mine = [b for b in page if baby_in_shard(b, self.shard_index, self.shard_count)]
+            for i in range(0, len(mine), self.batch_size):
+                await slots.acquire()
+                task = asyncio.create_task(handle(mine[i:i + self.batch_size]))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+
+        if pending:
+            await asyncio.gather(*pending)
+
+        stats.finish()
+        if stats.errors == 0:
+            # Failed batches are picked up again by the next run
+            self.reconciled_at = current_time
+        summary = stats.summary()
+        self.last_run = summary
+        metrics.increment("reminders.runs")
+        metrics.increment("reminders.processed", stats.processed)
+        metrics.increment("reminders.errors", stats.errors)
+        metrics.set_gauge("reminders.last_run", summary)
+        return summary
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -1,8 +1,15 @@
 # core/supabase.py
 import os
+import copy
+import json
+import base64
 import logging
-from typing import Optional, Dict, Any, List
-from supabase import create_client, Client
+import threading
+from datetime import date, datetime
+from typing import Optional, Dict, Any, List, Iterable, Iterator, AsyncIterator, Tuple
+import httpx
+from supabase import create_client, Client, ClientOptions
+from postgrest import AsyncPostgrestClient
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException
 
@@ -10,30 +17,368 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Connection pool settings shared by every Supabase client in the process
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "20"))
+SUPABASE_KEEPALIVE = int(os.getenv("SUPABASE_KEEPALIVE", "10"))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "30"))
+SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "true").lower() in ("1", "true", "yes")
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "30"))
+
+
+class SupabaseClients:
+    """
+    Process-wide registry of Supabase clients.
+
+    Holds one sync `Client` and one async PostgREST client, each on its own pooled
+    httpx transport. Both are created on first use, so importing the app opens no
+    connections; after that every router, service and background job shares them.
+    """
+
+    _lock = threading.Lock()
+    _sync_client: Optional[Client] = None
+    _sync_http: Optional[httpx.Client] = None
+    _async_client: Optional[AsyncPostgrestClient] = None
+
+    @staticmethod
+    def _credentials():
+        supabase_url = os.getenv("SUPABASE_URL")
+        supabase_key = os.getenv("SUPABASE_KEY")
+
+        if not supabase_url or not supabase_key:
+            logger.error("Missing Supabase credentials")
+            raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables.")
+        return supabase_url, supabase_key
+
+    @staticmethod
+    def _limits() -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=SUPABASE_POOL_SIZE,
+            max_keepalive_connections=min(SUPABASE_KEEPALIVE, SUPABASE_POOL_SIZE),
+            keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+        )
+
+    @classmethod
+    def get_client(cls) -> Client:
+        if cls._sync_client is None:
+            with cls._lock:
+                if cls._sync_client is None:
+                    supabase_url, supabase_key = cls._credentials()
+                    cls._sync_http = httpx.Client(
+                        limits=cls._limits(), http2=SUPABASE_HTTP2, timeout=SUPABASE_TIMEOUT,
+                        follow_redirects=True,
+                    )
+                    cls._sync_client = create_client(
+                        supabase_url, supabase_key, options=ClientOptions(httpx_client=cls._sync_http)
+                    )
+                    logger.info(f"Supabase client created (pool={SUPABASE_POOL_SIZE}, http2={SUPABASE_HTTP2})")
+        return cls._sync_client
+
+    @classmethod
+    def get_async_client(cls) -> AsyncPostgrestClient:
+        if cls._async_client is None:
+            with cls._lock:
+                if cls._async_client is None:
+                    supabase_url, supabase_key = cls._credentials()
+                    http_client = httpx.AsyncClient(
+                        limits=cls._limits(), http2=SUPABASE_HTTP2, timeout=SUPABASE_TIMEOUT,
+                        follow_redirects=True,
+                    )
+                    cls._async_client = AsyncPostgrestClient(
+                        f"{supabase_url}/rest/v1",
+                        headers={
+                            "apikey": supabase_key,
+                            "Authorization": f"Bearer {supabase_key}",
+                            "Accept": "application/json",
+                            "Content-Type": "application/json",
+                        },
+                        http_client=http_client,
+                    )
+        return cls._async_client
+
+    @classmethod
+    async def close(cls):
+        """Closes the pooled connections on shutdown (no-op for clients never used)."""
+        with cls._lock:
+            sync_http, cls._sync_http, cls._sync_client = cls._sync_http, None, None
+            async_client, cls._async_client = cls._async_client, None
+        if async_client is not None:
+            await async_client.aclose()
+        if sync_http is not None:
+            sync_http.close()
+
+
+def _filter_value(value: Any) -> str:
+    """Quotes a value for a PostgREST logic filter (`or=(...)`)."""
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+# "exact" runs count(*); "planned"/"estimated" use planner statistics (cheaper, approximate)
+COUNT_METHODS = ("exact", "planned", "estimated")
+
+
+class _QuerySpec:
+    """
+    Immutable-ish description of a PostgREST select: projection, filters, ordering,
+    limit and an optional keyset cursor. `key` is the unique column used as the
+    final tie-breaker so keyset pages never skip or repeat rows (None disables it,
+    e.g. for tables with a composite primary key).
+    """
+
+    def __init__(self, client_getter, table: str, columns: Iterable[str] = ("*",), key: Optional[str] = "id"):
+        self._client_getter = client_getter
+        self.table = table
+        self.columns: List[str] = list(columns) or ["*"]
+        self.key = key
+        self._filters: List[Tuple[str, tuple]] = []
+        self._order: List[Tuple[str, bool]] = []
+        self._limit: Optional[int] = None
+        self._cursor: Optional[Dict[str, Any]] = None
+
+    def _copy(self):
+        clone = copy.copy(self)
+        clone.columns = list(self.columns)
+        clone._filters = list(self._filters)
+        clone._order = list(self._order)
+        return clone
+
+    def _filter(self, method: str, *args):
+        clone = self._copy()
+        clone._filters.append((method, args))
+        return clone
+
+    # Projection and filters
+    def select(self, *columns: str):
+        clone = self._copy()
+        clone.columns = list(columns) or ["*"]
+        return clone
+
+    def where(self, **equals: Any):
+        clone = self
+        for column, value in equals.items():
+            clone = clone.eq(column, value)
+        return clone
+
+    def eq(self, column: str, value: Any):
+        return self._filter("eq", column, value)
+
+    def neq(self, column: str, value: Any):
+        return self._filter("neq", column, value)
+
+    def in_(self, column: str, values: Iterable[Any]):
+        return self._filter("in_", column, list(values))
+
+    def is_(self, column: str, value: Any):
+        return self._filter("is_", column, "null" if value is None else value)
+
+    def gt(self, column: str, value: Any):
+        return self._filter("gt", column, _iso(value))
+
+    def gte(self, column: str, value: Any):
+        return self._filter("gte", column, _iso(value))
+
+    def lt(self, column: str, value: Any):
+        return self._filter("lt", column, _iso(value))
+
+    def lte(self, column: str, value: Any):
+        return self._filter("lte", column, _iso(value))
+
+    def between(self, column: str, start: Any = None, end: Any = None, inclusive_end: bool = True):
+        """Range filter; either bound may be None."""
+        clone = self
+        if start is not None:
+            clone = clone.gte(column, start)
+        if end is not None:
+            clone = clone.lte(column, end) if inclusive_end else clone.lt(column, end)
+        return clone
+
+    # Ordering, limit and keyset cursor
+    def order(self, column: str, desc: bool = False):
+        clone = self._copy()
+        clone._order.append((column, desc))
+        return clone
+
+    def limit(self, count: Optional[int]):
+        clone = self._copy()
+        clone._limit = count
+        return clone
+
+    def after(self, cursor: Optional[Dict[str, Any]]):
+        """Continues after the row whose ordering values are `cursor` (see `next_cursor`)."""
+        clone = self._copy()
+        clone._cursor = cursor
+        return clone
+
+    def _order_keys(self) -> List[Tuple[str, bool]]:
+        keys = list(self._order)
+        columns = [column for column, _ in keys]
+        if self.key and self.key not in columns:
+            keys.append((self.key, keys[-1][1] if keys else False))
+        return keys
+
+    def next_cursor(self, rows: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Cursor for the page after `rows`, or None when the page was not full."""
+        if not rows or self._limit is None or len(rows) < self._limit:
+            return None
+        last = rows[-1]
+        return {column: last.get(column) for column, _ in self._order_keys()}
+
+    def _keyset_filter(self) -> str:
+        # (a, b) > (x, y)  ==>  a > x OR (a = x AND b > y), per column direction
+        keys = self._order_keys()
+        clauses = []
+        for i, (column, desc) in enumerate(keys):
+            parts = [f"{c}.eq.{_filter_value(self._cursor[c])}" for c, _ in keys[:i]]
+            parts.append(f"{column}.{'lt' if desc else 'gt'}.{_filter_value(self._cursor[column])}")
+            clauses.append(parts[0] if len(parts) == 1 else f"and({','.join(parts)})")
+        return ",".join(clauses)
+
+    def _request(self):
+        columns = self.columns
+        if "*" not in columns:
+            # Keyset cursors need the ordering columns in every row
+            columns = columns + [c for c, _ in self._order_keys() if c not in columns]
+        request = self._client_getter().from_(self.table).select(",".join(columns))
+        for method, args in self._filters:
+            request = getattr(request, method)(*args)
+        if self._cursor:
+            request = request.or_(self._keyset_filter())
+        for column, desc in self._order_keys():
+            request = request.order(column, desc=desc)
+        if self._limit is not None:
+            request = request.limit(self._limit)
+        return request
+
+    def _count_request(self, method: str):
+        # HEAD request with Prefer: count=<method>; rows are never transferred
+        if method not in COUNT_METHODS:
+            raise ValueError(f"Unknown count method: {method}")
+        request = self._client_getter().from_(self.table).select(self.key or "*", count=method, head=True)
+        for method_name, args in self._filters:
+            request = getattr(request, method_name)(*args)
+        return request
+
+    def _page_queries(self, page_size: int):
+        query = self.limit(page_size)
+        return query if self._order_keys() else query.order(self.key or "id")
+
+
+def encode_cursor(cursor: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Opaque, URL-safe form of a keyset cursor for API responses."""
+    if cursor is None:
+        return None
+    raw = json.dumps(cursor, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, keys: Iterable[str]) -> Dict[str, Any]:
+    """Inverse of `encode_cursor`; raises ValueError for tampered or foreign cursors."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        cursor = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(cursor, dict) or set(cursor) != set(keys):
+        raise ValueError("Invalid cursor")
+    return cursor
+
+
+def _iso(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+
+class TableQuery(_QuerySpec):
+    """Fluent select on the sync client: `service.select("baby_logs", "id", "logged_at").eq(...).execute()`."""
+
+    def execute(self) -> List[Dict[str, Any]]:
+        try:
+            return self._request().execute().data or []
+        except Exception as e:
+            logger.error(f"Error querying {self.table}: {str(e)}")
+            raise HTTPException(status_code=500, detail="Query operation failed")
+
+    def count(self, method: str = "exact") -> int:
+        """Number of rows matching the filters, without fetching them."""
+        request = self._count_request(method)
+        try:
+            return request.execute().count or 0
+        except Exception as e:
+            logger.error(f"Error counting {self.table}: {str(e)}")
+            raise HTTPException(status_code=500, detail="Query operation failed")
+
+    def pages(self, page_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """Yields successive keyset pages until the result set is exhausted."""
+        query = self._page_queries(page_size)
+        while True:
+            rows = query.execute()
+            if rows:
+                yield rows
+            cursor = query.next_cursor(rows)
+            if cursor is None:
+                return
+            query = query.after(cursor)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for page in self.pages():
+            yield from page
+
+
+class AsyncTableQuery(_QuerySpec):
+    """Async counterpart of TableQuery for AsyncSupabaseService."""
+
+    async def execute(self) -> List[Dict[str, Any]]:
+        try:
+            return (await self._request().execute()).data or []
+        except Exception as e:
+            logger.error(f"Error querying {self.table}: {str(e)}")
+            raise HTTPException(status_code=500, detail="Query operation failed")
+
+    async def count(self, method: str = "exact") -> int:
+        request = self._count_request(method)
+        try:
+            return (await request.execute()).count or 0
+        except Exception as e:
+            logger.error(f"Error counting {self.table}: {str(e)}")
+            raise HTTPException(status_code=500, detail="Query operation failed")
+
+    async def pages(self, page_size: int = 1000) -> AsyncIterator[List[Dict[str, Any]]]:
+        query = self._page_queries(page_size)
+        while True:
+            rows = await query.execute()
+            if rows:
+                yield rows
+            cursor = query.next_cursor(rows)
+            if cursor is None:
+                return
+            query = query.after(cursor)
+
+    async def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        async for page in self.pages():
+            for row in page:
+                yield row
+
+
 class SupabaseService:
     """Centralized service for Supabase operations"""
     
     _instance: Optional['SupabaseService'] = None
     
-    def __init__(self):
-        self.client = self._create_client()
-        
     @classmethod
     def get_instance(cls) -> 'SupabaseService':
         if cls._instance is None:
             cls._instance = cls()
         return cls._instance
         
-    def _create_client(self) -> Client:
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_KEY")
-        
-        if not supabase_url or not supabase_key:
-            logger.error("Missing Supabase credentials")
-            raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables.")
-            
-        return create_client(supabase_url, supabase_key)
+    @property
+    def client(self) -> Client:
+        return SupabaseClients.get_client()
         
+    def select(self, table: str, *columns: str, key: Optional[str] = "id") -> TableQuery:
+        """Fluent query with projection, ranges, ordering, limit and keyset paging."""
+        return TableQuery(lambda: self.client, table, columns, key=key)
+
     # Common CRUD operations
     def get_by_id(self, table: str, id: str) -> Optional[Dict[str, Any]]:
         try:
@@ -70,6 +415,107 @@ class SupabaseService:
             logger.error(f"Error querying {table}: {str(e)}")
             raise HTTPException(status_code=500, detail="Query operation failed")
 
-# FastAPI dependency
+
+class AsyncSupabaseService:
+    """Async counterpart of SupabaseService for `async def` routes.
+
+    Backed by the shared async PostgREST client, so queries are awaited instead of
+    blocking the event loop.
+    """
+
+    _instance: Optional['AsyncSupabaseService'] = None
+
+    @classmethod
+    def get_instance(cls) -> 'AsyncSupabaseService':
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @property
+    def client(self) -> AsyncPostgrestClient:
+        return SupabaseClients.get_async_client()
+
+    def table(self, table: str):
+        """Raw async query builder, for queries the helpers below don't cover."""
+        return self.client.from_(table)
+
+    def select(self, table: str, *columns: str, key: Optional[str] = "id") -> AsyncTableQuery:
+        """Fluent query with projection, ranges, ordering, limit and keyset paging."""
+        return AsyncTableQuery(lambda: self.client, table, columns, key=key)
+
+    # Common CRUD operations
+    async def get_by_id(self, table: str, id: str) -> Optional[Dict[str, Any]]:
+        try:
+            result = await self.client.from_(table).select("*").eq("id", id).execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.error(f"Error getting record from {table}: {str(e)}")
+            raise HTTPException(status_code=500, detail="Database error")
+
+    async def insert(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            result = await self.client.from_(table).insert(data).execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.error(f"Error inserting to {table}: {str(e)}")
+            raise HTTPException(status_code=500, detail="Insert operation failed")
+
+    async def update(self, table: str, id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            result = await self.client.from_(table).update(data).eq("id", id).execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.error(f"Error updating {table} record {id}: {str(e)}")
+            raise HTTPException(status_code=500, detail="Update operation failed")
+
+    async def query(self, table: str, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        try:
+            query = self.client.from_(table).select("*")
+            for key, value in filters.items():
+                query = query.eq(key, value)
+            result = await query.execute()
+            return result.data
+        except Exception as e:
+            logger.error(f"Error querying {table}: {str(e)}")
+            raise HTTPException(status_code=500, detail="Query operation failed")
+
+    # Batch operations: one round trip for many rows
+    async def get_by_ids(self, table: str, ids: List[str], column: str = "id") -> List[Dict[str, Any]]:
+        if not ids:
+            return []
+        try:
+            result = await self.client.from_(table).select("*").in_(column, ids).execute()
+            return result.data
+        except Exception as e:
+            logger.error(f"Error getting records from {table}: {str(e)}")
+            raise HTTPException(status_code=500, detail="Database error")
+
+    async def insert_many(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not rows:
+            return []
+        try:
+            result = await self.client.from_(table).insert(rows).execute()
+            return result.data or []
+        except Exception as e:
+            logger.error(f"Error inserting {len(rows)} rows to {table}: {str(e)}")
+            raise HTTPException(status_code=500, detail="Insert operation failed")
+
+    async def update_many(self, table: str, ids: List[str], data: Dict[str, Any], column: str = "id") -> List[Dict[str, Any]]:
+        if not ids:
+            return []
+        try:
+            result = await self.client.from_(table).update(data).in_(column, ids).execute()
+            return result.data or []
+        except Exception as e:
+            logger.error(f"Error updating {len(ids)} {table} records: {str(e)}")
+            raise HTTPException(status_code=500, detail="Update operation failed")
+
+# FastAPI dependencies
+def get_supabase_client() -> Client:
+    return SupabaseClients.get_client()
+
 def get_supabase() -> SupabaseService:
     return SupabaseService.get_instance()
+
+def get_async_supabase() -> AsyncSupabaseService:
+    return AsyncSupabaseService.get_instance()
@@ -0,0 +1,73 @@
+# core/task_stats.py
+import os
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from core.metrics import metrics
+from core.ttl_cache import TTLCache
+
+TASK_STATS_TTL_SECONDS = float(os.getenv("TASK_STATS_TTL_SECONDS", "300"))
+TASK_STATS_MAX_ENTRIES = int(os.getenv("TASK_STATS_MAX_ENTRIES", "10000"))
+
+
+def _day_bounds(now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """Start of today and of this week (Monday), in UTC."""
+    now = now or datetime.now(timezone.utc)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return today, today - timedelta(days=today.weekday())
+
+
+class TaskStatsCache:
+    """
+    Per-mom task counters for the current UTC day: `pending`, `completed_today` and
+    `completed_week`. They are computed with three count-only queries and cached
+    until the day changes, the TTL expires, or `invalidate` is called (task save and
+    status updates do this).
+    """
+
+    def __init__(self, ttl: float = TASK_STATS_TTL_SECONDS, max_entries: int = TASK_STATS_MAX_ENTRIES):
+        self.ttl = ttl
+        self._entries: TTLCache = TTLCache(ttl, max_entries)
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; counts computed across one are not cached
+        self._epoch = 0
+
+    def _cached(self, mom_id: str, day: str) -> Optional[Dict[str, int]]:
+        entry = self._entries.get(mom_id)
+        if entry is None or entry[0] != day:
+            return None
+        return dict(entry[1])
+
+    async def get(self, db, mom_id: str) -> Dict[str, int]:
+        """`db` is an AsyncSupabaseService."""
+        today, week_start = _day_bounds()
+        day = today.date().isoformat()
+        stats = self._cached(mom_id, day)
+        if stats is not None:
+            metrics.increment("task_stats.hits")
+            return stats
+        metrics.increment("task_stats.misses")
+        epoch = self._epoch
+
+        tasks = db.select("tasks", key="task_id").eq("mom_id", mom_id)
+        completed = tasks.eq("status", "completed")
+        pending, completed_today, completed_week = await asyncio.gather(
+            tasks.eq("status", "pending").count(),
+            completed.gte("complete_date", today).count(),
+            completed.gte("complete_date", week_start).count(),
+        )
+        stats = {"pending": pending, "completed_today": completed_today, "completed_week": completed_week}
+        with self._lock:
+            if epoch == self._epoch:
+                self._entries.set(mom_id, (day, dict(stats)))
+        return stats
+
+    def invalidate(self, mom_id: str):
+        with self._lock:
+            self._epoch += 1
+            self._entries.pop(mom_id, None)
+
+
+task_stats = TaskStatsCache()
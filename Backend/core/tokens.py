@@ -0,0 +1,59 @@
+# core/tokens.py
+import logging
+from functools import lru_cache
+from typing import Optional
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character-based estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODING = "o200k_base"
+
+
+@lru_cache(maxsize=32)
+def _encoding(model: Optional[str]):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(DEFAULT_ENCODING)
+    except KeyError:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        # Encodings are downloaded on first use; without network we estimate instead
+        logger.warning(f"tiktoken encoding unavailable, estimating token counts: {e}")
+        return None
+
+
+def _char_tokens(char: str) -> float:
+    # ~4 ASCII characters per token; CJK and other non-ASCII text is about one token per character
+    return 0.25 if ord(char) < 128 else 1.0
+
+
+def count_tokens(text: Optional[str], model: Optional[str] = None) -> int:
+    """Token count of `text` for `model` (tiktoken when installed, otherwise an estimate)."""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return int(sum(_char_tokens(char) for char in text) + 0.999)
+
+
+def truncate_tokens(text: Optional[str], max_tokens: int, model: Optional[str] = None, suffix: str = "…") -> str:
+    """`text` cut to at most `max_tokens` tokens (the suffix marks a cut)."""
+    if not text or max_tokens <= 0:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    encoding = _encoding(model)
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens]) + suffix
+    used = 0.0
+    for i, char in enumerate(text):
+        used += _char_tokens(char)
+        if used > max_tokens:
+            return text[:i] + suffix
+    return text
@@ -0,0 +1,72 @@
+# core/ttl_cache.py
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+from core.metrics import metrics
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Thread-safe, per-process TTL + LRU map shared by the in-memory caches in core/.
+
+    Entries expire `ttl` seconds after they are set (None: never; `set` can override
+    it per entry) and the least recently used ones are evicted beyond `max_entries`.
+    With a `name`, evictions are counted as the `<name>.evictions` metric.
+    """
+
+    def __init__(self, ttl: Optional[float], max_entries: int, name: Optional[str] = None):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[K, Tuple[float, V]]" = OrderedDict()
+
+    def get(self, key: K, default: Any = None) -> Any:
+        """The value for `key` (marking it recently used), or `default` if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = float("inf") if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted and self.name:
+            metrics.increment(f"{self.name}.evictions", evicted)
+
+    def pop(self, key: K, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def pop_where(self, predicate: Callable[[K], bool]) -> int:
+        """Drops every entry whose key matches; returns how many were dropped."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
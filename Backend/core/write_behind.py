@@ -0,0 +1,304 @@
+# core/write_behind.py
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from postgrest.exceptions import APIError
+
+from core.metrics import metrics
+from core.supabase import get_async_supabase
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_FLUSH_SECONDS = float(os.getenv("WRITE_BEHIND_FLUSH_SECONDS", "1"))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "200"))
+# Rows held in memory; beyond this, new rows go straight to the spill file
+WRITE_BEHIND_MAX_ROWS = int(os.getenv("WRITE_BEHIND_MAX_ROWS", "10000"))
+# Spill and dead-letter files, one set per worker process (absolute, not cwd-relative)
+WRITE_BEHIND_SPILL_DIR = os.path.abspath(os.getenv(
+    "WRITE_BEHIND_SPILL_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "write_behind_spill"),
+))
+# How often spilled rows are retried while the database keeps failing
+WRITE_BEHIND_RETRY_SECONDS = float(os.getenv("WRITE_BEHIND_RETRY_SECONDS", "30"))
+
+# spill-<pid>.jsonl is appended to by its worker only; replay-<pid>-<n>.jsonl is a
+# spill file claimed (renamed) by worker <pid> while it replays it
+_SPILL_FILE = re.compile(r"^(?:spill-(\d+)|replay-(\d+)-\d+)\.jsonl$")
+
+Row = Tuple[str, Dict[str, Any]]
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """
+    True when PostgREST rejected the rows themselves (a 4xx: bad column, type or
+    constraint), so retrying the same rows can never succeed. Connection errors
+    and 5xx responses are transient.
+    """
+    if not isinstance(error, APIError):
+        return False
+    code = error.code
+    if isinstance(code, int) or (isinstance(code, str) and code.isdigit()):
+        return 400 <= int(code) < 500
+    code = str(code or "")
+    # SQLSTATE classes 22 (data), 23 (integrity), 42 (undefined column/table, syntax);
+    # PGRST1xx/PGRST2xx are PostgREST request and schema errors
+    return code[:2] in ("22", "23", "42") or code.startswith(("PGRST1", "PGRST2"))
+
+
+class WriteBehindQueue:
+    """
+    In-process write-behind buffer for inserts that the response does not depend on
+    (chat_logs, emotion_log).
+
+    `enqueue` only appends to memory. A background task inserts the rows per table in
+    batches every WRITE_BEHIND_FLUSH_SECONDS, or sooner once WRITE_BEHIND_BATCH_SIZE
+    rows are waiting. Rows that cannot be written now (database unreachable, or the
+    memory bound reached) are appended to this worker's spill file and replayed
+    later; rows the database rejects go to a dead-letter file instead of being
+    retried forever. `close` lets the running flush finish and flushes the rest.
+
+    Rows are only durable once written or spilled: a hard crash loses at most one
+    flush interval of rows. Replay is at-least-once, so an interrupted replay may
+    insert a batch twice.
+    """
+
+    def __init__(self, db_getter, flush_seconds: float = WRITE_BEHIND_FLUSH_SECONDS,
+                 batch_size: int = WRITE_BEHIND_BATCH_SIZE, max_rows: int = WRITE_BEHIND_MAX_ROWS,
+                 spill_dir: str = WRITE_BEHIND_SPILL_DIR, retry_seconds: float = WRITE_BEHIND_RETRY_SECONDS):
+        self._db_getter = db_getter
+        self.flush_seconds = flush_seconds
+        self.batch_size = max(1, batch_size)
+        self.max_rows = max(1, max_rows)
+        self.spill_dir = spill_dir
+        self.retry_seconds = retry_seconds
+        self._rows: Deque[Row] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._closing = False
+        self._next_replay = 0.0
+        self._claims = 0
+
+    @property
+    def spill_path(self) -> str:
+        return os.path.join(self.spill_dir, f"spill-{os.getpid()}.jsonl")
+
+    @property
+    def dead_letter_path(self) -> str:
+        return os.path.join(self.spill_dir, f"dead-letter-{os.getpid()}.jsonl")
+
+    def __len__(self):
+        return len(self._rows)
+
+    def enqueue(self, table: str, row: Dict[str, Any]):
+        if len(self._rows) >= self.max_rows:
+            metrics.increment("write_behind.overflow", table=table)
+            self._spill([(table, row)])
+            return
+        self._rows.append((table, row))
+        metrics.increment("write_behind.enqueued", table=table)
+        if self._task is None:
+            self.start()
+        if self._wakeup is not None and len(self._rows) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self):
+        """Starts the flush loop on the running event loop (no-op outside one or if already running)."""
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Write-behind flush failed: {e}")
+
+    async def flush(self):
+        """Writes every buffered row now; rows that fail are spilled or dead-lettered."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if time.monotonic() >= self._next_replay:
+                await self._replay_spill()
+            while self._rows:
+                batch = [self._rows.popleft() for _ in range(min(self.batch_size, len(self._rows)))]
+                try:
+                    failed = await self._write(batch)
+                except BaseException:
+                    # Cancelled mid-insert: the rows may or may not be stored; keep them
+                    self._rows.extendleft(reversed(batch))
+                    raise
+                if failed:
+                    self._spill(failed)
+                    self._next_replay = time.monotonic() + self.retry_seconds
+        metrics.set_gauge("write_behind.queued", len(self._rows))
+
+    async def _insert(self, table: str, rows: List[Dict[str, Any]]):
+        # The raw PostgREST client, so APIError (and its code) reaches is_permanent_error
+        await self._db_getter().client.from_(table).insert(rows).execute()
+
+    async def _write(self, batch: List[Row]) -> List[Row]:
+        """
+        Inserts a batch, one statement per table, and returns the rows to retry later.
+        When the database rejects a batch, its rows are retried one by one so a single
+        bad row only dead-letters itself.
+        """
+        by_table: Dict[str, List[Dict[str, Any]]] = {}
+        for table, row in batch:
+            by_table.setdefault(table, []).append(row)
+        failed: List[Row] = []
+        for table, rows in by_table.items():
+            started = time.perf_counter()
+            try:
+                await self._insert(table, rows)
+                metrics.increment("write_behind.written", len(rows), table=table)
+                metrics.observe("write_behind.flush_ms", (time.perf_counter() - started) * 1000, table=table)
+                continue
+            except Exception as e:
+                metrics.increment("write_behind.errors", table=table)
+                if not is_permanent_error(e):
+                    logger.warning(f"Write-behind insert of {len(rows)} {table} rows failed, spilling: {e}")
+                    failed.extend((table, row) for row in rows)
+                    continue
+                logger.warning(f"Write-behind insert of {len(rows)} {table} rows rejected, retrying row by row: {e}")
+            for row in rows:
+                try:
+                    await self._insert(table, [row])
+                    metrics.increment("write_behind.written", table=table)
+                except Exception as e:
+                    if is_permanent_error(e):
+                        self._dead_letter(table, row, e)
+                    else:
+                        failed.append((table, row))
+        return failed
+
+    def _append_lines(self, path: str, lines: List[str]):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+
+    def _spill(self, rows: List[Row]) -> bool:
+        try:
+            self._append_lines(self.spill_path, [
+                json.dumps({"table": table, "row": row}, ensure_ascii=False, default=str) + "\n"
+                for table, row in rows
+            ])
+            metrics.increment("write_behind.spilled", len(rows))
+            return True
+        except OSError as e:
+            metrics.increment("write_behind.dropped", len(rows))
+            logger.error(f"Write-behind spill to {self.spill_path} failed, dropping {len(rows)} rows: {e}")
+            return False
+
+    def _dead_letter(self, table: str, row: Dict[str, Any], error: Exception):
+        metrics.increment("write_behind.dead_lettered", table=table)
+        logger.error(f"Write-behind {table} row rejected, moved to {self.dead_letter_path}: {error}")
+        try:
+            self._append_lines(self.dead_letter_path, [
+                json.dumps({"table": table, "row": row, "error": str(error)}, ensure_ascii=False, default=str) + "\n"
+            ])
+        except OSError as e:
+            metrics.increment("write_behind.dropped", table=table)
+            logger.error(f"Could not write dead letter to {self.dead_letter_path}, dropping row: {e}")
+
+    def _claim_spill_files(self) -> List[str]:
+        """
+        Renames this worker's spill file, and any left by dead workers, to replay
+        files owned by this process. Live workers' files are left alone: only their
+        owner appends to them, so only their owner may move them.
+        """
+        try:
+            names = os.listdir(self.spill_dir)
+        except FileNotFoundError:
+            return []
+        pid = os.getpid()
+        claimed = []
+        for name in sorted(names):
+            match = _SPILL_FILE.match(name)
+            if not match:
+                continue
+            owner = int(match.group(1) or match.group(2))
+            if owner != pid and _pid_alive(owner):
+                continue
+            self._claims += 1
+            target = os.path.join(self.spill_dir, f"replay-{pid}-{self._claims}.jsonl")
+            try:
+                os.replace(os.path.join(self.spill_dir, name), target)
+            except FileNotFoundError:
+                continue  # claimed by another worker first
+            claimed.append(target)
+        return claimed
+
+    async def _replay_spill(self):
+        for path in self._claim_spill_files():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entries = [json.loads(line) for line in f if line.strip()]
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not read write-behind spill file {path}: {e}")
+                self._next_replay = time.monotonic() + self.retry_seconds
+                continue
+            rows = [(entry["table"], entry["row"]) for entry in entries]
+            failed: List[Row] = []
+            done = 0
+            try:
+                for done in range(0, len(rows), self.batch_size):
+                    failed.extend(await self._write(rows[done:done + self.batch_size]))
+                done = len(rows)
+            finally:
+                # Rows not yet confirmed (including an interrupted batch) go back to
+                # this worker's spill file before the claimed file is removed
+                pending = failed + rows[done:]
+                if pending:
+                    self._next_replay = time.monotonic() + self.retry_seconds
+                if not pending or self._spill(pending):
+                    os.remove(path)
+            logger.info(f"Replayed {len(rows) - len(failed)} of {len(rows)} spilled write-behind rows")
+
+    async def close(self):
+        """Lets the running flush finish, stops the loop and writes (or spills) whatever is still buffered."""
+        self._closing = True
+        if self._task is not None:
+            self._wakeup.set()
+            try:
+                await self._task
+            except Exception as e:
+                logger.error(f"Write-behind loop failed: {e}")
+            self._task = None
+        self._next_replay = 0.0
+        await self.flush()
+
+
+write_behind = WriteBehindQueue(get_async_supabase)
@@ -1,15 +1,18 @@
 import json
-from typing import List, Dict
-from fastapi.responses import JSONResponse
-from fastapi import FastAPI, Depends, HTTPException, status
+from typing import List, Dict, Any, Tuple
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
 from fastapi.encoders import jsonable_encoder
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 from datetime import datetime, timezone, timedelta
 from typing import Optional, Literal
 import os
-from supabase import create_client, Client
+import hmac
+import uuid
+import logging
+from supabase import Client
 from dotenv import load_dotenv
 import jwt
 from baby_ai_agent import BabyAIAgent
@@ -17,6 +20,18 @@ from contextlib import asynccontextmanager # For lifespan events
 from apscheduler.schedulers.asyncio import AsyncIOScheduler # For background tasks
 from apscheduler.triggers.interval import IntervalTrigger
 from core.auth import get_current_user
+from core.llm_gateway import get_llm
+from core.llm_cache import get_llm_cache
+from core.baby_rollup import get_rollup_days, record_log, record_logs, log_day
+from agents.graph_registry import graphs
+from core.supabase import SupabaseClients, AsyncSupabaseService, get_async_supabase, encode_cursor, decode_cursor
+from core.metrics import metrics
+from core.ownership_cache import ownership_cache
+from core.mom_sentences import mom_sentences
+from core.write_behind import write_behind
+from core.chat_context import chat_context
+from core.reminder_runner import ReminderRunner
+from core.reminder_engine import ReminderEngine
 #from agents.baby_manager import get_baby_health_today, call_gpt_baby_analysis
 #from agents.mom_manager import get_mom_health_today, call_gpt_mom_analysis
 
@@ -34,38 +49,64 @@ def serialize_datetime(obj):
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# /metrics is only served when this is set, to callers sending it as a bearer token or X-Metrics-Token
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
 # --- Global Variables (Initialized in Lifespan) ---
 supabase: Client = None
 agent: BabyAIAgent = None
+reminder_runner: ReminderRunner = None
+reminder_engine: ReminderEngine = None
 scheduler: AsyncIOScheduler = None
 
 # --- Lifespan Management (Define BEFORE app instantiation) ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Initialize Supabase client, Agent, and Scheduler
-    global supabase, agent, scheduler
+    global supabase, agent, reminder_runner, reminder_engine, scheduler
     print("Starting up application...")
-    supabase_url = os.getenv("SUPABASE_URL")
-    supabase_key = os.getenv("SUPABASE_KEY")
-    if not supabase_url or not supabase_key:
-        raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables.")
-    
-    supabase = create_client(supabase_url, supabase_key)
+    supabase = SupabaseClients.get_client()
+    compiled = graphs.compile_all()
+    print(f"Compiled agent graphs: {', '.join(compiled)}")
+    try:
+        await mom_sentences.ensure_loaded(AsyncSupabaseService.get_instance())
+    except Exception as e:
+        print(f"⚠️ Could not preload mom_sentences (will retry on first use): {str(e)}")
     agent = BabyAIAgent(supabase)
+    reminder_engine = ReminderEngine(agent)
+    reminder_runner = ReminderRunner(supabase, agent, engine=reminder_engine)
+    print(f"Reminder runner: {reminder_runner.workers} workers, shard {reminder_runner.shard_index}/{reminder_runner.shard_count}")
     
     # Initialize and start the scheduler
     scheduler = AsyncIOScheduler(timezone="UTC") # Use UTC for consistency
-    # Add the job to run reminder generation periodically (e.g., every hour)
-    # Note: This runs for *all* babies. A more scalable approach might involve
-    # triggering per baby based on activity or using a dedicated task queue.
+    # New logs feed the incremental reminder engine; this tick only writes reminders
+    # that are due, so babies without new logs cost no database work.
+    scheduler.add_job(
+        run_reminder_engine_tick,
+        trigger=IntervalTrigger(seconds=int(os.getenv("REMINDER_TICK_SECONDS", "60"))),
+        id="reminder_engine_tick",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+    # Reconciliation pass: a full scan at startup seeds the engine; later runs only
+    # revisit babies with logs created since the previous run (written through other
+    # replicas), so idle babies cost nothing. Babies are processed on a bounded thread
+    # pool, and REMINDER_SHARD_INDEX / REMINDER_SHARD_COUNT split the fleet across replicas.
     scheduler.add_job(
         run_reminder_generation_for_all_babies,
-        trigger=IntervalTrigger(minutes=10), # Adjust interval as needed
+        trigger=IntervalTrigger(minutes=int(os.getenv("REMINDER_RECONCILE_MINUTES", "60"))),
         id="generate_all_reminders",
-        replace_existing=True
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+        next_run_time=datetime.now(timezone.utc)
     )
     scheduler.start()
     print("Scheduler started.")
+    write_behind.start()
     
     yield # Application runs here
 
@@ -74,6 +115,12 @@ async def lifespan(app: FastAPI):
     if scheduler and scheduler.running:
         scheduler.shutdown()
         print("Scheduler shut down.")
+    if reminder_runner:
+        reminder_runner.shutdown()
+    await chat_context.close()
+    await write_behind.close()  # Flush buffered chat/emotion log rows before the pool closes
+    await SupabaseClients.close()
+    await get_llm().close()
 
 
 app = FastAPI(
@@ -91,27 +138,40 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor", "ETag"],  # Pagination cursor (GET /baby_logs, /api/task/incomplete) and task list ETag
 )
 
 security = HTTPBearer()
 
-# Supabase client setup
-supabase: Client = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_KEY")
-)
-
 # --- Models ---
 class BabyLogCreate(BaseModel):
     baby_id: str
     log_type: Literal["feeding", "diaper", "sleep", "cry", "bowel", "outside"]
     log_data: dict
     logged_at: datetime
+    # Client-generated; a log re-sent with the same key is only stored once (bulk uploads)
+    idempotency_key: Optional[str] = Field(None, max_length=200)
     class Config:
         json_encoders = {
             datetime: lambda v: v.isoformat()
         }
 
+# Columns returned by GET /baby_logs (the frontend's BabyLog shape)
+BABY_LOG_COLUMNS = ("id", "baby_id", "log_type", "log_data", "logged_at")
+# GET /baby_logs pages on (logged_at, id); clients follow the X-Next-Cursor header
+BABY_LOGS_PAGE_SIZE = int(os.getenv("BABY_LOGS_PAGE_SIZE", "500"))
+BABY_LOGS_MAX_PAGE_SIZE = 1000
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# POST /baby_logs/bulk: max logs per request and rows per insert statement
+BABY_LOGS_BULK_MAX = int(os.getenv("BABY_LOGS_BULK_MAX", "5000"))
+BABY_LOGS_BULK_CHUNK = int(os.getenv("BABY_LOGS_BULK_CHUNK", "500"))
+
+class BabyLogBulkCreate(BaseModel):
+    # Raw items: each one is validated as a BabyLogCreate and reported on separately
+    logs: List[Any] = Field(..., min_length=1, max_length=BABY_LOGS_BULK_MAX)
+
+_baby_log_list = TypeAdapter(List[BabyLogCreate])
+
 class ReminderCreate(BaseModel):
     baby_id: str
     reminder_type: Literal["feed", "diaper", "sleep"]
@@ -147,11 +207,18 @@ class CompleteReminderByLog(BaseModel):
 
 
 # --- Helper Functions ---
-async def _verify_baby_ownership(baby_id: str, user_id: str):
-    """Checks if the baby profile belongs to the authenticated user."""
+async def _verify_baby_ownership(baby_id: str, user_id: str, db: AsyncSupabaseService):
+    """Checks if the baby profile belongs to the authenticated user (answers are cached briefly, see core/ownership_cache.py)."""
+    owned = ownership_cache.get(user_id, baby_id)
+    if owned is False:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Baby profile not found or access denied.")
+    if owned:
+        return
     try:
-        result = supabase.table("baby_profiles").select("id").eq("id", baby_id).eq("user_id", user_id).maybe_single().execute()
-        if not result.data:
+        result = await db.table("baby_profiles").select("id").eq("id", baby_id).eq("user_id", user_id).maybe_single().execute()
+        owned = bool(result and result.data)
+        ownership_cache.set(user_id, baby_id, owned)
+        if not owned:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Baby profile not found or access denied.")
     except HTTPException as http_exc:
         raise http_exc # Re-raise specific HTTP exceptions
@@ -159,23 +226,61 @@ async def _verify_baby_ownership(baby_id: str, user_id: str):
         # Log the error e internally if needed
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error verifying baby ownership.")
 
+async def _owned_baby_ids(baby_ids: List[str], user_id: str, db: AsyncSupabaseService) -> set:
+    """Which of `baby_ids` belong to the user: cached answers, then one IN query for the rest (ids that are not UUIDs never match)."""
+    cached = ownership_cache.get_many(user_id, set(baby_ids))
+    owned = {baby_id for baby_id, is_owned in cached.items() if is_owned}
+    candidates = []
+    for baby_id in set(baby_ids) - cached.keys():
+        try:
+            uuid.UUID(baby_id)
+            candidates.append(baby_id)
+        except ValueError:
+            pass
+    if not candidates:
+        return owned
+    try:
+        result = await db.table("baby_profiles").select("id").in_("id", candidates).eq("user_id", user_id).execute()
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error verifying baby ownership.")
+    found = {row["id"] for row in result.data or []}
+    for baby_id in candidates:
+        ownership_cache.set(user_id, baby_id, baby_id in found)
+    return owned | found
+
+def _validate_bulk_logs(items: List[Any]) -> Tuple[Dict[int, BabyLogCreate], Dict[int, str]]:
+    """
+    Validates a whole batch with one TypeAdapter pass. If some items are invalid their
+    errors are collected by index and the rest is validated again in a second pass.
+    """
+    try:
+        return dict(enumerate(_baby_log_list.validate_python(items))), {}
+    except ValidationError as e:
+        errors: Dict[int, str] = {}
+        for err in e.errors():
+            field = ".".join(str(part) for part in err["loc"][1:])
+            errors.setdefault(err["loc"][0], f"{field}: {err['msg']}" if field else err["msg"])
+    valid = [i for i in range(len(items)) if i not in errors]
+    return dict(zip(valid, _baby_log_list.validate_python([items[i] for i in valid]))), errors
+
 
 # --- Baby Profile Endpoints ---
 @app.post("/babies", status_code=status.HTTP_201_CREATED)
-async def create_baby_profile(baby: BabyProfileCreate, user_id: str = Depends(get_current_user)):
+async def create_baby_profile(baby: BabyProfileCreate, user_id: str = Depends(get_current_user), db: AsyncSupabaseService = Depends(get_async_supabase)):
     try:
         data = baby.dict(exclude_unset=True) # birth_date will now be automatically converted by Pydantic
         data["user_id"] = user_id
         # data["birth_date"] = data["birth_date"].isoformat() # Removed manual conversion
-        result = supabase.table("baby_profiles").insert(data).execute()
+        result = await db.table("baby_profiles").insert(data).execute()
+        ownership_cache.invalidate(user_id=user_id)
         return result.data[0]
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/babies/{baby_id}")
-async def get_baby_profile(baby_id: str, user_id: str = Depends(get_current_user)):
+async def get_baby_profile(baby_id: str, user_id: str = Depends(get_current_user), db: AsyncSupabaseService = Depends(get_async_supabase)):
     try:
-        result = supabase.table("baby_profiles").select("*").eq("id", baby_id).eq("user_id", user_id).execute()
+        result = await db.table("baby_profiles").select("*").eq("id", baby_id).eq("user_id", user_id).execute()
         if not result.data:
             raise HTTPException(status_code=404, detail="Baby not found")
         return result.data[0]
@@ -183,78 +288,181 @@ async def get_baby_profile(baby_id: str, user_id: str = Depends(get_current_user
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/babies")
-async def get_all_babies(user_id: str = Depends(get_current_user)):
+async def get_all_babies(user_id: str = Depends(get_current_user), db: AsyncSupabaseService = Depends(get_async_supabase)):
     try:
-        result = supabase.table("baby_profiles").select("*").eq("user_id", user_id).execute()
+        result = await db.table("baby_profiles").select("*").eq("user_id", user_id).execute()
+        for baby in result.data or []:
+            ownership_cache.set(user_id, baby["id"], True)
         return result.data
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 # --- Baby Log Endpoints ---
 @app.post("/baby_logs", status_code=status.HTTP_201_CREATED)
-async def create_baby_log(log: BabyLogCreate, user_id: str = Depends(get_current_user)):
-    await _verify_baby_ownership(log.baby_id, user_id) # Verify ownership first
+async def create_baby_log(log: BabyLogCreate, user_id: str = Depends(get_current_user), db: AsyncSupabaseService = Depends(get_async_supabase)):
+    await _verify_baby_ownership(log.baby_id, user_id, db) # Verify ownership first
     try:
-        data = jsonable_encoder(log)
-        result = supabase.table("baby_logs").insert(data).execute()
+        data = jsonable_encoder(log, exclude_none=True)
+        result = await db.table("baby_logs").insert(data).execute()
+        if reminder_engine:
+            reminder_engine.on_log(log.baby_id, log.log_type, log.logged_at)
+        await record_log(db, log.baby_id, log.log_type, log.log_data, log.logged_at)
+        await get_llm_cache().invalidate(f"baby:{log.baby_id}")
         return result.data[0]
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/baby_logs/bulk")
+async def create_baby_logs_bulk(body: BabyLogBulkCreate, user_id: str = Depends(get_current_user), db: AsyncSupabaseService = Depends(get_async_supabase)):
+    """
+    Inserts many logs at once. Every item gets a result with its index and a status:
+    inserted, duplicate (its idempotency_key was already stored or repeated in the
+    batch), invalid, forbidden (not the user's baby) or failed (its chunk's insert
+    failed). Items are inserted BABY_LOGS_BULK_CHUNK rows per statement, so one bad
+    chunk does not lose the others; re-send failed items with the same keys.
+    """
+    results: List[Dict[str, Any]] = [{"index": i} for i in range(len(body.logs))]
+    logs, errors = _validate_bulk_logs(body.logs)
+    for index, error in errors.items():
+        results[index].update(status="invalid", error=error)
+
+    owned = await _owned_baby_ids([log.baby_id for log in logs.values()], user_id, db)
+    pending: List[int] = []
+    seen_keys = set()
+    for index, log in logs.items():
+        if log.baby_id not in owned:
+            results[index].update(status="forbidden", error="Baby profile not found or access denied.")
+        elif log.idempotency_key and (log.baby_id, log.idempotency_key) in seen_keys:
+            results[index]["status"] = "duplicate"
+        else:
+            seen_keys.add((log.baby_id, log.idempotency_key))
+            pending.append(index)
+
+    # Without any keys, skip the column so plain batches don't depend on it
+    with_keys = any(logs[i].idempotency_key for i in pending)
+    inserted_rows: List[Dict[str, Any]] = []
+    for start in range(0, len(pending), BABY_LOGS_BULK_CHUNK):
+        chunk = pending[start:start + BABY_LOGS_BULK_CHUNK]
+        rows = [jsonable_encoder(logs[i], exclude={"idempotency_key"} if not with_keys else None) for i in chunk]
+        try:
+            table = db.table("baby_logs")
+            if with_keys:
+                result = await table.upsert(rows, on_conflict="baby_id,idempotency_key", ignore_duplicates=True).execute()
+            else:
+                result = await table.insert(rows).execute()
+        except Exception as e:
+            print(f"❌ Bulk insert of {len(chunk)} baby logs failed: {str(e)}")
+            for index in chunk:
+                results[index].update(status="failed", error=str(e))
+            continue
+        # Skipped duplicates are missing from the returned rows; the rest come back in order
+        stored = iter(result.data or [])
+        stored_keys = {(row["baby_id"], row.get("idempotency_key")) for row in result.data or [] if row.get("idempotency_key")}
+        for index in chunk:
+            log = logs[index]
+            if log.idempotency_key and (log.baby_id, log.idempotency_key) not in stored_keys:
+                results[index]["status"] = "duplicate"
+                continue
+            row = next(stored, None)
+            results[index].update(status="inserted", id=row and row.get("id"))
+            if row:
+                inserted_rows.append(row)
+
+    if inserted_rows:
+        if reminder_engine:
+            for index in (r["index"] for r in results if r["status"] == "inserted"):
+                reminder_engine.on_log(logs[index].baby_id, logs[index].log_type, logs[index].logged_at)
+        await record_logs(db, inserted_rows)
+        for baby_id in {row["baby_id"] for row in inserted_rows}:
+            await get_llm_cache().invalidate(f"baby:{baby_id}")
+
+    counts = {name: sum(1 for r in results if r["status"] == name) for name in ("inserted", "duplicate", "invalid", "forbidden", "failed")}
+    metrics.increment("baby_logs.bulk_inserted", counts["inserted"])
+    return {**counts, "results": results}
+
 @app.get("/baby_logs")
 async def get_baby_logs(
+    request: Request,
+    response: Response,
     baby_id: str,
     log_type: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    user_id: str = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=BABY_LOGS_MAX_PAGE_SIZE),
+    stream: bool = False,
+    user_id: str = Depends(get_current_user),
+    db: AsyncSupabaseService = Depends(get_async_supabase)
 ):
-    await _verify_baby_ownership(baby_id, user_id) # Verify ownership first
-    try:
-        # query = supabase.table("baby_logs").select("*").eq("baby_id", baby_id).eq("user_id", user_id) # Removed user_id filter
-        query = supabase.table("baby_logs").select("*").eq("baby_id", baby_id)
-        
-        if log_type:
-            query = query.eq("log_type", log_type)
-        if start_date:
-            query = query.gte("logged_at", start_date.isoformat())
-        if end_date:
-            query = query.lte("logged_at", end_date.isoformat())
-            
-        result = query.order("logged_at", desc=True).execute()
-        return result.data
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    """
+    Newest-first baby logs, one page per request. The next page's cursor is sent in
+    the `X-Next-Cursor` header (absent on the last page). With `stream=true` or
+    `Accept: application/x-ndjson` every matching log is streamed as NDJSON instead.
+    """
+    await _verify_baby_ownership(baby_id, user_id, db) # Verify ownership first
+    # query = supabase.table("baby_logs").select("*").eq("baby_id", baby_id).eq("user_id", user_id) # Removed user_id filter
+    query = db.select("baby_logs", *BABY_LOG_COLUMNS).eq("baby_id", baby_id)
+    
+    if log_type:
+        query = query.eq("log_type", log_type)
+    query = query.between("logged_at", start_date, end_date).order("logged_at", desc=True)
+    if cursor:
+        try:
+            query = query.after(decode_cursor(cursor, ("logged_at", "id")))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    page_size = limit or BABY_LOGS_PAGE_SIZE
+
+    if stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        async def ndjson_rows():
+            try:
+                async for page in query.pages(page_size):
+                    yield "".join(json.dumps(row, default=str) + "\n" for row in page)
+            except Exception as e:
+                # Headers are already sent: end with an error line, then abort the
+                # chunked body so the client cannot mistake it for a complete export
+                logger.error(f"Error streaming baby logs for {baby_id}: {e}")
+                yield json.dumps({"error": "Streaming baby logs failed; the export is incomplete"}) + "\n"
+                raise
+        return StreamingResponse(ndjson_rows(), media_type=NDJSON_MEDIA_TYPE)
+
+    # execute() raises HTTPException(500) on database errors; let it through as a 5xx
+    query = query.limit(page_size)
+    rows = await query.execute()
+    next_cursor = encode_cursor(query.next_cursor(rows))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
 
 # --- Reminder Endpoints --- 
 @app.post("/reminders", status_code=status.HTTP_201_CREATED)
-async def create_reminder(reminder: ReminderCreate, user_id: str = Depends(get_current_user)):
-    await _verify_baby_ownership(reminder.baby_id, user_id) # Verify ownership first
+async def create_reminder(reminder: ReminderCreate, user_id: str = Depends(get_current_user), db: AsyncSupabaseService = Depends(get_async_supabase)):
+    await _verify_baby_ownership(reminder.baby_id, user_id, db) # Verify ownership first
     try:
         data = reminder.dict()
         # data.update({"user_id": user_id, "is_completed": False}) # Removed user_id insertion
         data.update({"is_completed": False})
-        result = supabase.table("reminders").insert(data).execute()
+        result = await db.table("reminders").insert(data).execute()
         return result.data[0]
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.patch("/reminders/{reminder_id}", status_code=status.HTTP_200_OK)
-async def update_reminder_status(reminder_id: str, user_id: str = Depends(get_current_user)):
+async def update_reminder_status(reminder_id: str, user_id: str = Depends(get_current_user), db: AsyncSupabaseService = Depends(get_async_supabase)):
     """Mark a reminder as completed after verifying baby ownership."""
     try:
         # 1. Fetch the reminder to get the baby_id
-        reminder_data = supabase.table("reminders").select("id, baby_id").eq("id", reminder_id).maybe_single().execute()
-        if not reminder_data.data:
+        reminder_data = await db.table("reminders").select("id, baby_id").eq("id", reminder_id).maybe_single().execute()
+        if not reminder_data or not reminder_data.data:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reminder not found.")
             
         baby_id = reminder_data.data["baby_id"]
 
         # 2. Verify ownership of the associated baby
-        await _verify_baby_ownership(baby_id, user_id)
+        await _verify_baby_ownership(baby_id, user_id, db)
 
         # 3. Update the reminder status (without user_id check here, as ownership is verified)
-        result = supabase.table("reminders").update({"is_completed": True}).eq("id", reminder_id).execute()
+        result = await db.table("reminders").update({"is_completed": True}).eq("id", reminder_id).execute()
 
         # Supabase update returns the updated rows. If empty, it might mean it was already complete.
         return result.data[0] if result.data else {"message": "Reminder status updated or was already complete."}
@@ -264,56 +472,19 @@ async def update_reminder_status(reminder_id: str, user_id: str = Depends(get_cu
         # Catch specific Supabase/DB errors if possible, otherwise generic error
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-def calculate_daily_summary(reminder, baby_id):
-    """Calculate daily summary statistics for a given reminder."""
+def calculate_daily_summary(reminder, daily: Dict[str, Any]):
+    """Daily summary statistics for a reminder, from its day's rollup row."""
     try:
-        reminder_date = datetime.fromisoformat(reminder['reminder_time']).date()
-        start_date = datetime.combine(reminder_date, datetime.min.time())
-        end_date = start_date + timedelta(days=1)
-        
-        # Get logs for this day
-        logs = supabase.table("baby_logs").select("*").eq("baby_id", baby_id).eq("log_type", reminder.get('reminder_type')).gte("logged_at", start_date.isoformat()).lt("logged_at", end_date.isoformat()).execute().data
-        
         # Calculate summary based on reminder type
         summary = {}
         if reminder['reminder_type'] == 'sleep':
-            sleep_logs = [log for log in logs if log['log_type'] == 'sleep']
-            total_mins = 0
-
-            for log in sleep_logs:
-                try:
-                    start = datetime.strptime(log['log_data']['sleepStart'], "%H:%M")
-                    end = datetime.strptime(log['log_data']['sleepEnd'], "%H:%M")
-
-                    if end < start:
-                        # sleep across midnight, add 1 day to end
-                        end += timedelta(days=1)
-
-                    total_mins += (end - start).total_seconds() / 60
-
-                except (KeyError, ValueError):
-                    pass
-            summary = {"totalmins": total_mins}
+            summary = {"totalmins": daily["sleep_minutes"]}
         elif reminder['reminder_type'] == 'outside':
-            outside_logs = [log for log in logs if log['log_type'] == 'outside']
-            total_mins = 0
-            for log in outside_logs:
-                try:
-                    total_mins += int(log['log_data'].get('outsideDuration', 0))  # Assuming timeSpent is in minutes
-                except (KeyError, ValueError):
-                    pass
-            summary = {"totalmins": total_mins}
-            
+            summary = {"totalmins": daily["outside_minutes"]}
         elif reminder['reminder_type'] == 'diaper':
-            diaper_logs = [log for log in logs if log['log_type'] == 'diaper']
-            solid = sum(1 for log in diaper_logs if log['log_data'].get('diaperSolid', False))
-            wet = sum(1 for log in diaper_logs if not log['log_data'].get('diaperSolid', True))
-            summary = {"solid": solid, "wet": wet}
-            
+            summary = {"solid": daily["diaper_solid_count"], "wet": daily["diaper_wet_count"]}
         elif reminder['reminder_type'] == 'feeding':
-            feed_logs = [log for log in logs if log['log_type'] == 'feeding']
-            total_ml = sum(int(log['log_data'].get('feedAmount', 0)) for log in feed_logs)
-            summary = {"totalamountInML": total_ml}
+            summary = {"totalamountInML": daily["feed_ml"]}
     
         return json.dumps(summary, default=str)
     except Exception as e:
@@ -324,25 +495,28 @@ def calculate_daily_summary(reminder, baby_id):
 async def get_reminders(
     baby_id: str, 
     upcoming: Optional[bool] = False, 
-    user_id: str = Depends(get_current_user)
+    user_id: str = Depends(get_current_user),
+    db: AsyncSupabaseService = Depends(get_async_supabase)
 ):
     """Fetch reminders with daily summary statistics"""
-    await _verify_baby_ownership(baby_id, user_id)
+    await _verify_baby_ownership(baby_id, user_id, db)
     try:
-        query = supabase.table("reminders").select("*").eq("baby_id", baby_id).eq("is_completed", False)
+        query = db.table("reminders").select("*").eq("baby_id", baby_id).eq("is_completed", False)
         
         if upcoming:
             query = query.gt("reminder_time", datetime.now().isoformat())
             
-        result = query.order("reminder_time").execute()
+        result = await query.order("reminder_time").execute()
         reminders = result.data
         reminders = get_latest_reminders(reminders)  # Get the latest reminders for each type
         reminders.sort(key=lambda x: x['reminder_time'])  # Sort by reminder_time
         reminders.append({'id': 'dummy', 'baby_id': baby_id, 'reminder_type': 'outside', 'reminder_time': '2025-04-25T03:47:30.785+00:00', 'is_completed': False, 'notes': 'Based on last diaper at 01:47', 'created_at': '2025-04-25T01:47:39.547943+00:00'})
         # Add daily summary statistics
         
+        # One rollup read for all reminder days (cached per baby/day until a new log arrives)
+        rollup_days = await get_rollup_days(db, baby_id, [r['reminder_time'] for r in reminders])
         for reminder in reminders:
-            reminder['daily_summary'] = calculate_daily_summary(reminder, baby_id)
+            reminder['daily_summary'] = calculate_daily_summary(reminder, rollup_days[log_day(reminder['reminder_time'])])
 
         return reminders
     except Exception as e:
@@ -371,25 +545,25 @@ def get_latest_reminders(reminders: List[Dict]) -> List[Dict]:
 
 # --- Health Prediction Endpoints ---
 @app.post("/health_predictions", status_code=status.HTTP_201_CREATED)
-async def create_prediction(prediction: HealthPredictionCreate, user_id: str = Depends(get_current_user)):
+async def create_prediction(prediction: HealthPredictionCreate, user_id: str = Depends(get_current_user), db: AsyncSupabaseService = Depends(get_async_supabase)):
     try:
         data = prediction.dict()
         data.update({"user_id": user_id, "predicted_on": datetime.now()})
-        result = supabase.table("health_predictions").insert(data).execute()
+        result = await db.table("health_predictions").insert(data).execute()
         return result.data[0]
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/reminders/complete_by_log")
-async def complete_reminder_by_log(reminderbylog:CompleteReminderByLog, user_id: str = Depends(get_current_user)):
+async def complete_reminder_by_log(reminderbylog:CompleteReminderByLog, user_id: str = Depends(get_current_user), db: AsyncSupabaseService = Depends(get_async_supabase)):
     """Completes a reminder based on the baby_id and log_type."""
-    await _verify_baby_ownership(reminderbylog.baby_id, user_id)
+    await _verify_baby_ownership(reminderbylog.baby_id, user_id, db)
     try:
         # Map log_type to reminder_type
         reminder_type = reminderbylog.log_type
 
         # Find the first uncompleted reminder of the given type for the baby
-        reminder_data = supabase.table("reminders").select("id").eq("baby_id", reminderbylog.baby_id).eq("reminder_type", reminder_type).eq("is_completed", False).limit(1).execute()
+        reminder_data = await db.table("reminders").select("id").eq("baby_id", reminderbylog.baby_id).eq("reminder_type", reminder_type).eq("is_completed", False).limit(1).execute()
 
         if not reminder_data.data:
             return {"message": "No matching uncompleted reminder found."}
@@ -397,7 +571,7 @@ async def complete_reminder_by_log(reminderbylog:CompleteReminderByLog, user_id:
         reminder_id = reminder_data.data[0]["id"]
 
         # Mark the reminder as completed
-        result = supabase.table("reminders").update({"is_completed": True}).eq("id", reminder_id).execute()
+        result = await db.table("reminders").update({"is_completed": True}).eq("id", reminder_id).execute()
 
         # generate reminders for the baby
         await generate_reminders_for_baby(reminderbylog.baby_id)
@@ -421,6 +595,27 @@ async def health_check():
         "version": "0.1.0"
     }
 
+def require_metrics_token(request: Request):
+    """Scrapers must send METRICS_TOKEN; without one configured the endpoint does not exist."""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    token = request.headers.get("X-Metrics-Token")
+    authorization = request.headers.get("Authorization", "")
+    if token is None and authorization.lower().startswith("bearer "):
+        token = authorization[7:].strip()
+    if not token or not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+async def metrics_snapshot():
+    """Process-local counters and timings (reminder runs, etc.). Requires METRICS_TOKEN."""
+    metrics.set_gauge("ownership_cache.entries", len(ownership_cache))
+    return metrics.snapshot()
+
 # --- Background Task Function ---
 async def generate_reminders_for_baby(baby_id: str):
     """
@@ -429,42 +624,35 @@ async def generate_reminders_for_baby(baby_id: str):
     Args:
         baby_id: ID of the baby to generate reminders for
     """
+    print(f"Processing reminders for baby: {baby_id}")
+    return await reminder_runner.generate_for_baby(baby_id, datetime.now(timezone.utc))
+
+async def run_reminder_engine_tick():
+    """
+    Scheduled task that writes the reminders queued by new logs once they are due.
+    """
     try:
-        print(f"Processing reminders for baby: {baby_id}")
-        result = agent.generate_reminders_from_baby_logs(baby_id, datetime.now(timezone.utc))
-        return result
+        created = await reminder_engine.run_tick(reminder_runner.executor)
+        if created:
+            print(f"Reminder engine created reminders for {len(created)} babies.")
     except Exception as e:
-        print(f"Error processing reminders for baby {baby_id}: {e}")
-        return None
+        print(f"Error running reminder engine tick: {e}")
 
 async def run_reminder_generation_for_all_babies():
     """
-    Scheduled task to run reminder generation for all active baby profiles.
+    Scheduled task to run reminder generation for this replica's shard of baby profiles.
     """
     print(f"--- Running scheduled reminder generation at {datetime.now(timezone.utc)} ---")
     try:
-        # Fetch all unique baby IDs (consider filtering for active babies if applicable)
-        result = supabase.table("baby_profiles").select("id").execute()
-        if not result.data:
-            print("No baby profiles found to process.")
-            return
-
-        all_baby_ids = [baby['id'] for baby in result.data]
-        print(f"Found {len(all_baby_ids)} babies to process.")
-
-        processed_count = 0
-        error_count = 0
-        for baby_id in all_baby_ids:
-            result = await generate_reminders_for_baby(baby_id)
-            if result is not None:
-                processed_count += 1
-            else:
-                error_count += 1
-
-        print(f"--- Scheduled reminder generation complete. Processed: {processed_count}, Errors: {error_count} ---")
-
+        summary = await reminder_runner.run()
+        print(
+            f"--- Scheduled reminder generation ({summary['mode']}) complete. Processed: {summary['processed']}, "
+            f"Errors: {summary['errors']}, Elapsed: {summary['elapsed_s']}s, "
+            f"Throughput: {summary['throughput_per_s']}/s, p50: {summary['latency_ms_p50']}ms, "
+            f"p95: {summary['latency_ms_p95']}ms ---"
+        )
     except Exception as e:
-        print(f"Error fetching baby IDs for scheduled task: {e}")
+        print(f"Error running scheduled reminder generation: {e}")
 
 
 # --- Agent backend ---
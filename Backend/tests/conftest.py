@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 让测试可以像 main.py 一样直接 import utils / core / agents
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,55 @@
+import pytest
+
+from core.baby_rollup import aggregate_logs, log_contribution
+
+
+def test_sleep_crossing_midnight():
+    delta = log_contribution("sleep", {"sleepStart": "23:30", "sleepEnd": "01:15"})
+    assert delta == {"log_count": 1, "sleep_minutes": 105}
+
+
+def test_sleep_same_day_and_legacy_duration():
+    assert log_contribution("sleep", {"sleepStart": "13:00", "sleepEnd": "14:30"})["sleep_minutes"] == 90
+    assert log_contribution("sleep", {"duration": 1800})["sleep_minutes"] == 30
+
+
+@pytest.mark.parametrize("log_data", [
+    {"sleepStart": "late", "sleepEnd": "01:15"},
+    {"sleepStart": "23", "sleepEnd": "01:15"},
+    {"sleepStart": 2330, "sleepEnd": "01:15"},
+])
+def test_malformed_sleep_times_fall_back_to_duration(log_data):
+    assert log_contribution("sleep", dict(log_data, duration=600))["sleep_minutes"] == 10
+    assert log_contribution("sleep", log_data)["sleep_minutes"] == 0
+
+
+@pytest.mark.parametrize("log_data, solid, wet", [
+    ({"diaperSolid": True}, 1, 0),
+    ({"diaperSolid": False}, 0, 1),
+    ({}, 0, 0),
+    ({"diaperSolid": None}, 0, 0),
+    ({"diaperSolid": "true"}, 0, 0),
+])
+def test_diaper_flags(log_data, solid, wet):
+    delta = log_contribution("diaper", log_data)
+    assert delta["diaper_count"] == 1
+    assert delta.get("diaper_solid_count", 0) == solid
+    assert delta.get("diaper_wet_count", 0) == wet
+
+
+def test_feeding_and_missing_log_data():
+    assert log_contribution("feeding", {"feedAmount": "120"}) == {"log_count": 1, "feed_ml": 120, "feed_count": 1}
+    assert log_contribution("feeding", None) == {"log_count": 1, "feed_ml": 0, "feed_count": 1}
+    assert log_contribution("cry", {"cryDuration": 5}) == {"log_count": 1, "cry_minutes": 5}
+
+
+def test_aggregate_logs_groups_by_utc_day():
+    rows = [
+        {"baby_id": "b", "log_type": "diaper", "log_data": {"diaperSolid": False}, "logged_at": "2026-01-01T23:30:00-02:00"},
+        {"baby_id": "b", "log_type": "diaper", "log_data": {"diaperSolid": True}, "logged_at": "2026-01-02T08:00:00Z"},
+        {"baby_id": "b", "log_type": "diaper", "log_data": {}, "logged_at": None},
+    ]
+    totals = aggregate_logs(rows)
+    assert list(totals) == [("b", "2026-01-02")]
+    day = totals[("b", "2026-01-02")]
+    assert (day["diaper_count"], day["diaper_solid_count"], day["diaper_wet_count"], day["log_count"]) == (2, 1, 1, 2)
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from utils.gpt_parse import JsonFieldStream
+
+
+def stream(chunks):
+    parser = JsonFieldStream()
+    pieces = [parser.feed(chunk) for chunk in chunks]
+    return parser, pieces
+
+
+def split_every(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("message", [
+    "line one\nline two\t\"quoted\" back\\slash /",
+    "宝宝今天睡得很好 😀 继续加油",
+    "emoji pair 👶🍼 and bmp é",
+])
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 13])
+def test_split_escapes_decode_like_json(message, size):
+    text = json.dumps({"message": message, "mood": "ok"})  # ensure_ascii：非 ASCII 字符和 emoji 都会变成 \\uXXXX（代理对）
+    parser, pieces = stream(split_every(text, size))
+    assert parser.done
+    assert "".join(pieces) == message
+    assert parser.result() == {"message": message, "mood": "ok"}
+
+
+def test_unicode_escape_split_across_chunks():
+    parser, pieces = stream(['{"message": "a\\u00', 'e9b"}'])
+    assert pieces == ["a", "éb"]
+
+
+def test_surrogate_pair_waits_for_low_half():
+    parser, pieces = stream(['{"message": "x\\ud83d', '\\ude00', 'y"}'])
+    assert pieces == ["x", "😀", "y"]
+    assert parser.value.encode("utf-8") == "x😀y".encode("utf-8")
+
+
+def test_lone_surrogate_is_replaced():
+    parser, pieces = stream(['{"message": "a\\ud83d b', '"}'])
+    assert parser.value == "a� b"
+    parser.value.encode("utf-8")
+
+
+def test_invalid_escape_does_not_stall_stream():
+    chunks = ['{"message": "a\\x b', ' c d e f g h i j k l m n o p', ' tail"}']
+    parser, pieces = stream(chunks)
+    assert pieces[0] == "a\\x b"
+    assert pieces[1] == " c d e f g h i j k l m n o p"
+    assert parser.done
+    assert parser.value == "a\\x b c d e f g h i j k l m n o p tail"
+    assert parser.result() == {"message": parser.value}
+
+
+def test_invalid_unicode_escape_is_kept_literally():
+    parser, pieces = stream(['{"message": "\\uzz12 ok"}'])
+    assert parser.value == "\\uzz12 ok"
+
+
+def test_trailing_backslash_waits_for_next_chunk():
+    parser, pieces = stream(['{"message": "a\\', 'nb"}'])
+    assert pieces == ["a", "\nb"]
@@ -0,0 +1,127 @@
+import re
+
+import pytest
+
+from core.supabase import _QuerySpec, decode_cursor, encode_cursor
+
+
+def spec(*orders, key="id", limit=None):
+    query = _QuerySpec(lambda: None, "baby_logs", ("id", "logged_at"), key=key)
+    for column, desc in orders:
+        query = query.order(column, desc=desc)
+    return query.limit(limit) if limit else query
+
+
+def split_top_level(text):
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, char in enumerate(text):
+        if char == '"' and text[i - 1] != "\\":
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def matches(condition, row):
+    """Evaluates the PostgREST logic filter produced by _keyset_filter against a row."""
+    if condition.startswith("and("):
+        return all(matches(part, row) for part in split_top_level(condition[4:-1]))
+    column, op, value = re.fullmatch(r'(\w+)\.(eq|gt|lt)\."(.*)"', condition).groups()
+    value = value.replace('\\"', '"').replace("\\\\", "\\")
+    return {"eq": row[column] == value, "gt": row[column] > value, "lt": row[column] < value}[op]
+
+
+def test_order_keys_append_unique_key_in_last_direction():
+    assert spec(("logged_at", True))._order_keys() == [("logged_at", True), ("id", True)]
+    assert spec(("logged_at", True), ("log_type", False))._order_keys() == \
+        [("logged_at", True), ("log_type", False), ("id", False)]
+    assert spec(("id", False), ("logged_at", True))._order_keys() == [("id", False), ("logged_at", True)]
+    assert spec(("logged_at", True), key=None)._order_keys() == [("logged_at", True)]
+    assert spec()._order_keys() == [("id", False)]
+
+
+def test_keyset_filter_mixed_directions():
+    query = spec(("logged_at", True), ("log_type", False)).after(
+        {"logged_at": "2026-01-01T10:00:00", "log_type": "sleep", "id": "b"})
+    assert query._keyset_filter() == (
+        'logged_at.lt."2026-01-01T10:00:00",'
+        'and(logged_at.eq."2026-01-01T10:00:00",log_type.gt."sleep"),'
+        'and(logged_at.eq."2026-01-01T10:00:00",log_type.eq."sleep",id.gt."b")'
+    )
+
+
+def test_keyset_filter_quotes_values():
+    query = spec(("logged_at", False)).after({"logged_at": 'a,b"c)', "id": "x"})
+    assert query._keyset_filter().startswith('logged_at.gt."a,b\\"c)",')
+
+
+@pytest.mark.parametrize("orders", [
+    [("logged_at", True)],
+    [("logged_at", False)],
+    [("logged_at", True), ("log_type", False)],
+    [("log_type", False), ("logged_at", True)],
+])
+def test_pages_never_skip_or_repeat_rows_on_ties(orders):
+    # Many rows share the first ordering key, so pages break inside a tie
+    rows = [
+        {"id": f"{i:02d}", "logged_at": f"2026-01-01T0{i % 3}:00:00", "log_type": "sleep" if i % 2 else "feed"}
+        for i in range(17)
+    ]
+    query = spec(*orders, limit=4)
+    keys = query._order_keys()
+
+    def sort_key(row):
+        return [tuple(-ord(c) for c in row[column]) if desc else row[column] for column, desc in keys]
+
+    expected = sorted(rows, key=sort_key)
+    seen, cursor = [], None
+    for _ in range(len(rows)):  # a cursor that does not advance must fail, not loop forever
+        page_query = query.after(cursor) if cursor else query
+        candidates = [row for row in expected if not cursor or matches_any(page_query._keyset_filter(), row)]
+        page = candidates[:4]
+        seen.extend(page)
+        cursor = page_query.next_cursor(page)
+        if cursor is None:
+            break
+        cursor = decode_cursor(encode_cursor(cursor), [column for column, _ in keys])
+    else:
+        pytest.fail("paging did not terminate")
+    assert seen == expected
+
+
+def matches_any(filter_text, row):
+    return any(matches(part, row) for part in split_top_level(filter_text))
+
+
+def test_next_cursor_only_for_full_pages():
+    query = spec(("logged_at", True), limit=2)
+    rows = [{"id": "a", "logged_at": "t2"}, {"id": "b", "logged_at": "t1"}]
+    assert query.next_cursor(rows) == {"logged_at": "t1", "id": "b"}
+    assert query.next_cursor(rows[:1]) is None
+    assert spec(("logged_at", True)).next_cursor(rows) is None
+
+
+def test_cursor_round_trip():
+    cursor = {"logged_at": "2026-01-01T10:00:00+00:00", "id": "3f1c"}
+    token = encode_cursor(cursor)
+    assert "=" not in token and "/" not in token and "+" not in token
+    assert decode_cursor(token, ["logged_at", "id"]) == cursor
+    assert encode_cursor(None) is None
+
+
+@pytest.mark.parametrize("token", [
+    "not base64 !!",
+    encode_cursor({"logged_at": "x"}),                          # missing key
+    encode_cursor({"logged_at": "x", "id": "1", "extra": 2}),  # foreign cursor
+    encode_cursor({"logged_at": "x", "id": "1"})[:-3],          # truncated
+    "WzEsMl0",                                                  # a JSON list, not an object
+])
+def test_tampered_cursor_is_rejected(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token, ["logged_at", "id"])
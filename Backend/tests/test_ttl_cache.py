@@ -0,0 +1,37 @@
+from core.ttl_cache import TTLCache
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("core.ttl_cache.time.monotonic", lambda: now[0])
+    cache = TTLCache(ttl=10, max_entries=10)
+    cache.set("a", 1)
+    cache.set("b", False, ttl=1)
+    assert cache.get("a") == 1
+    assert cache.get("b") is False
+    now[0] += 5
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    now[0] += 10
+    assert cache.get("a", "missing") == "missing"
+    assert len(cache) == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = TTLCache(ttl=None, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_pop_and_pop_where():
+    cache = TTLCache(ttl=60, max_entries=10)
+    for key in [("u1", "b1"), ("u1", "b2"), ("u2", "b1")]:
+        cache.set(key, True)
+    assert cache.pop(("u2", "b1")) is True
+    assert cache.pop(("u2", "b1"), "gone") == "gone"
+    assert cache.pop_where(lambda key: key[0] == "u1") == 2
+    assert len(cache) == 0
@@ -1,25 +1,23 @@
-from openai import OpenAI
-import os
+from core.llm_gateway import get_llm
 import json
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from dotenv import load_dotenv
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-def gpt_call(prompt: str, system_prompt: str = "You are a helpful AI assistant.") -> str:
-    response = client.chat.completions.create(
+async def gpt_call(prompt: str, system_prompt: str = "You are a helpful AI assistant.", endpoint: Optional[str] = None) -> str:
+    response = await get_llm().chat(
         model="gpt-4",
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": prompt}
         ],
         temperature=0.7,
+        endpoint=endpoint,
     )
     return response.choices[0].message.content
 
-def gpt_vision_call(prompt: str, image_base64: str) -> str:
-    response = client.chat.completions.create(
+async def gpt_vision_call(prompt: str, image_base64: str) -> str:
+    response = await get_llm().chat(
         model="gpt-4-vision-preview",
         messages=[
             {"role": "system", "content": "You are a baby image analysis assistant."},
@@ -36,8 +34,8 @@ def gpt_vision_call(prompt: str, image_base64: str) -> str:
     )
     return response.choices[0].message.content
 
-def call_gpt_json(prompt: str) -> Dict[str, Any]:
-    response = client.chat.completions.create(
+async def call_gpt_json(prompt: str) -> Dict[str, Any]:
+    response = await get_llm().chat(
         model="gpt-4",
         messages=[
             {"role": "system", "content": "你是一个结构化输出助手，只返回 JSON。" },
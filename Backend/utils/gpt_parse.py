@@ -18,3 +18,122 @@ def parse_gpt_response(response_text: str) -> Union[dict, None]:
         print(f"[parse_gpt_response] 解析失败: {e}")
     
     return None
+
+
+_SIMPLE_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_INCOMPLETE = object()
+_HEX_DIGITS = set("0123456789abcdefABCDEF")
+
+
+def _hex_unit(raw: str, i: int):
+    """raw[i] 开始的 \\uXXXX 的值；还没收全时返回 _INCOMPLETE，不是合法十六进制时返回 None"""
+    digits = raw[i + 2:i + 6]
+    if not all(c in _HEX_DIGITS for c in digits):
+        return None
+    return int(digits, 16) if len(digits) == 4 else _INCOMPLETE
+
+
+class JsonFieldStream:
+    """
+    流式解析 GPT 输出的 JSON：一边接收 token，一边取出某个字符串字段（默认 "message"）的内容。
+
+    `feed(chunk)` 返回这次新解码出的字段文本；字段的结束引号出现后 `done` 为 True。
+    转义序列（包括跨 chunk 的 `\\uXXXX` 和代理对）只在完整后才输出；
+    非法转义按原文输出，不会卡住后面的内容。
+    """
+
+    def __init__(self, field: str = "message"):
+        self._field_start = re.compile(rf'"{re.escape(field)}"\s*:\s*"')
+        self.text = ""          # 到目前为止完整的原始输出
+        self.value = ""         # 到目前为止解码出的字段内容
+        self._start = None      # 字段字符串内容在 text 中的起点
+        self._end = None        # 结束引号的位置
+        self._scanned = 0
+        self._escaped = False
+        self._decoded_upto = 0
+
+    @property
+    def found(self) -> bool:
+        return self._start is not None
+
+    @property
+    def done(self) -> bool:
+        return self._end is not None
+
+    def feed(self, chunk: str) -> str:
+        self.text += chunk
+        if self._start is None:
+            match = self._field_start.search(self.text)
+            if not match:
+                return ""
+            self._start = self._scanned = self._decoded_upto = match.end()
+        if self._end is None:
+            for i in range(self._scanned, len(self.text)):
+                char = self.text[i]
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._end = i
+                    break
+            self._scanned = len(self.text) if self._end is None else self._end
+        return self._decode(self._end if self._end is not None else len(self.text))
+
+    def _decode(self, limit: int) -> str:
+        raw = self.text[self._decoded_upto:limit]
+        out = []
+        i = 0
+        while i < len(raw):
+            char = raw[i]
+            if char != "\\":
+                out.append(char)
+                i += 1
+                continue
+            if i + 1 >= len(raw):
+                break  # 转义被 chunk 切开了，等下一段
+            code = raw[i + 1]
+            if code in _SIMPLE_ESCAPES:
+                out.append(_SIMPLE_ESCAPES[code])
+                i += 2
+                continue
+            if code != "u":
+                # 非法转义（例如 \x）：按原文输出，不影响后面的内容
+                out.append(raw[i:i + 2])
+                i += 2
+                continue
+            unit = _hex_unit(raw, i)
+            if unit is _INCOMPLETE:
+                break
+            if unit is None:
+                out.append(raw[i:i + 2])  # \u 后面不是 4 位十六进制：按原文输出
+                i += 2
+                continue
+            if 0xD800 <= unit <= 0xDBFF:
+                # 代理对的前半个，等后半个到了再一起输出
+                low = _hex_unit(raw, i + 6) if raw[i + 6:i + 8] == "\\u" else None
+                if low is _INCOMPLETE or (low is None and len(raw) < i + 8 and not self.done):
+                    break
+                if low is not None and 0xDC00 <= low <= 0xDFFF:
+                    out.append(chr(0x10000 + ((unit - 0xD800) << 10) + (low - 0xDC00)))
+                    i += 12
+                    continue
+                out.append("\ufffd")  # 落单的代理项无法编码成 UTF-8
+                i += 6
+                continue
+            out.append("\ufffd" if 0xDC00 <= unit <= 0xDFFF else chr(unit))
+            i += 6
+        self._decoded_upto += i
+        piece = "".join(out)
+        self.value += piece
+        return piece
+
+    def result(self) -> dict:
+        """流结束后的完整结果：和 call_gpt_json_newversion 一样，解析不了时整段文本当作 message"""
+        if self.done:
+            parsed = parse_gpt_response(self.text)
+            return parsed if isinstance(parsed, dict) else {"message": self.value}
+        if self.found:
+            return {"message": self.value}
+        parsed = parse_gpt_response(self.text)
+        return parsed if isinstance(parsed, dict) else {"message": self.text.strip()}
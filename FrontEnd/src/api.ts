@@ -212,8 +212,16 @@ export const api = {
       if (options?.startDate) params.append('start_date', options.startDate);
       if (options?.endDate) params.append('end_date', options.endDate);
 
-      const response = await axiosInstance.get<BabyLog[]>('/baby_logs', { params });
-      return response.data;
+      // The backend pages results; follow X-Next-Cursor until the last page
+      const logs: BabyLog[] = [];
+      let cursor: string | undefined;
+      do {
+        if (cursor) params.set('cursor', cursor);
+        const response = await axiosInstance.get<BabyLog[]>('/baby_logs', { params });
+        logs.push(...response.data);
+        cursor = response.headers['x-next-cursor'];
+      } while (cursor);
+      return logs;
     } catch (error) {
       handleApiError(error);
     }
@@ -1,11 +1,13 @@
 import json
+import hashlib
 from datetime import datetime
 from dotenv import load_dotenv
 import os
 import argparse
+import httpx
 from supabase import create_client
 from pydantic import BaseModel
-from typing import Literal
+from typing import Literal, Optional
 from dateutil.parser import parse  # Handles various datetime formats
 
 # Load environment variables
@@ -17,22 +19,64 @@ class BabyLogCreate(BaseModel):
     log_type: Literal["feeding", "diaper", "sleep", "cry", "bowel", "outside"]
     log_data: dict
     logged_at: datetime
+    idempotency_key: Optional[str] = None
 
-def load_logs(baby_id: str, json_path: str):
-    # Initialize Supabase client
+def idempotency_key(log: dict) -> str:
+    """Same log -> same key, so loading a file twice does not duplicate its logs."""
+    payload = json.dumps([log['baby_id'], log['log_type'], log['logged_at'], log['log_data']], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def insert_direct(valid_logs: list, chunk_size: int) -> list:
+    """Upserts straight into Supabase, chunk_size rows per statement (skips the rollup and reminders)."""
     supabase = create_client(
         os.getenv("SUPABASE_URL"),
         os.getenv("SUPABASE_KEY")
     )
-    
+    errors = []
+    inserted = 0
+    for start in range(0, len(valid_logs), chunk_size):
+        chunk = valid_logs[start:start + chunk_size]
+        try:
+            result = supabase.table('baby_logs').upsert(
+                chunk, on_conflict='baby_id,idempotency_key', ignore_duplicates=True
+            ).execute()
+            inserted += len(result.data)
+        except Exception as e:
+            errors.extend({'log': log, 'error': str(e)} for log in chunk)
+    print(f"Successfully inserted {inserted} records ({len(valid_logs) - inserted - len(errors)} already loaded)")
+    print("Run `python -m core.baby_rollup backfill` in Backend/ to update the daily rollup "
+          "(add --include-today if the sample data has logs for today and nothing else is writing)")
+    return errors
+
+def insert_via_api(valid_logs: list, chunk_size: int, api_url: str, token: str) -> list:
+    """Posts to POST /baby_logs/bulk, which also updates the rollup and reminders."""
+    errors = []
+    counts = {'inserted': 0, 'duplicate': 0}
+    with httpx.Client(base_url=api_url, headers={'Authorization': f'Bearer {token}'}, timeout=120) as client:
+        for start in range(0, len(valid_logs), chunk_size):
+            chunk = valid_logs[start:start + chunk_size]
+            response = client.post('/baby_logs/bulk', json={'logs': chunk})
+            if response.status_code != 200:
+                errors.extend({'log': log, 'error': response.text} for log in chunk)
+                continue
+            for item in response.json()['results']:
+                if item['status'] in counts:
+                    counts[item['status']] += 1
+                else:
+                    errors.append({'log': chunk[item['index']], 'error': f"{item['status']}: {item.get('error')}"})
+    print(f"Successfully inserted {counts['inserted']} records ({counts['duplicate']} already loaded)")
+    return errors
+
+def load_logs(baby_id: str, json_path: str, mode: str = 'direct', chunk_size: int = 500,
+              api_url: Optional[str] = None, token: Optional[str] = None):
     # Load and parse JSON data
     with open(json_path, 'r', encoding='utf-8') as f:
         logs = json.load(f)
-    
+
     # Transform data and validate with Pydantic
     valid_logs = []
     errors = []
-    
+
     for log in logs:
         try:
             # Add baby_id and parse datetime
@@ -43,7 +87,8 @@ def load_logs(baby_id: str, json_path: str):
                 'log_data': log_data,
                 'logged_at': parse(log['logged_at']).isoformat()  # Convert to ISO string
             }
-            
+            transformed['idempotency_key'] = idempotency_key(transformed)
+
             # Validate with Pydantic model
             BabyLogCreate(**transformed)
             valid_logs.append(transformed)
@@ -52,20 +97,21 @@ def load_logs(baby_id: str, json_path: str):
                 'log': log,
                 'error': str(e)
             })
-    
-    # Insert valid records in batches
+
+    # Insert valid records in chunks
     if valid_logs:
-        # Supabase can handle 1000s of records per insert
-        result = supabase.table('baby_logs').insert(valid_logs).execute()
-        print(f"Successfully inserted {len(result.data)} records")
-    
+        if mode == 'api':
+            errors.extend(insert_via_api(valid_logs, chunk_size, api_url, token))
+        else:
+            errors.extend(insert_direct(valid_logs, chunk_size))
+
     # Report errors
     if errors:
         print(f"\nEncountered {len(errors)} errors:")
         for error in errors[-5:]:  # Show last 5 errors to avoid flooding console
             print(f"Error: {error['error']}")
             print(f"Invalid log: {json.dumps(error['log'], indent=2)}")
-            
+
     # Save full error log
     if errors:
         with open('load_errors.json', 'w') as f:
@@ -76,7 +122,18 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Load baby logs into Supabase')
     parser.add_argument('--json', type=str, default='baby_logs_4_month_last_7_days.json',
                        help='Path to JSON file (default: baby_logs_4_month_last_7_days.json)')
-    
+    parser.add_argument('--baby-id', type=str, default="3296e4f0-d710-44e4-80bf-570493a64d27",
+                       help='Baby profile the logs belong to')
+    parser.add_argument('--mode', choices=['direct', 'api'], default='direct',
+                       help='direct: upsert into Supabase; api: POST /baby_logs/bulk (default: direct)')
+    parser.add_argument('--chunk-size', type=int, default=500,
+                       help='Logs per insert / request (default: 500)')
+    parser.add_argument('--api-url', type=str, default=os.getenv("API_URL", "http://localhost:8000"),
+                       help='Backend URL for --mode api (default: $API_URL or http://localhost:8000)')
+    parser.add_argument('--token', type=str, default=os.getenv("API_TOKEN"),
+                       help='Bearer token for --mode api (default: $API_TOKEN)')
+
     args = parser.parse_args()
-    baby_id = "3296e4f0-d710-44e4-80bf-570493a64d27"
-    load_logs(baby_id, args.json)
+    if args.mode == 'api' and not args.token:
+        parser.error('--mode api needs --token or API_TOKEN')
+    load_logs(args.baby_id, args.json, args.mode, args.chunk_size, args.api_url, args.token)
@@ -0,0 +1,54 @@
+-- Per-baby, per-day rollup of baby_logs (days are UTC dates of logged_at).
+-- Maintained by the backend on every log insert (increment_baby_log_daily) and
+-- rebuilt from history with `python -m core.baby_rollup backfill`.
+CREATE TABLE IF NOT EXISTS baby_log_daily (
+    baby_id UUID REFERENCES baby_profiles(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    feed_ml NUMERIC NOT NULL DEFAULT 0,
+    feed_count INTEGER NOT NULL DEFAULT 0,
+    sleep_minutes NUMERIC NOT NULL DEFAULT 0,
+    diaper_count INTEGER NOT NULL DEFAULT 0,
+    diaper_solid_count INTEGER NOT NULL DEFAULT 0,
+    bowel_count INTEGER NOT NULL DEFAULT 0,
+    cry_minutes NUMERIC NOT NULL DEFAULT 0,
+    outside_minutes NUMERIC NOT NULL DEFAULT 0,
+    log_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (baby_id, day)
+);
+
+-- Adds one log's contribution (computed by core/baby_rollup.py) to its day row.
+-- A single upsert, so concurrent inserts for the same day never lose updates.
+CREATE OR REPLACE FUNCTION increment_baby_log_daily(p_baby_id UUID, p_day DATE, p_delta JSONB)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO baby_log_daily AS d (
+        baby_id, day, feed_ml, feed_count, sleep_minutes, diaper_count,
+        diaper_solid_count, bowel_count, cry_minutes, outside_minutes, log_count
+    )
+    VALUES (
+        p_baby_id,
+        p_day,
+        COALESCE((p_delta->>'feed_ml')::NUMERIC, 0),
+        COALESCE((p_delta->>'feed_count')::INTEGER, 0),
+        COALESCE((p_delta->>'sleep_minutes')::NUMERIC, 0),
+        COALESCE((p_delta->>'diaper_count')::INTEGER, 0),
+        COALESCE((p_delta->>'diaper_solid_count')::INTEGER, 0),
+        COALESCE((p_delta->>'bowel_count')::INTEGER, 0),
+        COALESCE((p_delta->>'cry_minutes')::NUMERIC, 0),
+        COALESCE((p_delta->>'outside_minutes')::NUMERIC, 0),
+        COALESCE((p_delta->>'log_count')::INTEGER, 0)
+    )
+    ON CONFLICT (baby_id, day) DO UPDATE SET
+        feed_ml = d.feed_ml + EXCLUDED.feed_ml,
+        feed_count = d.feed_count + EXCLUDED.feed_count,
+        sleep_minutes = d.sleep_minutes + EXCLUDED.sleep_minutes,
+        diaper_count = d.diaper_count + EXCLUDED.diaper_count,
+        diaper_solid_count = d.diaper_solid_count + EXCLUDED.diaper_solid_count,
+        bowel_count = d.bowel_count + EXCLUDED.bowel_count,
+        cry_minutes = d.cry_minutes + EXCLUDED.cry_minutes,
+        outside_minutes = d.outside_minutes + EXCLUDED.outside_minutes,
+        log_count = d.log_count + EXCLUDED.log_count,
+        updated_at = NOW();
+$$;
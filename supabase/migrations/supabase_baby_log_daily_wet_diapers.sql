@@ -0,0 +1,40 @@
+-- Wet diapers are counted explicitly (diaperSolid = false), so diaper logs without
+-- the flag are neither solid nor wet. Existing day rows start at 0: run
+-- `python -m core.baby_rollup backfill` once after applying this migration.
+ALTER TABLE baby_log_daily ADD COLUMN IF NOT EXISTS diaper_wet_count INTEGER NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION increment_baby_log_daily(p_baby_id UUID, p_day DATE, p_delta JSONB)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO baby_log_daily AS d (
+        baby_id, day, feed_ml, feed_count, sleep_minutes, diaper_count,
+        diaper_solid_count, diaper_wet_count, bowel_count, cry_minutes, outside_minutes, log_count
+    )
+    VALUES (
+        p_baby_id,
+        p_day,
+        COALESCE((p_delta->>'feed_ml')::NUMERIC, 0),
+        COALESCE((p_delta->>'feed_count')::INTEGER, 0),
+        COALESCE((p_delta->>'sleep_minutes')::NUMERIC, 0),
+        COALESCE((p_delta->>'diaper_count')::INTEGER, 0),
+        COALESCE((p_delta->>'diaper_solid_count')::INTEGER, 0),
+        COALESCE((p_delta->>'diaper_wet_count')::INTEGER, 0),
+        COALESCE((p_delta->>'bowel_count')::INTEGER, 0),
+        COALESCE((p_delta->>'cry_minutes')::NUMERIC, 0),
+        COALESCE((p_delta->>'outside_minutes')::NUMERIC, 0),
+        COALESCE((p_delta->>'log_count')::INTEGER, 0)
+    )
+    ON CONFLICT (baby_id, day) DO UPDATE SET
+        feed_ml = d.feed_ml + EXCLUDED.feed_ml,
+        feed_count = d.feed_count + EXCLUDED.feed_count,
+        sleep_minutes = d.sleep_minutes + EXCLUDED.sleep_minutes,
+        diaper_count = d.diaper_count + EXCLUDED.diaper_count,
+        diaper_solid_count = d.diaper_solid_count + EXCLUDED.diaper_solid_count,
+        diaper_wet_count = d.diaper_wet_count + EXCLUDED.diaper_wet_count,
+        bowel_count = d.bowel_count + EXCLUDED.bowel_count,
+        cry_minutes = d.cry_minutes + EXCLUDED.cry_minutes,
+        outside_minutes = d.outside_minutes + EXCLUDED.outside_minutes,
+        log_count = d.log_count + EXCLUDED.log_count,
+        updated_at = NOW();
+$$;
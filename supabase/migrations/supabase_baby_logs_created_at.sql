@@ -0,0 +1,4 @@
+-- Reminder reconciliation (core/reminder_runner.py) only revisits babies with
+-- logs written since its previous run: created_at > <last run>, keyset-paged by id.
+CREATE INDEX IF NOT EXISTS baby_logs_created_at_id_idx
+    ON baby_logs (created_at, id);
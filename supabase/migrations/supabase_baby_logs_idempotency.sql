@@ -0,0 +1,8 @@
+-- Client-generated idempotency keys for baby_logs (POST /baby_logs/bulk and the
+-- SampleData loader). A retried batch upserts with ON CONFLICT DO NOTHING on
+-- (baby_id, idempotency_key), so logs that were already stored are skipped.
+-- Logs without a key are unaffected: NULLs never conflict in a unique index.
+ALTER TABLE baby_logs ADD COLUMN IF NOT EXISTS idempotency_key TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS baby_logs_baby_id_idempotency_key_idx
+    ON baby_logs (baby_id, idempotency_key);
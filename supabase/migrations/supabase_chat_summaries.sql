@@ -0,0 +1,14 @@
+-- Rolling summary of each mom's chat history, maintained by core/chat_context.py.
+-- /chat/send prompts carry this summary plus the latest chat_logs messages
+-- verbatim, so prompt size stays constant however long the conversation gets.
+-- summarized_until is the timestamp of the newest chat_logs row folded in.
+CREATE TABLE IF NOT EXISTS chat_summaries (
+    mom_id UUID PRIMARY KEY,
+    summary TEXT NOT NULL DEFAULT '',
+    summarized_until TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Recent-messages and fold queries read one mom's chat_logs in timestamp order
+CREATE INDEX IF NOT EXISTS chat_logs_mom_id_timestamp_idx
+    ON chat_logs (mom_id, timestamp);